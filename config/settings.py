@@ -8,16 +8,36 @@ from dotenv import load_dotenv
 # Cargar variables de entorno
 load_dotenv()
 
+def _available_cpus() -> int:
+    """
+    CPUs realmente disponibles: respeta el límite de cgroups del contenedor
+    (docker-compose limita a 2) que os.cpu_count() no ve.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        quota, period = Path('/sys/fs/cgroup/cpu.max').read_text().split()[:2]
+        if quota != 'max':
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+CPU_COUNT = _available_cpus()
+
 # Paths
 BASE_DIR = Path(__file__).parent.parent
 DATA_DIR = Path(os.getenv('DATA_DIR', './data'))
 DOWNLOAD_DIR = DATA_DIR / 'downloads'
 PROCESSED_DIR = DATA_DIR / 'processed'
+CACHE_DIR = DATA_DIR / 'cache'
 DB_PATH = DATA_DIR / 'database' / 'videos.db'
 LOG_DIR = BASE_DIR / 'logs'
 
 # Crear directorios si no existen
-for directory in [DATA_DIR, DOWNLOAD_DIR, PROCESSED_DIR, LOG_DIR, DB_PATH.parent]:
+for directory in [DATA_DIR, DOWNLOAD_DIR, PROCESSED_DIR, CACHE_DIR, LOG_DIR, DB_PATH.parent]:
     directory.mkdir(parents=True, exist_ok=True)
 
 # API Keys
@@ -29,22 +49,125 @@ GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', 'AIzaSyAaPnsMpGnvGX62o9mDJLjq13UsRD
 MAX_VIDEOS_PER_DAY = int(os.getenv('MAX_VIDEOS_PER_DAY', 5))
 MIN_VIEWS_THRESHOLD = int(os.getenv('MIN_VIEWS_THRESHOLD', 1000))
 HOURS_LOOKBACK = 24  # Buscar videos de últimas 24 horas
+SCRAPER_MAX_WORKERS = int(os.getenv('SCRAPER_MAX_WORKERS', 8))  # 1 = escaneo serial
+SCRAPER_MAX_PER_HOST = int(os.getenv('SCRAPER_MAX_PER_HOST', 4))  # Peticiones simultáneas por host
+# Detalles de candidatos: 'ytdlp' (una extracción por video) o 'api' (videos.list, 50 IDs por petición).
+# 'api' gasta cuota de la API en cada escaneo, la misma que necesitan las subidas y que
+# QuotaLedger no cuenta: se activa a mano. Con 'api', yt-dlp queda de respaldo para los lotes que fallen.
+SCRAPER_DETAILS_BACKEND = os.getenv('SCRAPER_DETAILS_BACKEND', 'ytdlp')
+YOUTUBE_API_BASE_URL = os.getenv('YOUTUBE_API_BASE_URL', 'https://www.googleapis.com/youtube/v3')
+# Descarga parcial: solo el tramo del original que usa el render (yt-dlp download_ranges)
+DOWNLOAD_RANGES_ENABLED = os.getenv('DOWNLOAD_RANGES_ENABLED', 'true').lower() == 'true'
+DOWNLOAD_RANGE_MARGIN = float(os.getenv('DOWNLOAD_RANGE_MARGIN', 2))  # Segundos extra tras el audio TTS
+DOWNLOAD_MAX_HEIGHT = int(os.getenv('DOWNLOAD_MAX_HEIGHT', 1080))  # Resolución máxima del original (salida y Shorts)
+# Presupuesto de descargas del proceso (src/scraper/bandwidth.py), repartido entre las descargas activas
+DOWNLOAD_CONCURRENT_FRAGMENTS = int(os.getenv('DOWNLOAD_CONCURRENT_FRAGMENTS', 4))  # Fragmentos DASH/HLS simultáneos por video
+DOWNLOAD_MAX_CONNECTIONS = int(os.getenv('DOWNLOAD_MAX_CONNECTIONS', 8))  # Conexiones de descarga en total
+DOWNLOAD_BANDWIDTH_LIMIT = float(os.getenv('DOWNLOAD_BANDWIDTH_LIMIT', 0))  # Bytes/s en total, 0 = sin límite
+DOWNLOAD_PROGRESS_INTERVAL = float(os.getenv('DOWNLOAD_PROGRESS_INTERVAL', 10))  # Segundos entre logs de progreso
+# Modo incremental (run_daily.py --poll): feed RSS de subidas de cada canal con peticiones condicionales
+YOUTUBE_FEED_URL = os.getenv('YOUTUBE_FEED_URL', 'https://www.youtube.com/feeds/videos.xml')
+FEED_POLL_INTERVAL = int(os.getenv('FEED_POLL_INTERVAL', 600))  # Segundos entre sondeos
+
+# Caché de metadata de yt-dlp (data/cache/metadata.db)
+METADATA_CACHE_MAX_ENTRIES = int(os.getenv('METADATA_CACHE_MAX_ENTRIES', 20000))
+CHANNEL_LISTING_TTL = 30 * 60  # Listados de canal: 30 minutos
+METADATA_DEFAULT_TTL = 24 * 3600  # Campos sin TTL propio
+METADATA_FIELD_TTLS = {
+    'view_count': 6 * 3600,  # Cambia rápido
+    'like_count': 6 * 3600,
+    'comment_count': 6 * 3600,
+    'duration': None,  # Nunca caduca
+    'upload_date': None,
+    'channel_id': None,
+}
 
 # Configuración de procesamiento
 SHORT_VIDEO_THRESHOLD = 300  # 5 minutos en segundos
 MAX_VIDEO_DURATION = 1800  # 30 minutos (videos más largos se rechazan)
 
+# Pipeline por etapas (workers por etapa)
+PIPELINE_DOWNLOAD_WORKERS = int(os.getenv('PIPELINE_DOWNLOAD_WORKERS', 2))  # I/O (yt-dlp)
+PIPELINE_API_WORKERS = int(os.getenv('PIPELINE_API_WORKERS', 2))  # Gemini + TTS
+PIPELINE_RENDER_WORKERS = min(
+    int(os.getenv('PIPELINE_RENDER_WORKERS', CPU_COUNT)),
+    CPU_COUNT
+)  # FFmpeg (CPU), nunca más que núcleos
+PIPELINE_MAX_ATTEMPTS = int(os.getenv('PIPELINE_MAX_ATTEMPTS', 3))  # Reintentos de videos en error
+# Cola de trabajo compartida por varios procesos (scripts/run_worker.py): lease por video en la tabla videos
+WORKER_LEASE_SECONDS = int(os.getenv('WORKER_LEASE_SECONDS', 300))  # Sin heartbeat en este tiempo, otro worker lo retoma
+WORKER_POLL_INTERVAL = int(os.getenv('WORKER_POLL_INTERVAL', 30))  # Segundos de espera con la cola vacía
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', 30))  # Espera máxima por el bloqueo de escritura de SQLite
+
+# Configuración de Gemini
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-1.5-flash')
+GEMINI_CHUNK_TOKENS = int(os.getenv('GEMINI_CHUNK_TOKENS', 6000))  # Presupuesto de tokens de entrada por llamada
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', 3))  # Llamadas simultáneas (map)
+GEMINI_REQUESTS_PER_MINUTE = int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', 15))  # Límite del tier gratuito
+
+# Caché de respuestas de Gemini (data/cache/gemini.db)
+GEMINI_CACHE_ENABLED = os.getenv('GEMINI_CACHE_ENABLED', 'true').lower() == 'true'
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv('GEMINI_CACHE_MAX_ENTRIES', 5000))
+GEMINI_CACHE_MAX_BYTES = int(os.getenv('GEMINI_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+GEMINI_CACHE_TTL = int(os.getenv('GEMINI_CACHE_TTL', 0)) or None  # Segundos; 0 = sin caducidad
+
 # Configuración de TTS
 TTS_VOICE = "es-ES-AlvaroNeural"  # Voz masculina en español
 TTS_RATE = "+0%"  # Velocidad normal
 TTS_PITCH = "+0Hz"  # Tono normal
+TTS_MAX_CONNECTIONS = int(os.getenv('TTS_MAX_CONNECTIONS', 4))  # Frases sintetizadas en paralelo en todo el proceso
+TTS_BACKEND = os.getenv('TTS_BACKEND', 'edge')  # edge | offline (silencio sin red, para pruebas locales)
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 200 * 1024 * 1024))  # data/cache/tts.db
 
 # Configuración de video
 OUTPUT_VIDEO_CODEC = "libx264"
 OUTPUT_AUDIO_CODEC = "aac"
 OUTPUT_VIDEO_BITRATE = "2M"
 OUTPUT_AUDIO_BITRATE = "128k"
+# Perfiles de codificación (libx264): calidad constante (crf) o bitrate fijo
+ENCODING_PROFILES = {
+    'fast': {'preset': 'veryfast', 'bitrate': OUTPUT_VIDEO_BITRATE, 'tune': None},
+    'balanced': {'preset': 'medium', 'crf': 23, 'maxrate': '4M', 'bufsize': '8M', 'tune': None},
+    'quality': {'preset': 'slow', 'crf': 20, 'maxrate': '8M', 'bufsize': '16M', 'tune': 'film'},
+}
+ENCODING_PROFILE = os.getenv('ENCODING_PROFILE', 'balanced')
+# Hilos de FFmpeg repartidos entre los renders simultáneos (PIPELINE_RENDER_WORKERS)
+FFMPEG_THREAD_BUDGET = int(os.getenv('FFMPEG_THREAD_BUDGET', CPU_COUNT))
 ORIGINAL_AUDIO_VOLUME = 0.1  # 10% del volumen original
+# Fast path: copiar el video sin recodificar si el códec/contenedor ya sirven para YouTube
+VIDEO_STREAM_COPY = os.getenv('VIDEO_STREAM_COPY', 'true').lower() == 'true'
+STREAM_COPY_CODECS = ('h264',)
+STREAM_COPY_FORMATS = ('mov', 'mp4', 'm4a', '3gp', '3g2', 'mj2')  # Familia MP4 (format_name de ffprobe)
+STREAM_COPY_MAX_OVERRUN = 5.0  # Segundos máximos de video tras el audio TTS hasta el siguiente keyframe
+RENDER_SKIP_INTRO = float(os.getenv('RENDER_SKIP_INTRO', 0))  # Segundos del original a saltar (intro)
+# Shorts (9:16) renderizados en la misma pasada de FFmpeg que el video horizontal
+SHORTS_ENABLED = os.getenv('SHORTS_ENABLED', 'false').lower() == 'true'
+SHORTS_WIDTH = 1080
+SHORTS_HEIGHT = 1920
+SHORTS_STYLE = os.getenv('SHORTS_STYLE', 'blur')  # blur (fondo desenfocado) | crop (recorte central)
+SHORTS_MAX_DURATION = int(os.getenv('SHORTS_MAX_DURATION', 60))  # Segundos
+SHORTS_FONT = os.getenv('SHORTS_FONT', 'DejaVu Sans')  # Nombre de fontconfig o ruta a un .ttf
+
+# Subida a YouTube (protocolo resumable: el estado se guarda en la fila Video)
+YOUTUBE_UPLOAD_URL = os.getenv('YOUTUBE_UPLOAD_URL', 'https://www.googleapis.com/upload/youtube/v3/videos')
+UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))  # Se redondea a múltiplos de 256 KiB
+UPLOAD_MAX_RETRIES = int(os.getenv('UPLOAD_MAX_RETRIES', 8))  # Reintentos seguidos sin progreso
+UPLOAD_BACKOFF_BASE = 1.0  # Segundos; espera aleatoria en [0, base * 2^intento]
+UPLOAD_BACKOFF_MAX = 64.0
+# Cliente de la API compartido por el proceso (src/publisher/service_factory.py)
+YOUTUBE_DISCOVERY_FILE = os.getenv('YOUTUBE_DISCOVERY_FILE')  # Por defecto, el incluido en google-api-python-client
+CREDENTIALS_REFRESH_MARGIN = int(os.getenv('CREDENTIALS_REFRESH_MARGIN', 300))  # Refrescar 5 min antes de expirar
+YOUTUBE_HTTP_POOL_SIZE = int(os.getenv('YOUTUBE_HTTP_POOL_SIZE', 10))
+
+# Cola de publicación (src/publisher/upload_scheduler.py)
+UPLOAD_ENABLED = os.getenv('UPLOAD_ENABLED', 'false').lower() == 'true'
+UPLOAD_MAX_CONCURRENCY = int(os.getenv('UPLOAD_MAX_CONCURRENCY', 2))  # Subidas simultáneas
+UPLOAD_MAX_ATTEMPTS = int(os.getenv('UPLOAD_MAX_ATTEMPTS', 3))  # Subidas fallidas antes de pasar el video a 'error'
+YOUTUBE_DAILY_QUOTA = int(os.getenv('YOUTUBE_DAILY_QUOTA', 10000))  # Unidades por día (se reinicia a medianoche PT)
+YOUTUBE_QUOTA_TIMEZONE = 'America/Los_Angeles'
+QUOTA_COST_VIDEO_INSERT = 1600
+PUBLISH_HOURS = [int(h) for h in os.getenv('PUBLISH_HOURS', '14,18,22').split(',')]  # Horas UTC de publicación
+PUBLISH_MIN_LEAD = int(os.getenv('PUBLISH_MIN_LEAD', 3600))  # Segundos mínimos entre la subida y publishAt
 
 # Horario de publicación (hora UTC)
 SCHEDULE_HOUR = int(os.getenv('SCHEDULE_HOUR', 6))
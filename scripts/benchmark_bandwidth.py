@@ -0,0 +1,280 @@
+"""
+Benchmark del presupuesto de descargas (src/scraper/bandwidth.py).
+
+Genera con FFmpeg un video HLS de prueba (segmentos fMP4 de 2s) y lo sirve por
+HTTP local limitando cada conexión a --per-conn MB/s, como hace un CDN. Mide:
+
+1. Un video con 1 fragmento simultáneo frente a DOWNLOAD_CONCURRENT_FRAGMENTS:
+   con el límite por conexión, más fragmentos = más velocidad.
+2. --downloads videos a la vez con un límite global de --limit MB/s: la suma
+   no pasa del límite, cada descarga recibe una parte parecida y las
+   conexiones abiertas nunca superan --connections.
+3. Lo mismo descargando solo un tramo (--section) de cada video, que pasa
+   por FFmpeg, con el servidor a --limit MB/s por conexión (solo el
+   presupuesto frena): la suma tampoco pasa del límite y el progreso llega al
+   log mientras descarga, no solo al final. Como en YouTube, video y audio son
+   MP4 separados servidos con Range, anunciados en un MPD con su bitrate.
+
+Uso:
+    python scripts/benchmark_bandwidth.py [--seconds 60] [--per-conn 2] [--limit 4] [--downloads 3]
+"""
+import argparse
+import logging
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Directorio de datos temporal: el benchmark no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="bench_bandwidth_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from config.settings import DOWNLOAD_CONCURRENT_FRAGMENTS
+from src.scraper.bandwidth import BandwidthBudget
+from src.scraper.youtube_scraper import YouTubeScraper
+
+
+def generate_hls(directory: Path, seconds: float, copies: int):
+    """Un juego de segmentos y una playlist por copia (IDs distintos para yt-dlp)"""
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=size=1280x720:rate=30:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '60', '-b:v', '4M',
+        '-c:a', 'aac', '-shortest',
+        '-f', 'hls', '-hls_time', '2', '-hls_playlist_type', 'vod', '-hls_segment_type', 'fmp4',
+        '-hls_segment_filename', str(directory / 'seg%03d.m4s'), str(directory / 'v0.m3u8')
+    ], check=True)
+    playlist = (directory / 'v0.m3u8').read_text()
+    for i in range(1, copies):
+        (directory / f'v{i}.m3u8').write_text(playlist)
+
+
+def generate_dash(directory: Path, seconds: float, copies: int):
+    """Video y audio en MP4 separados y un MPD por copia con el bitrate de cada uno (tbr para yt-dlp)"""
+    for name, streams in (('video.mp4', ['-map', '0:v', '-c:v', 'libx264', '-preset', 'ultrafast',
+                                         '-g', '60', '-b:v', '4M']),
+                          ('audio.m4a', ['-map', '1:a', '-c:a', 'aac'])):
+        subprocess.run([
+            'ffmpeg', '-y', '-v', 'error',
+            '-f', 'lavfi', '-i', f'testsrc=size=1280x720:rate=30:duration={seconds}',
+            '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+            *streams, '-movflags', '+faststart', str(directory / name)
+        ], check=True)
+    video, audio = (int((directory / name).stat().st_size * 8 / seconds) for name in ('video.mp4', 'audio.m4a'))
+    manifest = f"""<?xml version="1.0" encoding="UTF-8"?>
+<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" mediaPresentationDuration="PT{seconds:g}S"
+     profiles="urn:mpeg:dash:profile:isoff-on-demand:2011">
+  <Period>
+    <AdaptationSet mimeType="video/mp4">
+      <Representation id="video" codecs="avc1.42c01f" width="1280" height="720" bandwidth="{video}">
+        <BaseURL>video.mp4</BaseURL>
+      </Representation>
+    </AdaptationSet>
+    <AdaptationSet mimeType="audio/mp4">
+      <Representation id="audio" codecs="mp4a.40.2" audioSamplingRate="44100" bandwidth="{audio}">
+        <BaseURL>audio.m4a</BaseURL>
+      </Representation>
+    </AdaptationSet>
+  </Period>
+</MPD>
+"""
+    for i in range(copies):
+        (directory / f'd{i}.mpd').write_text(manifest)
+
+
+class ThrottledHandler(SimpleHTTPRequestHandler):
+    """Archivos estáticos con límite de velocidad por conexión; cuenta conexiones simultáneas"""
+    per_conn_rate = 2e6
+    open_connections = 0
+    peak_connections = 0
+    sent_bytes = 0
+    lock = threading.Lock()
+
+    remaining = None
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        # Buffer de envío pequeño: sent_bytes cuenta lo que recibe el cliente, no lo que espera en el kernel
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 64 * 1024)
+        super().setup()
+
+    def send_head(self):
+        """Como SimpleHTTPRequestHandler, más peticiones Range (FFmpeg salta al tramo)"""
+        path = self.translate_path(self.path)
+        match = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get('Range', ''))
+        if not match or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        start, end = int(match[1]), min(int(match[2] or size - 1), size - 1)
+        source = open(path, 'rb')
+        source.seek(start)
+        self.send_response(206)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        self.remaining = end - start + 1
+        return source
+
+    def copyfile(self, source, outputfile):
+        cls = ThrottledHandler
+        with cls.lock:
+            cls.open_connections += 1
+            cls.peak_connections = max(cls.peak_connections, cls.open_connections)
+        try:
+            start, sent = time.monotonic(), 0
+            while chunk := source.read(32 * 1024 if self.remaining is None else min(32 * 1024, self.remaining - sent)):
+                outputfile.write(chunk)
+                sent += len(chunk)
+                with cls.lock:
+                    cls.sent_bytes += len(chunk)
+                ahead = sent / cls.per_conn_rate - (time.monotonic() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with cls.lock:
+                cls.open_connections -= 1
+
+
+class SpeedLog(logging.Handler):
+    """Recoge la media final y los avisos de progreso que registra BandwidthBudget por descarga"""
+
+    def __init__(self):
+        super().__init__()
+        self.averages = {}
+        self.progress = {}
+
+    def emit(self, record):
+        message = record.getMessage()
+        match = re.match(r"Descarga (\S+): .* \(([\d.]+) MB/s de media\)", message)
+        if match:
+            self.averages[match[1]] = float(match[2])
+        match = re.match(r"Descarga (\S+): [\d.]+ MB a ", message)
+        if match:
+            self.progress[match[1]] = self.progress.get(match[1], 0) + 1
+
+    def clear(self):
+        self.averages.clear()
+        self.progress.clear()
+
+
+def run(budget: BandwidthBudget, urls: list, section=None) -> float:
+    ThrottledHandler.peak_connections = 0
+    ThrottledHandler.sent_bytes = 0
+    scraper = YouTubeScraper(use_cache=False, details_backend='ytdlp', bandwidth=budget)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(len(urls)) as pool:
+        paths = list(pool.map(partial(scraper.download_video, section=section), urls))
+    if not all(paths):
+        raise SystemExit("Alguna descarga falló")
+    for path in paths:
+        Path(path).unlink()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=60, help="Duración del video HLS (s)")
+    parser.add_argument('--per-conn', type=float, default=2, help="Límite del servidor por conexión (MB/s)")
+    parser.add_argument('--fragments', type=int, default=DOWNLOAD_CONCURRENT_FRAGMENTS)
+    parser.add_argument('--limit', type=float, default=4, help="Límite global del presupuesto (MB/s)")
+    parser.add_argument('--downloads', type=int, default=3, help="Descargas simultáneas en la prueba 2")
+    parser.add_argument('--connections', type=int, default=6, help="Tope de conexiones en las pruebas 2 y 3")
+    parser.add_argument('--section', type=float, nargs=2, default=(10, 40), metavar=('INICIO', 'FIN'),
+                        help="Tramo (s) de cada video en la prueba 3")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    speeds = SpeedLog()
+    logging.getLogger('src.scraper.bandwidth').addHandler(speeds)
+    logging.getLogger('src.scraper.bandwidth').setLevel(logging.INFO)
+    ThrottledHandler.per_conn_rate = args.per_conn * 1e6
+
+    with tempfile.TemporaryDirectory(prefix="bench_bandwidth_") as tmp:
+        print(f"Generando HLS de {args.seconds:.0f}s...")
+        generate_hls(Path(tmp), args.seconds, args.downloads)
+        generate_dash(Path(tmp), args.seconds, args.downloads)
+        size = sum(p.stat().st_size for p in Path(tmp).glob('*.m4s'))
+        server = ThreadingHTTPServer(('127.0.0.1', 0), partial(ThrottledHandler, directory=tmp))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        urls = [f"{base}/v{i}.m3u8" for i in range(args.downloads)]
+
+        # 1. Fragmentos simultáneos de un solo video
+        print(f"\n1. Un video de {size / 1e6:.1f} MB, servidor a {args.per_conn:.1f} MB/s por conexión")
+        single = {}
+        for fragments in (1, args.fragments):
+            seconds = run(BandwidthBudget(rate_limit=0, max_connections=fragments, fragments=fragments), urls[:1])
+            single[fragments] = seconds
+            print(f"   {fragments} fragmento(s): {seconds:6.2f}s  ({size / seconds / 1e6:5.2f} MB/s)")
+        print(f"   Aceleración: {single[1] / single[args.fragments]:.1f}x")
+
+        # 2. Varias descargas con límite global
+        budget = BandwidthBudget(rate_limit=args.limit * 1e6, max_connections=args.connections,
+                                 fragments=args.fragments)
+        speeds.clear()
+        seconds = run(budget, urls)
+        total = size * args.downloads / seconds / 1e6
+        peak = ThrottledHandler.peak_connections
+        print(f"\n2. {args.downloads} videos a la vez, límite global {args.limit:.1f} MB/s, "
+              f"{args.connections} conexiones")
+        for url, speed in speeds.averages.items():
+            print(f"   {url.rsplit('/', 1)[-1]:10} {speed:5.2f} MB/s")
+        print(f"   Total: {total:.2f} MB/s en {seconds:.2f}s | conexiones simultáneas máx: {peak}")
+        averages = dict(speeds.averages)
+
+        # 3. Varios tramos con límite global (FFmpeg); una conexión sola podría llevarse todo el límite
+        ThrottledHandler.per_conn_rate = args.limit * 1e6
+        budget = BandwidthBudget(rate_limit=args.limit * 1e6, max_connections=args.connections,
+                                 fragments=args.fragments, progress_interval=1)
+        speeds.clear()
+        manifests = [f"{base}/d{i}.mpd" for i in range(args.downloads)]
+        ranged_seconds = run(budget, manifests, tuple(args.section))
+        ranged_total = ThrottledHandler.sent_bytes / ranged_seconds / 1e6
+        ranged_peak = ThrottledHandler.peak_connections
+        server.shutdown()
+
+    start, end = args.section
+    print(f"\n3. Tramo {start:.0f}-{end:.0f}s de {args.downloads} videos a la vez, "
+          f"límite global {args.limit:.1f} MB/s")
+    for url, speed in speeds.averages.items():
+        print(f"   {url.rsplit('/', 1)[-1]:10} {speed:5.2f} MB/s, "
+              f"{speeds.progress.get(url, 0)} avisos de progreso")
+    print(f"   Total: {ThrottledHandler.sent_bytes / 1e6:.1f} MB servidos, {ranged_total:.2f} MB/s "
+          f"en {ranged_seconds:.2f}s | conexiones simultáneas máx: {ranged_peak}")
+
+    checks = {
+        "más fragmentos descargan más rápido": single[args.fragments] < single[1] * 0.75,
+        "el total no supera el límite global": total <= args.limit * 1.1,
+        "el total aprovecha el límite global": total >= args.limit * 0.7,
+        "conexiones dentro del tope": peak <= args.connections,
+        "media registrada por descarga": len(averages) == args.downloads,
+        "tramos: el total no supera el límite global": ranged_total <= args.limit * 1.1,
+        "tramos: el total aprovecha el límite global": ranged_total >= args.limit * 0.5,
+        "tramos: conexiones dentro del tope": ranged_peak <= args.connections,
+        "tramos: progreso en el log durante la descarga": (
+            len(speeds.progress) == args.downloads and all(n >= 2 for n in speeds.progress.values())),
+    }
+    for name, ok in checks.items():
+        print(f"  [{'OK' if ok else 'FALLO'}] {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
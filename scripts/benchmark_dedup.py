@@ -0,0 +1,89 @@
+"""
+Micro-benchmark de la deduplicación de candidatos contra la tabla videos.
+
+Compara la consulta por video (filter_by(...).first()) con la búsqueda por
+lotes (get_existing_youtube_ids) a medida que la tabla crece hasta 100k+ filas.
+Usa una base de datos temporal, no toca data/database/videos.db.
+
+Uso:
+    python scripts/benchmark_dedup.py [--lookups 50] [--sizes 1000,10000,100000,200000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Base de datos temporal: DATA_DIR debe definirse antes de importar config.settings
+_tmp_dir = tempfile.mkdtemp(prefix="bench_dedup_")
+os.environ['DATA_DIR'] = _tmp_dir
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.utils.database import init_db, engine, SessionLocal, Video, get_existing_youtube_ids
+
+
+def grow_table(target_rows: int, current_rows: int) -> int:
+    """Inserta filas sintéticas hasta alcanzar target_rows"""
+    if target_rows <= current_rows:
+        return current_rows
+    rows = [
+        {'youtube_id': f"vid{i:011d}", 'channel_id': 'bench', 'title': f"Video {i}", 'status': 'uploaded'}
+        for i in range(current_rows, target_rows)
+    ]
+    with engine.begin() as conn:
+        conn.execute(Video.__table__.insert(), rows)
+    return target_rows
+
+
+def bench_per_video(ids):
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        known = {vid for vid in ids if db.query(Video).filter_by(youtube_id=vid).first()}
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    return elapsed, len(known)
+
+
+def bench_batched(ids):
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        known = get_existing_youtube_ids(db, ids)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+    return elapsed, len(known)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lookups', type=int, default=50, help="IDs consultados por escaneo (canales x videos)")
+    parser.add_argument('--sizes', default="1000,10000,100000,200000", help="Tamaños de tabla a medir")
+    args = parser.parse_args()
+
+    init_db()
+    sizes = sorted(int(s) for s in args.sizes.split(','))
+
+    print(f"{'filas':>8} | {'por video (ms)':>15} | {'por lotes (ms)':>15} | {'speedup':>8}")
+    print("-" * 56)
+    rows = 0
+    for size in sizes:
+        rows = grow_table(size, rows)
+        # Mitad de IDs conocidos, mitad nuevos (como un escaneo real)
+        half = args.lookups // 2
+        ids = [f"vid{i:011d}" for i in range(0, size, max(1, size // max(1, half)))][:half]
+        ids += [f"new{i:011d}" for i in range(args.lookups - len(ids))]
+
+        per_video, found_a = bench_per_video(ids)
+        batched, found_b = bench_batched(ids)
+        assert found_a == found_b, "Ambos métodos deben encontrar los mismos IDs"
+        print(f"{size:>8} | {per_video * 1000:>15.2f} | {batched * 1000:>15.2f} | {per_video / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark de la descarga parcial: video completo frente al tramo que usa el
+render (YouTubeScraper.download_video con section).
+
+Genera con FFmpeg un video de prueba (testsrc + tono) de --source segundos,
+lo sirve por HTTP local con soporte de Range y lo descarga con yt-dlp de las
+dos formas. Mide el tiempo de pared, los bytes que sirvió el servidor y el
+tamaño en disco. Los bytes servidos son una cota superior: FFmpeg salta por
+el archivo cerrando conexiones y lo que ya estaba en los buffers de red
+cuenta como enviado.
+
+Uso:
+    python scripts/benchmark_download.py [--source 1200] [--clip 90] [--start 120]
+"""
+import argparse
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Directorio de datos temporal: el benchmark no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="bench_download_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from config.settings import DOWNLOAD_DIR
+from src.scraper.youtube_scraper import YouTubeScraper
+from src.media.probe import probe
+
+
+def generate_source(path: Path, seconds: float):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=size=1280x720:rate=30:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '60',
+        '-c:a', 'aac', '-shortest', '-movflags', '+faststart', str(path)
+    ], check=True)
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    """Archivos estáticos con soporte de Range (206), como un CDN de video"""
+    bytes_sent = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # Buffer de envío pequeño: acota lo que se cuenta como servido en conexiones abortadas
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 64 * 1024)
+
+    def send_head(self):
+        path = Path(self.translate_path(self.path))
+        if not path.is_file():
+            self.send_error(404)
+            return None
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match:
+            start = int(match[1])
+            end = min(int(match[2]), size - 1) if match[2] else size - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        f = open(path, 'rb')
+        f.seek(start)
+        self._remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        while self._remaining > 0:
+            chunk = source.read(min(64 * 1024, self._remaining))
+            if not chunk:
+                break
+            try:
+                outputfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                break
+            self._remaining -= len(chunk)
+            with RangeHandler.lock:
+                RangeHandler.bytes_sent += len(chunk)
+
+
+def measure(scraper, url: str, section=None) -> dict:
+    RangeHandler.bytes_sent = 0
+    shutil.rmtree(DOWNLOAD_DIR, ignore_errors=True)
+    DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    path = scraper.download_video(url, section)
+    elapsed = time.perf_counter() - start
+    if not path:
+        raise SystemExit("La descarga falló")
+    info = probe(path)
+    return {'seconds': elapsed, 'served': RangeHandler.bytes_sent,
+            'disk': Path(path).stat().st_size, 'duration': info.duration if info else 0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', type=float, default=1200, help="Duración del original (s)")
+    parser.add_argument('--clip', type=float, default=90, help="Duración del tramo (s), ~audio TTS")
+    parser.add_argument('--start', type=float, default=120, help="Inicio del tramo (s)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_download_") as tmp:
+        source = Path(tmp) / "source.mp4"
+        print(f"Generando original de {args.source:.0f}s...")
+        generate_source(source, args.source)
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), partial(RangeHandler, directory=tmp))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/source.mp4"
+        scraper = YouTubeScraper(use_cache=False, details_backend='ytdlp')
+
+        full = measure(scraper, url)
+        ranged = measure(scraper, url, (args.start, args.start + args.clip))
+        server.shutdown()
+
+    print(f"{'':10} {'tiempo':>9} {'servido':>12} {'en disco':>12} {'duración':>9}")
+    for name, result in (('completo', full), ('tramo', ranged)):
+        print(f"{name:10} {result['seconds']:8.2f}s {result['served'] / 1e6:10.1f}MB "
+              f"{result['disk'] / 1e6:10.1f}MB {result['duration']:8.1f}s")
+    print(f"Ahorro: {full['served'] / max(1, ranged['served']):.1f}x bytes servidos, "
+          f"{full['disk'] / max(1, ranged['disk']):.1f}x en disco")
+
+
+if __name__ == "__main__":
+    main()
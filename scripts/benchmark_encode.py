@@ -0,0 +1,94 @@
+"""
+Benchmark de los perfiles de codificación (ENCODING_PROFILES) del render.
+
+Genera localmente con FFmpeg un clip sintético (testsrc + tono) y un audio
+"TTS", y renderiza el clip con cada perfil usando el mismo comando que
+VideoComposer (recodificando, sin stream copy). Reporta fps de codificación,
+tamaño y bitrate de la salida.
+
+Con --renders N lanza N renders simultáneos por perfil repartiendo el
+presupuesto de hilos (como en el pipeline) y reporta los fps agregados.
+
+Uso:
+    python scripts/benchmark_encode.py [--seconds 20] [--size 1280x720] [--threads 2] [--renders 1]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Directorio de datos temporal: el benchmark no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="bench_encode_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from config.settings import ENCODING_PROFILES, FFMPEG_THREAD_BUDGET
+from src.media.probe import probe
+from src.media.video_composer import VideoComposer
+
+
+def generate_clip(path: Path, seconds: float, size: str):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=size={size}:rate=30:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-qp', '0',
+        '-c:a', 'aac', '-shortest', str(path)
+    ], check=True)
+
+
+def generate_tts(path: Path, seconds: float):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency=220:duration={seconds}:sample_rate=24000',
+        '-ac', '1', '-c:a', 'libmp3lame', '-b:a', '48k', str(path)
+    ], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=20, help="Duración del clip de prueba (s)")
+    parser.add_argument('--size', default="1280x720", help="Resolución del clip de prueba")
+    parser.add_argument('--threads', type=int, default=FFMPEG_THREAD_BUDGET, help="Presupuesto total de hilos")
+    parser.add_argument('--renders', type=int, default=1, help="Renders simultáneos por perfil")
+    parser.add_argument('--profiles', default=','.join(ENCODING_PROFILES), help="Perfiles a medir")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_encode_") as tmp:
+        tmp = Path(tmp)
+        clip, tts = tmp / "clip.mp4", tmp / "tts.mp3"
+        print(f"Generando clip testsrc {args.size} de {args.seconds:g}s...")
+        generate_clip(clip, args.seconds, args.size)
+        generate_tts(tts, args.seconds)
+        source = probe(clip)
+        frames = source.duration * source.fps
+
+        composer = VideoComposer(stream_copy=False, thread_budget=args.threads, max_concurrent=args.renders)
+        print(f"Presupuesto: {args.threads} hilos, {args.renders} render(s) a la vez "
+              f"-> {composer.threads} hilo(s) por render\n")
+        print(f"{'perfil':<10} | {'tiempo (s)':>10} | {'fps':>7} | {'tamaño (MB)':>11} | {'kbps':>6}")
+        print("-" * 56)
+
+        for profile in args.profiles.split(','):
+            commands = [
+                composer.build_command(clip, tts, tmp / f"{profile}_{i}.mp4", args.seconds, profile=profile)
+                for i in range(args.renders)
+            ]
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.renders) as pool:
+                list(pool.map(lambda cmd: subprocess.run(
+                    cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL), commands))
+            elapsed = time.perf_counter() - start
+
+            output = probe(tmp / f"{profile}_0.mp4")
+            print(f"{profile:<10} | {elapsed:>10.2f} | {frames * args.renders / elapsed:>7.1f} | "
+                  f"{output.size / 1e6:>11.2f} | {output.bit_rate / 1000:>6.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark del render de VideoComposer: recorte como opción de salida (comando
+anterior) frente a recorte/seek como opción de entrada (comando actual).
+
+Genera con FFmpeg un video de prueba (testsrc + tono) de --source segundos y un
+audio "TTS" de --clip segundos, y mide para cada variante el tiempo de pared y
+los bytes leídos de las entradas (estadísticas AVIOContext de ffmpeg -v verbose).
+Las variantes se miden sin +faststart: esa pasada relee la salida y se
+contaría como lectura en ambas por igual.
+
+Uso:
+    python scripts/benchmark_render.py [--source 600] [--clip 30] [--start 120] [--copy]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Directorio de datos temporal: el benchmark no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="bench_render_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from config.settings import (
+    OUTPUT_VIDEO_CODEC,
+    OUTPUT_AUDIO_CODEC,
+    OUTPUT_VIDEO_BITRATE,
+    OUTPUT_AUDIO_BITRATE,
+    ORIGINAL_AUDIO_VOLUME
+)
+from src.media.video_composer import VideoComposer
+
+_AVIO_STATS_RE = re.compile(r'Statistics: (\d+) bytes read, (\d+) seeks')
+
+
+def generate_source(path: Path, seconds: float):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=size=1280x720:rate=30:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '60',
+        '-c:a', 'aac', '-shortest', str(path)
+    ], check=True)
+
+
+def generate_tts(path: Path, seconds: float):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'sine=frequency=220:duration={seconds}:sample_rate=24000',
+        '-ac', '1', '-c:a', 'libmp3lame', '-b:a', '48k', str(path)
+    ], check=True)
+
+
+def legacy_command(video_path, audio_path, output_path, duration: float,
+                   copy_video: bool, start_time: float = 0.0) -> list:
+    """Comando anterior: entradas completas y -ss/-t solo como opciones de salida"""
+    cmd = [
+        'ffmpeg', '-y',
+        '-i', str(video_path),
+        '-i', str(audio_path),
+        '-filter_complex',
+        f'[0:a]volume={ORIGINAL_AUDIO_VOLUME}[original_audio];[original_audio][1:a]amix=inputs=2:duration=first:dropout_transition=2[a_out]',
+        '-map', '0:v',
+        '-map', '[a_out]',
+    ]
+    cmd += ['-c:v', 'copy'] if copy_video else ['-c:v', OUTPUT_VIDEO_CODEC, '-b:v', OUTPUT_VIDEO_BITRATE]
+    if start_time > 0:
+        cmd += ['-ss', f"{start_time:.3f}"]
+    cmd += ['-c:a', OUTPUT_AUDIO_CODEC, '-b:a', OUTPUT_AUDIO_BITRATE, '-t', f"{duration:.3f}", str(output_path)]
+    return cmd
+
+
+def run(cmd: list):
+    """Ejecuta el comando y retorna (segundos, bytes leídos, seeks)"""
+    cmd = cmd[:1] + ['-v', 'verbose'] + cmd[1:]
+    if '+faststart' in cmd:
+        index = cmd.index('+faststart')
+        del cmd[index - 1:index + 1]
+    start = time.perf_counter()
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    bytes_read = seeks = 0
+    for line in result.stderr.splitlines():
+        match = _AVIO_STATS_RE.search(line)
+        if match:
+            bytes_read += int(match.group(1))
+            seeks += int(match.group(2))
+    return elapsed, bytes_read, seeks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', type=float, default=600, help="Duración del video original (s)")
+    parser.add_argument('--clip', type=float, default=30, help="Duración del audio TTS (s)")
+    parser.add_argument('--start', type=float, default=120, help="Inicio del fragmento para la variante con seek (s)")
+    parser.add_argument('--copy', action='store_true', help="Copiar el video (-c:v copy) en lugar de recodificar")
+    args = parser.parse_args()
+
+    composer = VideoComposer()
+    duration = args.clip + 1
+
+    with tempfile.TemporaryDirectory(prefix="bench_render_") as tmp:
+        tmp = Path(tmp)
+        source, tts = tmp / "source.mp4", tmp / "tts.mp3"
+        print(f"Generando video de prueba ({args.source:g}s) y audio TTS ({args.clip:g}s)...")
+        generate_source(source, args.source)
+        generate_tts(tts, args.clip)
+        print(f"Original: {source.stat().st_size / 1e6:.1f} MB\n")
+
+        variants = [
+            ("anterior: -t de salida", legacy_command(source, tts, tmp / "a.mp4", duration, args.copy)),
+            ("actual: -t de entrada", composer.build_command(source, tts, tmp / "b.mp4", duration, copy_video=args.copy)),
+            (f"anterior: -ss {args.start:g} de salida", legacy_command(
+                source, tts, tmp / "c.mp4", duration, args.copy, start_time=args.start)),
+            (f"actual: -ss {args.start:g} de entrada", composer.build_command(
+                source, tts, tmp / "d.mp4", duration, start_time=args.start, copy_video=args.copy)),
+        ]
+
+        print(f"{'variante':<30} | {'tiempo (s)':>10} | {'leído (MB)':>10} | {'seeks':>5}")
+        print("-" * 65)
+        for name, cmd in variants:
+            elapsed, bytes_read, seeks = run(cmd)
+            print(f"{name:<30} | {elapsed:>10.2f} | {bytes_read / 1e6:>10.2f} | {seeks:>5}")
+
+
+if __name__ == "__main__":
+    main()
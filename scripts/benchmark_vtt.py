@@ -0,0 +1,91 @@
+"""
+Benchmark del parser WebVTT sobre subtítulos automáticos sintéticos de varias horas.
+
+Genera un .vtt con el formato "rodante" de YouTube (cada cue repite la línea
+anterior, con etiquetas <c> y marcas de tiempo por palabra) y mide tiempo,
+throughput y pico de memoria de write_transcript (streaming a disco) y
+vtt_to_transcript (string completo, como se guarda en Video.transcript).
+
+Uso:
+    python scripts/benchmark_vtt.py [--hours 1,3,6]
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.processor.vtt_parser import format_timestamp, write_transcript, vtt_to_transcript
+
+WORDS = ("the model can now reason about images and code while the new benchmark "
+         "shows a large jump in accuracy compared with last year results").split()
+
+
+def _ts(seconds: float) -> str:
+    return f"{format_timestamp(seconds)}.{int(seconds * 1000) % 1000:03d}"
+
+
+def generate_rolling_vtt(path: Path, hours: float, seed: int = 42):
+    """Escribe un .vtt sintético con el patrón de auto-captions de YouTube"""
+    rng = random.Random(seed)
+    total = hours * 3600
+    t = 0.0
+    previous = ""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\nKind: captions\nLanguage: en\n\n")
+        while t < total:
+            words = [rng.choice(WORDS) for _ in range(rng.randint(5, 9))]
+            if rng.random() < 0.02:
+                words.insert(0, "[Music]")
+            step = 2.0 + rng.random()
+            timed = words[0] + ''.join(
+                f"<{_ts(t + (i + 1) * step / len(words))}><c> {w}</c>" for i, w in enumerate(words[1:])
+            )
+            f.write(f"{_ts(t)} --> {_ts(t + step)} align:start position:0%\n{previous or ' '}\n{timed}\n\n")
+            plain = ' '.join(words)
+            # Cue de transición de 10ms que repite la línea completa
+            f.write(f"{_ts(t + step)} --> {_ts(t + step + 0.01)} align:start position:0%\n{plain}\n \n\n")
+            previous = plain
+            t += step + 0.01
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', default="1,3,6", help="Duraciones (horas) de los subtítulos sintéticos")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_vtt_") as tmp:
+        print(f"{'horas':>5} | {'vtt (MB)':>8} | {'streaming (s)':>13} | {'MB/s':>6} | {'pico (KB)':>9} | "
+              f"{'string (s)':>10} | {'pico (KB)':>9} | {'texto (KB)':>10}")
+        print("-" * 95)
+        for hours in (float(h) for h in args.hours.split(',')):
+            vtt_path = Path(tmp) / f"bench_{hours}h.vtt"
+            out_path = Path(tmp) / f"bench_{hours}h.txt"
+            generate_rolling_vtt(vtt_path, hours)
+            size_mb = vtt_path.stat().st_size / 1e6
+
+            _, stream_s, stream_peak = measure(write_transcript, vtt_path, out_path)
+            text, string_s, string_peak = measure(vtt_to_transcript, vtt_path)
+
+            print(f"{hours:>5g} | {size_mb:>8.1f} | {stream_s:>13.2f} | {size_mb / stream_s:>6.1f} | "
+                  f"{stream_peak / 1024:>9.0f} | {string_s:>10.2f} | {string_peak / 1024:>9.0f} | "
+                  f"{len(text.encode('utf-8')) / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
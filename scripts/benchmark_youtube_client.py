@@ -0,0 +1,96 @@
+"""
+Benchmark del costo de obtener un servicio autenticado de la API de YouTube.
+
+Compara el camino anterior (cada YouTubeClient deserializa token.pickle y
+llama a googleapiclient.discovery.build, que vuelve a leer y parsear el
+documento de discovery) con service_factory: primera llamada del proceso
+(fría), llamadas siguientes (caliente) y primera llamada en un hilo nuevo.
+
+Usa credenciales falsas que no expiran: no hace ninguna petición de red.
+
+Uso:
+    python scripts/benchmark_youtube_client.py [--runs 20]
+"""
+import argparse
+import os
+import pickle
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Directorio de datos temporal: el benchmark no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="bench_ytclient_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+from src.publisher import service_factory
+from src.publisher.youtube_client import YouTubeClient
+
+
+def legacy_authenticate(token_file: Path):
+    """Lo que hacía YouTubeClient.authenticate con un token válido"""
+    with open(token_file, 'rb') as token:
+        credentials = pickle.load(token)
+    return build('youtube', 'v3', credentials=credentials)
+
+
+def factory_authenticate(token_file: Path):
+    client = YouTubeClient()
+    client.token_file = token_file
+    assert client.authenticate()
+    return client.service
+
+
+def timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def in_new_thread(func, *args) -> float:
+    result = []
+    thread = threading.Thread(target=lambda: result.append(timed(func, *args)))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20, help="Repeticiones de cada medición")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_ytclient_") as tmp:
+        token_file = Path(tmp) / "token.pickle"
+        credentials = Credentials(token="fake", expiry=datetime.utcnow() + timedelta(hours=1))
+        with open(token_file, 'wb') as f:
+            pickle.dump(credentials, f)
+
+        rows = []
+        legacy = [timed(legacy_authenticate, token_file) for _ in range(args.runs)]
+        rows.append(("anterior (cada instancia)", legacy))
+
+        cold = []
+        for _ in range(args.runs):
+            service_factory.reset()
+            cold.append(timed(factory_authenticate, token_file))
+        rows.append(("fábrica, frío (1a del proceso)", cold))
+
+        rows.append(("fábrica, caliente", [timed(factory_authenticate, token_file) for _ in range(args.runs)]))
+        rows.append(("fábrica, hilo nuevo", [in_new_thread(factory_authenticate, token_file) for _ in range(args.runs)]))
+
+        print(f"{'camino':<32} | {'mediana (ms)':>12} | {'mín (ms)':>9} | {'máx (ms)':>9}")
+        print("-" * 71)
+        for name, values in rows:
+            print(f"{name:<32} | {statistics.median(values):>12.2f} | {min(values):>9.2f} | {max(values):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,125 +8,88 @@ import time
 import logging
 from apscheduler.schedulers.blocking import BlockingScheduler
 from datetime import datetime
-from config.settings import SCHEDULE_HOUR, BASE_DIR, LOG_DIR
+from config.settings import SCHEDULE_HOUR, BASE_DIR, LOG_DIR, MAX_VIDEOS_PER_DAY, UPLOAD_ENABLED, FEED_POLL_INTERVAL
 from src.utils.logger import setup_logger
-from src.utils.database import init_db, SessionLocal, Video
+from src.utils.database import init_db
 from src.scraper.youtube_scraper import YouTubeScraper
+from src.scraper.feed_poller import FeedPoller
 from src.processor.gemini_client import GeminiClient
 from src.media.tts_generator import TTSGenerator
 from src.media.video_composer import VideoComposer
 from src.publisher.youtube_client import YouTubeClient
+from src.publisher.upload_scheduler import UploadScheduler
+from src.pipeline.video_pipeline import VideoPipeline
 
 # Configurar logger principal
 logger = setup_logger('main_pipeline')
 
-def run_pipeline():
-    """Flujo principal de ejecución"""
-    logger.info("=== Iniciando Pipeline Diario ===")
-    
-    # 1. Inicializar componentes
+CHANNELS_FILE = BASE_DIR / 'config' / 'channels.json'
+
+def build_pipeline():
+    """Inicializa los componentes. Retorna (scraper, pipeline, uploader)"""
     scraper = YouTubeScraper()
     gemini = GeminiClient()
     tts = TTSGenerator()
     composer = VideoComposer()
     uploader = YouTubeClient()
+    return scraper, VideoPipeline(scraper, gemini, tts, composer), uploader
+
+def process_and_publish(pipeline, uploader, candidates):
+    """
+    Procesa los candidatos en paralelo por etapas (descarga -> Gemini/TTS -> FFmpeg)
+    junto con los videos pendientes o interrumpidos, y publica lo que esté listo.
+    """
+    results = pipeline.run(candidates)
+
+    ready = sum(1 for result in results if result['status'] == 'ready')
+    logger.info(f"Pipeline completado: {ready}/{len(results)} videos listos.")
+
+    # Subir a YouTube (Opcional en primeras pruebas: UPLOAD_ENABLED=true)
+    # Publica el backlog 'ready' que cabe en la cuota del día, cada video
+    # programado en una franja de PUBLISH_HOURS. Lo que no cabe se aplaza.
+    if UPLOAD_ENABLED:
+        for result in UploadScheduler(uploader).run():
+            if result['status'] == 'uploaded':
+                logger.info(f"Video publicado: https://youtu.be/{result['uploaded_video_id']} "
+                            f"(publishAt {result['publish_at']})")
+    else:
+        logger.info("Subida desactivada (UPLOAD_ENABLED=false): los videos quedan 'ready'")
+
+def run_pipeline():
+    """Flujo principal de ejecución"""
+    logger.info("=== Iniciando Pipeline Diario ===")
+    
+    # 1. Inicializar componentes
+    scraper, pipeline, uploader = build_pipeline()
     
-    db = None
     try:
         # 2. Buscar candidatos
-        candidates = scraper.find_new_videos(BASE_DIR / 'config' / 'channels.json')
+        candidates = scraper.find_new_videos(CHANNELS_FILE)
         
-        if not candidates:
+        # 3. Procesar los mejores candidatos (Top N) y publicar.
+        #    Los videos interrumpidos en ejecuciones anteriores se retoman donde quedaron.
+        selected = candidates[:MAX_VIDEOS_PER_DAY]
+        if not selected:
             logger.info("No se encontraron videos nuevos para procesar hoy.")
-            return
-
-        # Procesar solo el mejor candidato (Top 1) para el MVP
-        top_candidate = candidates[0]
-        video_details = top_candidate['video']
-        logger.info(f"Procesando candidato: {video_details['title']} (Score: {top_candidate['score']:.2f})")
-        
-        db = SessionLocal()
-        
-        # Registrar en DB
-        video_record = Video(
-            youtube_id=video_details['id'],
-            channel_id=video_details['channel_id'],
-            title=video_details['title'],
-            url=video_details['webpage_url'],
-            duration=video_details['duration'],
-            views=video_details['view_count'],
-            published_at=datetime.strptime(video_details['upload_date'], '%Y%m%d'),
-            status="processing"
-        )
-        db.add(video_record)
-        db.commit()
-        
-        # 3. Descargar Video
-        video_path = scraper.download_video(video_details['webpage_url'])
-        if not video_path:
-            raise Exception("Fallo en descarga")
-            
-        video_record.file_path = video_path
-        
-        # 4. Obtener Transcripción (Simulada usando Gemini sobre metadata si no hay subs)
-        # En producción real: extraer subtitulos del archivo descargado (.vtt)
-        # Para MVP: Generamos resumen basado en titulo y descripción si no extrae texto
-        # TODO: Implementar extracción real de subtitulos si existen
-        
-        # 5. Generar Guion y Metadata con Gemini
-        # Usamos descripción como input básico para el MVP
-        transcript_input = f"{video_details['title']}\n{video_details['description']}"
-        
-        summary_script = gemini.generate_summary(transcript_input)
-        if not summary_script:
-            raise Exception("Fallo generando resumen")
-            
-        video_record.summary = summary_script
-        
-        metadata = gemini.generate_metadata(summary_script)
-        
-        # 6. Generar Audio TTS
-        audio_filename = f"{video_details['id']}_tts.mp3"
-        audio_path = tts.generate_audio_sync(summary_script, audio_filename)
-        
-        if not audio_path:
-            raise Exception("Fallo generando audio")
-            
-        # 7. Componer Video
-        output_filename = f"{video_details['id']}_final.mp4"
-        final_video_path = composer.combine_video_audio(video_path, audio_path, output_filename)
-        
-        if not final_video_path:
-            raise Exception("Fallo componiendo video")
-            
-        video_record.status = "ready"
-        db.commit()
-        
-        # 8. Subir a YouTube (Opcional en primeras pruebas)
-        # video_id = uploader.upload_video(
-        #     final_video_path,
-        #     metadata['title'],
-        #     metadata['description'],
-        #     metadata['tags']
-        # )
-        
-        # if video_id:
-        #     video_record.status = "uploaded"
-        #     logger.info(f"Video publicado exitosamente: https://youtu.be/{video_id}")
-        # else:
-        #     logger.warning("Video listo pero no subido (o fallo subida)")
-            
-        logger.info("Pipeline completado exitosamente para 1 video.")
+        else:
+            logger.info(f"Procesando {len(selected)} de {len(candidates)} candidatos")
+        process_and_publish(pipeline, uploader, selected)
         
     except Exception as e:
         logger.error(f"Fallo en pipeline: {e}")
-        if 'video_record' in locals():
-            video_record.status = "error"
-            video_record.error_message = str(e)
-            db.commit()
-    finally:
-        if db:
-            db.close()
+
+def run_poll(poller, pipeline, uploader):
+    """
+    Modo incremental: sondea los feeds RSS (los videos nuevos quedan 'pending')
+    y procesa la cola pendiente.
+    """
+    try:
+        candidates = poller.poll(CHANNELS_FILE)
+        if candidates:
+            logger.info(f"{len(candidates)} videos nuevos encolados desde los feeds")
+        process_and_publish(pipeline, uploader, [])
+    except Exception as e:
+        logger.error(f"Fallo en sondeo: {e}")
 
 if __name__ == "__main__":
     # Inicializar DB
@@ -139,10 +102,18 @@ if __name__ == "__main__":
     else:
         # Modo Scheduler
         scheduler = BlockingScheduler()
-        # Ejecutar todos los días a la hora programada
-        scheduler.add_job(run_pipeline, 'cron', hour=SCHEDULE_HOUR)
-        
-        logger.info(f"Scheduler iniciado. Ejecución programada a las {SCHEDULE_HOUR}:00 UTC")
+        if len(sys.argv) > 1 and sys.argv[1] == "--poll":
+            # Modo incremental: sondear los feeds cada FEED_POLL_INTERVAL segundos
+            # (sin solaparse: un sondeo espera a que termine el anterior)
+            scraper, pipeline, uploader = build_pipeline()
+            scheduler.add_job(run_poll, 'interval', seconds=FEED_POLL_INTERVAL,
+                              args=(FeedPoller(scraper), pipeline, uploader),
+                              max_instances=1, coalesce=True, next_run_time=datetime.now())
+            logger.info(f"Scheduler iniciado. Sondeo de feeds cada {FEED_POLL_INTERVAL}s")
+        else:
+            # Ejecutar todos los días a la hora programada
+            scheduler.add_job(run_pipeline, 'cron', hour=SCHEDULE_HOUR)
+            logger.info(f"Scheduler iniciado. Ejecución programada a las {SCHEDULE_HOUR}:00 UTC")
         try:
             scheduler.start()
         except (KeyboardInterrupt, SystemExit):
@@ -0,0 +1,59 @@
+"""
+Worker de la cola de videos: procesa los videos pendientes de la base de
+datos compartida (tabla videos) tomando cada uno con un lease.
+
+Se pueden lanzar varios (procesos o contenedores con el mismo volumen data/),
+todos o por etapas. run_daily.py sigue buscando candidatos y publicando; los
+videos que registra los toma el primer worker libre.
+
+Uso:
+    python scripts/run_worker.py [--stages api,download,render] [--concurrency 2] [--until-empty]
+"""
+import sys
+from pathlib import Path
+
+# Agregar root al path para imports
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import argparse
+import signal
+import threading
+from src.utils.logger import setup_logger
+from src.utils.database import init_db
+from src.scraper.youtube_scraper import YouTubeScraper
+from src.processor.gemini_client import GeminiClient
+from src.media.tts_generator import TTSGenerator
+from src.media.video_composer import VideoComposer
+from src.pipeline.video_pipeline import VideoPipeline
+from src.pipeline.job_queue import JobQueue, STAGES
+
+logger = setup_logger('worker')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"Etapas que procesa este worker, separadas por comas ({', '.join(STAGES)})")
+    parser.add_argument('--concurrency', type=int, default=1, help="Videos a la vez")
+    parser.add_argument('--worker-id', help="Identificador del lease (por defecto host:pid)")
+    parser.add_argument('--until-empty', action='store_true', help="Terminar cuando no quede trabajo pendiente")
+    args = parser.parse_args()
+
+    stages = tuple(s.strip() for s in args.stages.split(',') if s.strip())
+    unknown = set(stages) - set(STAGES)
+    if unknown or not stages:
+        parser.error(f"Etapas desconocidas: {', '.join(sorted(unknown)) or '(ninguna)'}")
+
+    init_db()
+    pipeline = VideoPipeline(YouTubeScraper(), GeminiClient(), TTSGenerator(), VideoComposer(),
+                             queue=JobQueue(worker_id=args.worker_id))
+
+    # SIGTERM (docker stop) o Ctrl+C: terminar los videos en curso y salir sin tomar más
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    results = pipeline.work(stages, concurrency=args.concurrency, stop=stop, until_empty=args.until_empty)
+    ready = sum(1 for r in results if r['status'] == 'ready')
+    logger.info(f"Worker terminado: {len(results)} videos procesados, {ready} listos")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Prueba del reparto de hilos de VideoComposer (FFMPEG_THREAD_BUDGET).
+
+Cada render tiene su parte del presupuesto (thread_budget / max_concurrent).
+Con el Short, la misma pasada de FFmpeg lleva el grafo de filtros y dos
+encoders. Comprueba:
+- que sin Short el encoder usa toda la parte del render,
+- que con Short (copiando o recodificando el video horizontal) grafo y
+  encoders suman como mucho la parte del render (o una por parte si la
+  parte es menor que el número de partes),
+- que los comandos repartidos renderizan con FFmpeg el video y el Short.
+
+Uso:
+    python scripts/test_composer.py [--budget 4] [--renders 2]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+# Directorio de datos temporal: la prueba no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="test_composer_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.media.video_composer import VideoComposer, shorts_path_for
+
+
+def check(condition: bool, message: str):
+    print(f"[{'OK' if condition else 'FALLO'}] {message}")
+    if not condition:
+        check.failed = True
+check.failed = False
+
+
+def command_threads(cmd: list) -> dict:
+    """Hilos del grafo y de cada salida que codifica video (las copias no codifican)"""
+    outputs, start = [], cmd.index('-map')
+    for i, arg in enumerate(cmd):
+        if arg == '-threads':
+            output = cmd[start:i]
+            outputs.append(0 if ['-c:v', 'copy'] == output[output.index('-c:v'):output.index('-c:v') + 2]
+                           else int(cmd[i + 1]))
+            start = i + 2
+    return {'filter': int(cmd[cmd.index('-filter_complex_threads') + 1]), 'encoders': outputs}
+
+
+def generate_media(directory: Path):
+    """Clip H.264 con audio y un audio "TTS" de 3s"""
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', 'testsrc=size=640x360:rate=30:duration=8',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:duration=8',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '30', '-c:a', 'aac', '-shortest',
+        str(directory / 'clip.mp4')
+    ], check=True)
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error', '-f', 'lavfi', '-i', 'sine=frequency=880:duration=3',
+        '-c:a', 'libmp3lame', str(directory / 'tts.mp3')
+    ], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=int, default=4, help="Presupuesto de hilos del render real")
+    parser.add_argument('--renders', type=int, default=2, help="Renders a la vez del render real")
+    args = parser.parse_args()
+
+    # 1. Reparto en el comando para distintas partes por render
+    for share in range(1, 9):
+        composer = VideoComposer(thread_budget=share, max_concurrent=1)
+        plain = command_threads(composer.build_command('v.mp4', 'a.mp3', 'o.mp4', 10.0))
+        check(plain['encoders'] == [share], f"parte {share}, sin Short: encoder con {plain['encoders']} hilos")
+        for copy_video in (True, False):
+            threads = command_threads(composer.build_command(
+                'v.mp4', 'a.mp3', 'o.mp4', 10.0, copy_video=copy_video, shorts_path='o_short.mp4'))
+            parts = 1 + sum(1 for n in threads['encoders'] if n)
+            total = threads['filter'] + sum(threads['encoders'])
+            check(total <= max(share, parts),
+                  f"parte {share}, Short {'copiando' if copy_video else 'recodificando'}: "
+                  f"grafo {threads['filter']} + encoders {threads['encoders']} = {total} hilos")
+
+    # 2. Render real con la parte de un render de --renders
+    composer = VideoComposer(stream_copy=False, profile='fast', thread_budget=args.budget,
+                             max_concurrent=args.renders, shorts=True)
+    with tempfile.TemporaryDirectory(prefix="test_composer_") as tmp:
+        tmp = Path(tmp)
+        generate_media(tmp)
+        for stream_copy in (True, False):
+            composer.stream_copy = stream_copy
+            output = composer.combine_video_audio(str(tmp / 'clip.mp4'), str(tmp / 'tts.mp3'),
+                                                  f"test_composer_{stream_copy}.mp4", title="Prueba")
+            shorts = shorts_path_for(output) if output else None
+            check(bool(output) and Path(output).is_file() and shorts.is_file(),
+                  f"render {'con copia' if stream_copy else 'recodificado'} + Short con "
+                  f"{composer.threads} hilos: {output}")
+            for path in (output, shorts):
+                if path:
+                    Path(path).unlink(missing_ok=True)
+
+    sys.exit(1 if check.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Prueba del sondeo incremental por RSS (FeedPoller) contra un servidor HTTP
+local que sirve feeds Atom de prueba con ETag y Last-Modified.
+
+Sobre una base de datos temporal comprueba:
+- que el primer sondeo encola como 'pending' solo las entradas que pasan los
+  filtros de fecha y duración, y no las que ya están en la tabla videos,
+- que un segundo sondeo sin cambios cuesta un 304 por canal y no encola nada,
+- que una subida nueva en un canal solo hace releer ese canal y encola solo ese video,
+- que una entrada cuyos detalles fallan se reevalúa en el siguiente sondeo
+  (feed completo, sin 304) y no se pierde,
+- que una entrada sin upload_date (estreno o directo programado) se rechaza
+  sin cortar el sondeo de su canal,
+- que el tope diario MAX_VIDEOS_PER_DAY se respeta.
+
+Uso:
+    python scripts/test_feed_poller.py [--channels 3]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+# Directorio de datos temporal: la prueba no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="test_feed_poller_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.utils.database import init_db, SessionLocal, Video, ChannelFeed
+from src.scraper.youtube_scraper import YouTubeScraper
+from src.scraper.feed_poller import FeedPoller
+
+FEED_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/"
+      xmlns="http://www.w3.org/2005/Atom">
+ <title>{channel_id}</title>
+ <yt:channelId>{channel_id}</yt:channelId>
+{entries}
+</feed>"""
+
+ENTRY_TEMPLATE = """ <entry>
+  <id>yt:video:{id}</id>
+  <yt:videoId>{id}</yt:videoId>
+  <yt:channelId>{channel_id}</yt:channelId>
+  <title>{title}</title>
+  <link rel="alternate" href="https://www.youtube.com/watch?v={id}"/>
+  <published>{published}</published>
+  <updated>{published}</updated>
+  <media:group>
+   <media:title>{title}</media:title>
+   <media:community><media:statistics views="{views}"/></media:community>
+  </media:group>
+ </entry>"""
+
+
+class FeedServer(ThreadingHTTPServer):
+    """Feeds por canal; el ETag es el hash del cuerpo y Last-Modified la hora del último cambio"""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FeedHandler)
+        self.feeds = {}  # channel_id -> (cuerpo, etag, last_modified)
+        self.responses = []  # (channel_id, status)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/feeds/videos.xml"
+
+    def set_feed(self, channel_id: str, videos: list):
+        entries = "\n".join(ENTRY_TEMPLATE.format(
+            id=v['id'], channel_id=channel_id, title=v['title'], views=v['view_count'],
+            published=v['published'].strftime('%Y-%m-%dT%H:%M:%S+00:00')
+        ) for v in sorted(videos, key=lambda v: v['published'], reverse=True))
+        body = FEED_TEMPLATE.format(channel_id=channel_id, entries=entries).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        with self.lock:
+            self.feeds[channel_id] = (body, etag, formatdate(usegmt=True))
+
+    def statuses(self) -> dict:
+        with self.lock:
+            responses, self.responses = self.responses, []
+        return {status: sum(1 for _, s in responses if s == status) for status in (200, 304)}
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        channel_id = parse_qs(url.query).get('channel_id', [''])[0]
+        feed = self.server.feeds.get(channel_id)
+        if url.path != '/feeds/videos.xml' or feed is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body, etag, last_modified = feed
+        not_modified = (self.headers.get('If-None-Match') == etag
+                        or (self.headers.get('If-None-Match') is None
+                            and self.headers.get('If-Modified-Since') == last_modified))
+        status = 304 if not_modified else 200
+        with self.server.lock:
+            self.server.responses.append((channel_id, status))
+        self.send_response(status)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', last_modified)
+        if status == 304:
+            self.end_headers()
+            return
+        self.send_header('Content-Type', 'application/atom+xml')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeScraper(YouTubeScraper):
+    """Extracción completa simulada (sin red); los IDs de failing fallan una vez"""
+
+    def __init__(self, videos: dict):
+        super().__init__(use_cache=False, details_backend='ytdlp')
+        self.videos = videos
+        self.failing = set()
+        self.calls = []
+
+    def get_video_details(self, video_url: str):
+        video_id = video_url.rsplit('v=', 1)[-1]
+        self.calls.append(video_id)
+        if video_id in self.failing:
+            self.failing.discard(video_id)
+            return None
+        video = self.videos[video_id]
+        return {
+            'id': video_id,
+            'title': video['title'],
+            'channel_id': video['channel_id'],
+            'duration': video['duration'],
+            'view_count': video['view_count'],
+            'upload_date': video['published'].strftime('%Y%m%d') if not video.get('upcoming') else None,
+            'webpage_url': video_url,
+        }
+
+
+def pending_ids() -> set:
+    db = SessionLocal()
+    try:
+        return {row[0] for row in db.query(Video.youtube_id).filter(Video.status == 'pending')}
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=3)
+    args = parser.parse_args()
+
+    init_db()
+    # Fechas de hoy: los filtros comparan upload_date por día
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    videos, feeds = {}, {}
+
+    def add_video(channel_id, suffix, duration=600, published=None, upcoming=False):
+        video = {'id': f"{channel_id}_{suffix}", 'channel_id': channel_id, 'title': f"{channel_id} {suffix}",
+                 'duration': duration, 'view_count': 10, 'published': published or today, 'upcoming': upcoming}
+        videos[video['id']] = video
+        feeds.setdefault(channel_id, []).append(video)
+        return video
+
+    channels = [f"UC{c}" for c in range(args.channels)]
+    expected, known = set(), []
+    for i, channel_id in enumerate(channels):
+        expected.add(add_video(channel_id, 'ok', published=today + timedelta(minutes=i))['id'])
+        add_video(channel_id, 'largo', duration=4000, published=today + timedelta(minutes=i + 1))
+        add_video(channel_id, 'viejo', published=today - timedelta(days=3))
+        known.append(add_video(channel_id, 'conocido', published=today + timedelta(minutes=i + 2)))
+
+    # Un video por feed ya registrado por el escaneo diario
+    db = SessionLocal()
+    for video in known:
+        db.add(Video(youtube_id=video['id'], title=video['title'], url='local', status='ready'))
+    db.commit()
+    db.close()
+
+    server = FeedServer()
+    for channel_id in channels:
+        server.set_feed(channel_id, feeds[channel_id])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    checks = {}
+    with tempfile.TemporaryDirectory(prefix="test_feed_poller_") as tmp:
+        channels_file = Path(tmp) / "channels.json"
+        channels_file.write_text(json.dumps({'channels': [
+            {'name': channel_id, 'channel_id': channel_id, 'priority': 1} for channel_id in channels
+        ]}))
+        scraper = FakeScraper(videos)
+        poller = FeedPoller(scraper, feed_url=server.url, max_workers=2, max_per_day=100)
+
+        # 1. Primer sondeo
+        poller.poll(channels_file)
+        checks["1er sondeo: encola solo los que pasan filtros"] = pending_ids() == expected
+        checks["1er sondeo: no pide detalles de videos ya registrados"] = not {v['id'] for v in known} & set(scraper.calls)
+        server.statuses()
+
+        # 2. Sin cambios: un 304 por canal
+        scraper.calls.clear()
+        candidates = poller.poll(channels_file)
+        checks["2º sondeo: todo 304"] = server.statuses() == {200: 0, 304: len(channels)}
+        checks["2º sondeo: nada nuevo ni detalles pedidos"] = not candidates and not scraper.calls
+
+        # 3. Subida nueva en el primer canal
+        new = add_video(channels[0], 'nuevo', published=today + timedelta(minutes=30))
+        server.set_feed(channels[0], feeds[channels[0]])
+        candidates = poller.poll(channels_file)
+        checks["subida nueva: solo ese canal con 200"] = server.statuses() == {200: 1, 304: len(channels) - 1}
+        checks["subida nueva: encola solo ese video"] = [c['video']['id'] for c in candidates] == [new['id']]
+
+        # 4. Los detalles de una subida nueva fallan: se reevalúa en el siguiente sondeo
+        flaky = add_video(channels[-1], 'inestable', published=today + timedelta(minutes=40))
+        server.set_feed(channels[-1], feeds[channels[-1]])
+        scraper.failing.add(flaky['id'])
+        poller.poll(channels_file)
+        server.statuses()
+        checks["detalles fallidos: no se encola aún"] = flaky['id'] not in pending_ids()
+        poller.poll(channels_file)
+        checks["detalles fallidos: feed completo (200) al reintentar"] = server.statuses()[200] == 1
+        checks["detalles fallidos: encolado en el reintento"] = flaky['id'] in pending_ids()
+
+        # 5. Estreno programado (sin upload_date) junto a una subida normal en el mismo feed
+        premiere = add_video(channels[1], 'estreno', published=today + timedelta(minutes=44), upcoming=True)
+        regular = add_video(channels[1], 'normal', published=today + timedelta(minutes=45))
+        server.set_feed(channels[1], feeds[channels[1]])
+        candidates = poller.poll(channels_file)
+        checks["estreno: se rechaza sin encolarlo"] = premiere['id'] not in pending_ids()
+        checks["estreno: la subida normal del canal se encola"] = [c['video']['id'] for c in candidates] == [regular['id']]
+        server.statuses()
+
+        # 6. Tope diario
+        db = SessionLocal()
+        enqueued_today = db.query(Video).count()
+        db.close()
+        capped = FeedPoller(scraper, feed_url=server.url, max_per_day=enqueued_today + 1)
+        for channel_id in channels:
+            add_video(channel_id, 'tope', published=today + timedelta(minutes=50))
+            server.set_feed(channel_id, feeds[channel_id])
+        before = len(pending_ids())
+        capped.poll(channels_file)
+        checks["tope diario respetado"] = len(pending_ids()) - before == 1
+        checks["tope diario: el resto se descarta sin reintentos"] = capped.last_poll_stats['capped'] == len(channels) - 1
+
+    server.shutdown()
+
+    db = SessionLocal()
+    marks = {feed.channel_id: feed.last_published for feed in db.query(ChannelFeed)}
+    db.close()
+    checks["marca de agua por canal"] = all(marks[c] == today + timedelta(minutes=50) for c in channels)
+
+    print(f"Canales: {len(channels)} | videos en cola: {len(pending_ids())}")
+    for name, ok in checks.items():
+        print(f"  [{'OK' if ok else 'FALLO'}] {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
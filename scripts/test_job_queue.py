@@ -0,0 +1,314 @@
+"""
+Prueba de estrés de la cola de trabajo (src/pipeline/job_queue.py) con
+varios procesos worker sobre una base de datos temporal.
+
+Los componentes del pipeline son simulados (sin red ni FFmpeg): cada etapa
+duerme un poco, escribe su archivo y deja un evento en un log compartido.
+Se lanzan --workers procesos: la mayoría con todas las etapas, uno solo
+'api' y otro solo 'render' (traspasos entre workers). Algunos renders duran
+más que el lease (el heartbeat debe mantenerlo) y un worker muere a mitad de
+un render (su lease debe vencer y otro worker retomar el video). Además, un
+proceso hace de run_daily.py: VideoPipeline.run() sobre toda la cola.
+
+Comprueba:
+- que todos los videos terminan 'ready' y los workers sanos sueltan sus leases,
+- que cada etapa de cada video se completa exactamente una vez,
+- que dos procesos nunca trabajan a la vez sobre el mismo video,
+- que el video del worker caído se retoma después de vencer su lease,
+- que los renders más largos que el lease no se duplican,
+- que run() no acapara la cola: tiene a la vez como mucho tantos leases
+  como hilos suman sus etapas,
+- que un worker al que otro le quita el lease (a mitad de una descarga o de
+  un render) deja de procesar el video sin guardar nada más en su fila.
+
+Uso:
+    python scripts/test_job_queue.py [--videos 40] [--workers 5] [--lease 2]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+# Directorio de datos temporal: la prueba no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="test_job_queue_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from config.settings import DOWNLOAD_DIR, PROCESSED_DIR
+from src.utils.database import init_db, SessionLocal, Video
+from src.pipeline.job_queue import JobQueue, STAGES
+from src.pipeline.video_pipeline import VideoPipeline
+
+
+class Events:
+    """Log de eventos compartido entre procesos (una línea JSON por escritura, O_APPEND)"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def record(self, event: str, youtube_id: str, step: str, **extra):
+        line = json.dumps({'event': event, 'id': youtube_id, 'step': step, 'pid': os.getpid(),
+                           'time': time.time(), **extra})
+        with open(self.path, 'a') as f:
+            f.write(line + "\n")
+
+    def read(self) -> list:
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+
+class FakeComponents:
+    """Scraper, Gemini, TTS y composer simulados; cada llamada es un paso registrado"""
+
+    def __init__(self, events: Events, lease: float, crash_on_render: int = None, steal: dict = None):
+        self.events = events
+        self.lease = lease
+        self.crash_on_render = crash_on_render
+        self.steal = steal or {}  # paso -> youtube_id al que otro worker le quita el lease en ese paso
+        self.renders = 0
+        self.shorts = False
+
+    def _step(self, step: str, youtube_id: str, seconds: float, path: Path = None):
+        self.events.record('start', youtube_id, step)
+        if self.steal.get(step) == youtube_id:
+            steal_lease(youtube_id, self.lease)
+        time.sleep(seconds)
+        if path:
+            path.write_bytes(b"x" * 1024)
+        self.events.record('end', youtube_id, step)
+        return str(path) if path else None
+
+    # Scraper
+    def download_subtitles(self, url):
+        return False
+
+    def download_video(self, url, section=None):
+        youtube_id = url.rsplit('/', 1)[-1]
+        return self._step('download', youtube_id, random.uniform(0.02, 0.1), DOWNLOAD_DIR / f"{youtube_id}.mp4")
+
+    # Gemini
+    def generate_script_and_metadata(self, text):
+        youtube_id = text.split("\n", 1)[0]
+        self._step('script', youtube_id, random.uniform(0.02, 0.1))
+        return {'script': f"guion de {youtube_id}", 'title': youtube_id, 'description': '', 'tags': []}
+
+    # TTS
+    def generate_audio_sync(self, text, filename):
+        youtube_id = text.rsplit(' ', 1)[-1]
+        return self._step('tts', youtube_id, random.uniform(0.02, 0.1), PROCESSED_DIR / filename)
+
+    # Composer
+    def probe(self, path):
+        return SimpleNamespace(has_video=True, duration=10.0) if path and Path(path).is_file() else None
+
+    def combine_video_audio(self, video_path, audio_path, output_filename, subtitle_path=None,
+                            start_time=None, title=None):
+        youtube_id = Path(video_path).stem
+        self.renders += 1
+        if self.crash_on_render and self.renders == self.crash_on_render:
+            self.events.record('crash', youtube_id, 'render')
+            self.events.record('start', youtube_id, 'render')
+            time.sleep(0.05)
+            os._exit(1)  # Muere sin soltar el lease, como un OOM o un kill -9
+        # 1 de cada 5 renders dura más que el lease
+        seconds = self.lease * 1.5 if int(youtube_id[1:]) % 5 == 0 else random.uniform(0.05, 0.2)
+        return self._step('render', youtube_id, seconds, PROCESSED_DIR / output_filename)
+
+
+# Hilos por etapa del proceso que hace de run_daily.py
+RUN_STAGE_WORKERS = 1
+
+# Worker que se queda los videos cuyo lease se roba
+THIEF = "otro-host:0"
+
+
+def steal_lease(youtube_id: str, lease: float):
+    """Como si el lease hubiera vencido y otro worker hubiera tomado el video"""
+    db = SessionLocal()
+    db.query(Video).filter_by(youtube_id=youtube_id).update({
+        Video.lease_owner: THIEF,
+        Video.lease_expires_at: datetime.utcnow() + timedelta(seconds=lease * 10),
+    })
+    db.commit()
+    db.close()
+
+
+def stolen_lease_checks(events: Events, lease: float) -> dict:
+    """Un worker pierde el lease de s000 mientras lo descarga y el de s001 mientras lo renderiza"""
+    db = SessionLocal()
+    for youtube_id in ('s000', 's001'):
+        db.add(Video(youtube_id=youtube_id, title=youtube_id, url=f"local://{youtube_id}",
+                     duration=600, status='pending'))
+    db.commit()
+    db.close()
+
+    fake = FakeComponents(events, lease, steal={'download': 's000', 'render': 's001'})
+    results = VideoPipeline(fake, fake, fake, fake, download_ranges=False,
+                            queue=JobQueue(lease_seconds=lease)).run([])
+
+    db = SessionLocal()
+    rows = {r.youtube_id: r for r in db.query(Video).filter(Video.youtube_id.in_(('s000', 's001')))}
+    db.close()
+    renders = [e for e in events.read() if e['id'] == 's000' and e['step'] == 'render']
+    return {
+        "lease robado: el worker no da resultado del video": not results,
+        "lease robado en la descarga: no se guarda ni se renderiza": (
+            rows['s000'].file_path is None and rows['s000'].status == 'processing' and not renders),
+        "lease robado en el render: el video no queda 'ready'": (
+            rows['s001'].render_path is None and rows['s001'].status == 'downloaded'),
+        "lease robado: la fila sigue siendo del otro worker": all(
+            r.lease_owner == THIEF for r in rows.values()),
+    }
+
+
+def worker_main(events_path: str, stages: tuple, lease: float, crash_on_render: int, seed: int):
+    random.seed(seed)
+    fake = FakeComponents(Events(events_path), lease, crash_on_render)
+    pipeline = VideoPipeline(fake, fake, fake, fake, download_ranges=False,
+                             queue=JobQueue(lease_seconds=lease))
+    pipeline.work(stages, concurrency=2, idle_sleep=0.1, until_empty=True)
+
+
+def run_main(events_path: str, lease: float, seed: int):
+    """Como run_daily.py: sin candidatos nuevos, reanuda todos los pendientes con run()"""
+    random.seed(seed)
+    fake = FakeComponents(Events(events_path), lease)
+    pipeline = VideoPipeline(fake, fake, fake, fake, download_ranges=False,
+                             download_workers=RUN_STAGE_WORKERS, api_workers=RUN_STAGE_WORKERS,
+                             render_workers=RUN_STAGE_WORKERS, queue=JobQueue(lease_seconds=lease))
+    pipeline.run([])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=5, help="Procesos worker (mínimo 3)")
+    parser.add_argument('--lease', type=float, default=2, help="Segundos de lease")
+    args = parser.parse_args()
+    workers = max(3, args.workers)
+
+    init_db()
+    db = SessionLocal()
+    for i in range(args.videos):
+        # El título es el youtube_id: los fakes lo recuperan del input de Gemini
+        db.add(Video(youtube_id=f"v{i:03d}", title=f"v{i:03d}", url=f"local://v{i:03d}",
+                     duration=600, status='pending'))
+    db.commit()
+    db.close()
+
+    events = Events(str(Path(os.environ['DATA_DIR']) / "events.jsonl"))
+    Path(events.path).touch()
+
+    # Todas las etapas en la mayoría; uno solo 'api' y otro solo 'render'.
+    # El primero muere en su segundo render.
+    plans = [(STAGES, 2)] + [(STAGES, None)] * (workers - 3) + [(('api',), None), (('render',), None)]
+    context = multiprocessing.get_context('spawn')
+    start = time.time()
+    processes = [
+        context.Process(target=worker_main, args=(events.path, stages, args.lease, crash, seed))
+        for seed, (stages, crash) in enumerate(plans)
+    ]
+    processes.append(context.Process(target=run_main, args=(events.path, args.lease, len(plans))))
+    for process in processes:
+        process.start()
+
+    # Leases que tiene a la vez el proceso de run() mientras trabajan todos
+    run_owner = f":{processes[-1].pid}"
+    run_leases = 0
+    deadline = time.time() + 300
+    while any(p.is_alive() for p in processes) and time.time() < deadline:
+        db = SessionLocal()
+        owners = [owner for (owner,) in db.query(Video.lease_owner).filter(Video.lease_owner.isnot(None))]
+        db.close()
+        run_leases = max(run_leases, sum(1 for owner in owners if owner.endswith(run_owner)))
+        time.sleep(0.05)
+    for process in processes:
+        process.join(timeout=max(1, deadline - time.time()))
+    elapsed = time.time() - start
+
+    # Resultados
+    db = SessionLocal()
+    rows = db.query(Video).all()
+    db.close()
+    log = events.read()
+
+    completed = defaultdict(int)
+    intervals = defaultdict(list)  # id -> [(inicio, fin, pid)]
+    open_steps = {}
+    crashes = [e for e in log if e['event'] == 'crash']
+    for e in sorted(log, key=lambda e: e['time']):
+        key = (e['id'], e['step'], e['pid'])
+        if e['event'] == 'start':
+            open_steps[key] = e['time']
+        elif e['event'] == 'end':
+            completed[(e['id'], e['step'])] += 1
+            intervals[e['id']].append((open_steps.pop(key), e['time'], e['pid']))
+    for (youtube_id, _, pid), started in open_steps.items():
+        # Paso interrumpido por la caída: ocupa hasta que el proceso murió
+        crash = next(c for c in crashes if c['pid'] == pid)
+        intervals[youtube_id].append((started, crash['time'] + 0.05, pid))
+
+    overlaps = []
+    for youtube_id, spans in intervals.items():
+        spans.sort()
+        for (s1, e1, p1), (s2, e2, p2) in zip(spans, spans[1:]):
+            if p1 != p2 and s2 < e1:
+                overlaps.append(youtube_id)
+
+    reclaim_delay = None
+    if crashes:
+        # El último heartbeat fue como mucho lease/3 antes de la caída: el lease vence
+        # unos 2/3 de lease después (menos lo que tarden los latidos con la base ocupada)
+        crash = crashes[0]
+        retakes = [e['time'] for e in log if e['id'] == crash['id'] and e['step'] == 'render'
+                   and e['event'] == 'start' and e['pid'] != crash['pid']]
+        reclaim_delay = min(retakes) - crash['time'] if retakes else None
+
+    # Después del resto: sus videos no cuentan en los solapamientos ni en las etapas completadas
+    stolen = stolen_lease_checks(events, args.lease)
+
+    slow = [r.youtube_id for r in rows if int(r.youtube_id[1:]) % 5 == 0]
+    steps = ('script', 'tts', 'download', 'render')
+    checks = {
+        "todos los videos 'ready'": all(r.status == 'ready' for r in rows),
+        # El worker caído pudo terminar otro video sin llegar a soltar su lease (inofensivo: ya está 'ready')
+        "ningún lease retenido por un worker sano": all(
+            r.lease_owner is None or r.lease_owner.endswith(f":{processes[0].pid}") for r in rows),
+        "cada etapa completada exactamente una vez": all(
+            completed[(r.youtube_id, step)] == 1 for r in rows for step in steps),
+        "nunca dos procesos a la vez sobre un video": not overlaps,
+        "el worker caído murió en un render": len(crashes) == 1 and processes[0].exitcode == 1,
+        "su video se retoma tras vencer el lease": reclaim_delay is not None and reclaim_delay >= args.lease / 3,
+        "renders más largos que el lease sin duplicar": all(completed[(v, 'render')] == 1 for v in slow),
+        "los workers sanos terminan": all(p.exitcode == 0 for p in processes[1:]),
+        "run() no acapara leases": 0 < run_leases <= 3 * RUN_STAGE_WORKERS,
+        **stolen,
+    }
+
+    by_pid = defaultdict(int)
+    for e in log:
+        if e['event'] == 'end' and e['step'] == 'render':
+            by_pid[e['pid']] += 1
+    print(f"{args.videos} videos, {workers} workers, lease {args.lease:.1f}s: {elapsed:.1f}s")
+    print(f"Renders por worker: {sorted(by_pid.values(), reverse=True)}")
+    print(f"Leases simultáneos de run(): {run_leases} (máx {3 * RUN_STAGE_WORKERS})")
+    if reclaim_delay is not None:
+        print(f"Video del worker caído retomado {reclaim_delay:.1f}s después")
+    if overlaps:
+        print(f"Solapamientos: {sorted(set(overlaps))}")
+    for name, ok in checks.items():
+        print(f"  [{'OK' if ok else 'FALLO'}] {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
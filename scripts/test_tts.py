@@ -0,0 +1,211 @@
+"""
+Prueba de TTSGenerator con el backend offline (sin red: frames MP3 de silencio).
+
+Sobre un directorio de datos temporal comprueba:
+- que el guion se divide en frases por la puntuación,
+- que una frase repetida dentro del guion se sintetiza una sola vez,
+- que el MP3 final es la concatenación de las frases en el orden del guion,
+- que nunca hay más de --connections frases sintetizándose a la vez,
+- que una segunda ejecución sale entera de la caché (ninguna llamada al
+  backend) y genera el mismo archivo,
+- que al cambiar una frase solo esa vuelve a sintetizarse,
+- que dos generadores a la vez (como dos workers de la etapa api) se
+  reparten el mismo límite de conexiones, y que por defecto todos usan el
+  límite del proceso,
+- que el .srt junto al audio desplaza las palabras de cada frase por la
+  duración del audio anterior (len(audio) / MP3_BYTES_PER_SECOND): los
+  subtítulos avanzan de frase en frase y caen donde empieza cada frase.
+
+Uso:
+    python scripts/test_tts.py [--connections 2]
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Directorio de datos temporal: la prueba no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="test_tts_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.media.tts_generator import TTSGenerator, OfflineTTSBackend, split_sentences, MP3_BYTES_PER_SECOND
+from src.media.subtitles import build_cues, subtitle_path_for
+
+SCRIPT = (
+    "Hola a todos. Hoy vemos tres noticias de tecnología! "
+    "La primera llega desde Japón; la segunda, desde Chile: no te lo pierdas. "
+    "Hola a todos. ¿Quieres saber más? Suscríbete…"
+)
+
+
+def tagged(text: str, audio: bytes) -> bytes:
+    """Marca el primer frame con un hash de la frase: frases distintas, bytes distintos"""
+    return audio[:4] + hashlib.sha256(text.encode('utf-8')).digest()[:16] + audio[20:]
+
+
+class Concurrency:
+    """Síntesis simultáneas, contadas entre hilos"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def exit(self):
+        with self.lock:
+            self.active -= 1
+
+
+class SlowOfflineBackend(OfflineTTSBackend):
+    """
+    Backend offline que tarda un poco por frase, marca el audio de cada frase
+    y cuenta las síntesis simultáneas (en concurrency, que se puede compartir)
+    """
+
+    def __init__(self, concurrency: Concurrency = None):
+        super().__init__()
+        self.concurrency = concurrency or Concurrency()
+        self.texts = []
+
+    @property
+    def max_active(self):
+        return self.concurrency.max_active
+
+    async def synthesize(self, text, voice, rate, pitch):
+        self.concurrency.enter()
+        self.texts.append(text)
+        try:
+            await asyncio.sleep(0.05)
+            audio, words = await super().synthesize(text, voice, rate, pitch)
+            return tagged(text, audio), words
+        finally:
+            self.concurrency.exit()
+
+
+def check(condition: bool, message: str):
+    print(f"[{'OK' if condition else 'FALLO'}] {message}")
+    if not condition:
+        check.failed = True
+check.failed = False
+
+
+def expected_audio(sentences) -> bytes:
+    """Audio de cada frase, sintetizado aparte y concatenado en orden"""
+    backend = OfflineTTSBackend()
+    return b''.join(tagged(s, asyncio.run(backend.synthesize(s, None, None, None))[0]) for s in sentences)
+
+
+def sentence_audio(sentence: str) -> bytes:
+    return asyncio.run(OfflineTTSBackend().synthesize(sentence, None, None, None))[0]
+
+
+def read_srt(path) -> list:
+    """[(inicio, fin, texto), ...] de un .srt"""
+    def seconds(value):
+        hours, minutes, rest = value.split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + float(rest.replace(',', '.'))
+    cues = []
+    for block in Path(path).read_text(encoding='utf-8').strip().split("\n\n"):
+        _, times, text = block.split("\n", 2)
+        start, end = re.match(r"(\S+) --> (\S+)", times).groups()
+        cues.append((seconds(start), seconds(end), text))
+    return cues
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=2, help="Frases sintetizadas a la vez")
+    args = parser.parse_args()
+
+    sentences = split_sentences(SCRIPT)
+    check(sentences == [
+        "Hola a todos.", "Hoy vemos tres noticias de tecnología!", "La primera llega desde Japón;",
+        "la segunda, desde Chile:", "no te lo pierdas.", "Hola a todos.", "¿Quieres saber más?", "Suscríbete…",
+    ], f"{len(sentences)} frases: {sentences}")
+    unique = list(dict.fromkeys(sentences))
+
+    # 1. Primera ejecución: cada frase distinta se sintetiza una vez
+    backend = SlowOfflineBackend()
+    tts = TTSGenerator(backend=backend, connections=threading.BoundedSemaphore(args.connections))
+    path = tts.generate_audio_sync(SCRIPT, "test_tts.mp3")
+    check(path is not None and Path(path).is_file(), f"audio generado: {path}")
+    audio = Path(path).read_bytes()
+    check(backend.calls == len(unique), f"{backend.calls} llamadas al backend para {len(unique)} frases distintas")
+    check(sorted(backend.texts) == sorted(unique), "la frase repetida no se sintetiza dos veces")
+    check(audio == expected_audio(sentences), f"MP3 = frases concatenadas en orden ({len(audio)} bytes)")
+    check(backend.max_active <= args.connections, f"máximo {backend.max_active} síntesis simultáneas "
+                                                  f"(límite {args.connections})")
+
+    # Subtítulos: cada frase empieza donde acaba el audio de las anteriores
+    cues = read_srt(subtitle_path_for(path))
+    check(all(a[0] < b[0] and a[0] < a[1] for a, b in zip(cues, cues[1:])),
+          f"{len(cues)} subtítulos con tiempos crecientes")
+    check(' '.join(text for _, _, text in cues) == ' '.join(sentences), "el texto sigue el orden del guion")
+    check(abs(cues[-1][1] - len(audio) / MP3_BYTES_PER_SECOND) < OfflineTTSBackend.SECONDS_PER_WORD,
+          f"el último subtítulo acaba con el audio ({cues[-1][1]:.3f}s de {len(audio) / MP3_BYTES_PER_SECOND:.3f}s)")
+    # Tiempos esperados: las palabras de cada frase desplazadas por el audio acumulado
+    offset, words, sentence_starts = 0.0, [], []
+    for sentence in sentences:
+        sentence_starts.append(round(offset, 3))
+        _, sentence_words = asyncio.run(OfflineTTSBackend().synthesize(sentence, None, None, None))
+        words += [(offset + start, offset + end, word) for start, end, word in sentence_words]
+        offset += len(sentence_audio(sentence)) / MP3_BYTES_PER_SECOND
+    expected = [(round(start, 3), round(end, 3), text) for start, end, text in build_cues(words)]
+    check([(round(start, 3), round(end, 3), text) for start, end, text in cues] == expected,
+          "cada frase desplazada por la duración del audio anterior")
+    check(sentence_starts[5] in {round(start, 3) for start, _, _ in cues},
+          f"la frase repetida abre subtítulo en {sentence_starts[5]:.3f}s, su posición en el guion")
+
+    # 2. Misma ejecución otra vez: todo desde la caché
+    cached_backend = SlowOfflineBackend()
+    path = TTSGenerator(backend=cached_backend).generate_audio_sync(SCRIPT, "test_tts_cached.mp3")
+    check(cached_backend.calls == 0, f"reejecución: {cached_backend.calls} llamadas al backend")
+    check(Path(path).read_bytes() == audio, "reejecución: mismo audio desde la caché")
+
+    # 3. Una frase cambiada: solo esa se sintetiza
+    changed = SCRIPT.replace("¿Quieres saber más?", "¿Te ha gustado?")
+    changed_backend = SlowOfflineBackend()
+    path = TTSGenerator(backend=changed_backend).generate_audio_sync(changed, "test_tts_changed.mp3")
+    check(changed_backend.texts == ["¿Te ha gustado?"], f"frase nueva sintetizada: {changed_backend.texts}")
+    check(Path(path).read_bytes() == expected_audio(split_sentences(changed)), "audio con la frase nueva en su sitio")
+
+    # 4. Dos generadores a la vez, cada uno en su hilo y con su asyncio.run
+    connections, concurrency = threading.BoundedSemaphore(args.connections), Concurrency()
+    backends = [SlowOfflineBackend(concurrency) for _ in range(2)]
+    scripts = [" ".join(f"Frase {i} del worker {n}." for i in range(6)) for n in range(2)]
+    paths = [None, None]
+
+    def worker(n):
+        tts = TTSGenerator(backend=backends[n], use_cache=False, connections=connections)
+        paths[n] = tts.generate_audio_sync(scripts[n], f"test_tts_worker_{n}.mp3")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check(all(path and Path(path).is_file() for path in paths), f"dos generadores a la vez: {paths}")
+    check(all(len(b.texts) == 6 for b in backends), f"{[len(b.texts) for b in backends]} frases por generador")
+    check(concurrency.max_active <= args.connections,
+          f"dos generadores: máximo {concurrency.max_active} síntesis simultáneas entre los dos "
+          f"(límite del proceso {args.connections})")
+    check(TTSGenerator().connections is TTSGenerator().connections,
+          "por defecto todos los generadores comparten el límite del proceso")
+
+    sys.exit(1 if check.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
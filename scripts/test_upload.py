@@ -0,0 +1,209 @@
+"""
+Prueba de la subida resumable de YouTubeClient contra un servidor HTTP local
+que imita el endpoint de subida de YouTube (protocolo resumable).
+
+El servidor inyecta fallos (503 y conexiones cortadas) con probabilidad
+--fail-rate. A mitad de la subida se simula la caída del proceso: la sesión
+queda guardada en la fila Video y un cliente nuevo la reanuda. Al final se
+comprueba que el archivo recibido es idéntico al original y cuántos bytes
+se enviaron de más.
+
+Después, con --stall-retries, el servidor deja de avanzar: responde 308 sin
+mover el offset confirmado (a veces sin cabecera Range). El cliente debe
+abandonar tras ese número de reintentos con backoff en lugar de reenviar
+trozos para siempre.
+
+Uso:
+    python scripts/test_upload.py [--size-mb 8] [--chunk-kb 512] [--fail-rate 0.2] [--stall-retries 3]
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Directorio de datos temporal: la prueba no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="test_upload_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import requests
+from src.utils.database import init_db, SessionLocal, Video
+from src.publisher.youtube_client import YouTubeClient
+
+
+class FakeUploadServer(ThreadingHTTPServer):
+    """Estado del endpoint falso: sesiones abiertas y bytes recibidos"""
+
+    def __init__(self, fail_rate: float):
+        super().__init__(('127.0.0.1', 0), FakeUploadHandler)
+        self.fail_rate = fail_rate
+        self.sessions = {}  # id -> {'total': int, 'data': bytearray}
+        self.bytes_received = 0
+        self.failures = 0
+        self.stall_at = None  # Desde estos bytes recibidos, 308 sin avanzar a cada trozo
+        self.stalled_puts = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/upload/youtube/v3/videos"
+
+
+class FakeUploadHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, headers: dict = None, body: bytes = b''):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        assert b'snippet' in body and 'uploadType=resumable' in self.path
+        session_id = uuid.uuid4().hex
+        with self.server.lock:
+            self.server.sessions[session_id] = {
+                'total': int(self.headers['X-Upload-Content-Length']), 'data': bytearray()
+            }
+        self._reply(200, {'Location': f"{self.server.url}?upload_id={session_id}"})
+
+    def do_PUT(self):
+        session = self.server.sessions.get(self.path.rsplit('upload_id=', 1)[-1])
+        if session is None:
+            return self._reply(404)
+        chunk = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        if chunk and self.server.stall_at is not None and len(session['data']) >= self.server.stall_at:
+            # Descarta el trozo y responde 308 sin avance; uno de cada dos, además, sin Range
+            self.server.stalled_puts += 1
+            if self.server.stalled_puts % 2:
+                return self._reply(308)
+            return self._reply(308, {'Range': f"bytes=0-{len(session['data']) - 1}"})
+
+        if chunk and random.random() < self.server.fail_rate:
+            self.server.failures += 1
+            if random.random() < 0.5:
+                return self._reply(503)
+            # Conexión cortada: se guarda solo parte del trozo, sin responder
+            start = int(self.headers['Content-Range'].split()[1].split('-')[0])
+            if start == len(session['data']):
+                session['data'] += chunk[:len(chunk) // 2]
+                self.server.bytes_received += len(chunk) // 2
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+
+        content_range = self.headers['Content-Range']
+        if chunk:
+            start = int(content_range.split()[1].split('-')[0])
+            if start != len(session['data']):
+                return self._reply(400, body=b'offset incorrecto')
+            session['data'] += chunk
+            self.server.bytes_received += len(chunk)
+
+        if len(session['data']) == session['total']:
+            body = f'{{"id": "fake_{hashlib.md5(session["data"]).hexdigest()[:11]}"}}'.encode()
+            return self._reply(200, {'Content-Type': 'application/json'}, body)
+        headers = {'Range': f"bytes=0-{len(session['data']) - 1}"} if session['data'] else {}
+        self._reply(308, headers)
+
+
+class CrashAfter(requests.Session):
+    """Sesión HTTP que simula la caída del proceso tras n trozos enviados"""
+
+    def __init__(self, chunks: int):
+        super().__init__()
+        self.remaining = chunks
+
+    def put(self, url, data=None, **kwargs):
+        if data:
+            if self.remaining == 0:
+                raise SystemExit("caída simulada")
+            self.remaining -= 1
+        return super().put(url, data=data, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=float, default=8, help="Tamaño del archivo de prueba")
+    parser.add_argument('--chunk-kb', type=int, default=512, help="Tamaño de trozo (múltiplo de 256)")
+    parser.add_argument('--fail-rate', type=float, default=0.2, help="Probabilidad de fallo por trozo")
+    parser.add_argument('--stall-retries', type=int, default=3, help="max_retries del cliente con el servidor atascado")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    init_db()
+    db = SessionLocal()
+    db.add(Video(youtube_id='test_upload', title='Prueba de subida', url='local'))
+    db.commit()
+    db.close()
+
+    server = FakeUploadServer(args.fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory(prefix="test_upload_") as tmp:
+        video = Path(tmp) / "video.mp4"
+        video.write_bytes(random.randbytes(int(args.size_mb * 1024 * 1024)))
+        size = video.stat().st_size
+        chunks = -(-size // (args.chunk_kb * 1024))
+
+        def client(session, max_retries=8):
+            return YouTubeClient(upload_url=server.url, chunk_size=args.chunk_kb * 1024,
+                                 max_retries=max_retries, backoff_base=0.01, session=session)
+
+        # 1. Primera subida: el proceso "muere" a mitad
+        try:
+            client(CrashAfter(chunks // 2)).upload_video(str(video), "Prueba", "", [], youtube_id='test_upload')
+        except SystemExit:
+            pass
+        db = SessionLocal()
+        row = db.query(Video).filter_by(youtube_id='test_upload').one()
+        print(f"Tras la caída: upload_offset={row.upload_offset} de {size} bytes")
+        db.close()
+
+        # 2. Un proceso nuevo reanuda la misma sesión
+        video_id = client(requests.Session()).upload_video(str(video), "Prueba", "", [], youtube_id='test_upload')
+
+        data = next(iter(server.sessions.values()))['data']
+        sessions = len(server.sessions)
+        ok = hashlib.sha256(data).digest() == hashlib.sha256(video.read_bytes()).digest()
+        print(f"Video ID: {video_id}")
+        print(f"Sesiones abiertas: {sessions} | fallos inyectados: {server.failures}")
+        print(f"Bytes aceptados por el servidor: {server.bytes_received} ({server.bytes_received / size:.2f}x el archivo)")
+        print(f"Archivo recibido idéntico: {'SI' if ok else 'NO'}")
+
+        # 3. Servidor atascado a mitad del archivo: 308 a cada trozo sin avanzar el offset
+        db = SessionLocal()
+        db.add(Video(youtube_id='test_stall', title='Prueba atascada', url='local'))
+        db.commit()
+        db.close()
+        server.fail_rate = 0
+        server.stall_at = size // 2
+        errors = []
+        stalled_id = client(requests.Session(), max_retries=args.stall_retries).upload_video(
+            str(video), "Atascada", "", [], youtube_id='test_stall', on_error=errors.append)
+        # Un trozo por intento más el primero: nunca más de max_retries + 1 reenvíos
+        stall_ok = (stalled_id is None and server.stalled_puts == args.stall_retries + 1
+                    and bool(errors) and "abortada" in errors[0])
+        print(f"Servidor atascado: {server.stalled_puts} trozos enviados con max_retries={args.stall_retries}, "
+              f"error: {errors[0] if errors else None}")
+        print(f"Subida atascada abandonada: {'SI' if stall_ok else 'NO'}")
+
+    server.shutdown()
+    sys.exit(0 if ok and video_id and len(server.sessions) == 2 and stall_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
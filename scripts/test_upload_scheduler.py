@@ -0,0 +1,224 @@
+"""
+Prueba de la cola de publicación (UploadScheduler) con un reloj y una API falsos.
+
+Sobre una base de datos temporal con un backlog de videos 'ready' comprueba:
+- que solo se sube lo que cabe en la cuota del día y el resto se aplaza,
+- que cada video recibe una franja publishAt distinta, futura y en PUBLISH_HOURS,
+- que nunca hay más de max_concurrency subidas a la vez,
+- que un fallo deja el video 'ready' (y la cuota gastada) con el motivo real,
+- que la franja que conserva un video fallido no se da a otro aunque la
+  cuota lo deje fuera del lote,
+- que un video que siempre falla va al final de la cola y, tras max_attempts
+  fallos, pasa a 'error' sin volver a gastar cuota ni bloquear al resto,
+- que al cambiar el día del Pacífico la cuota se reinicia y el backlog sigue,
+- que reservas de cuota concurrentes nunca superan el límite.
+
+Uso:
+    python scripts/test_upload_scheduler.py [--videos 8] [--concurrency 2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Directorio de datos temporal: la prueba no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="test_scheduler_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from config.settings import PUBLISH_HOURS
+from src.utils.database import init_db, SessionLocal, Video
+from src.publisher.upload_scheduler import UploadScheduler, QuotaLedger
+from src.pipeline.job_queue import resumable_filter
+
+
+class FakeClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += timedelta(**kwargs)
+
+
+class FakeUploader:
+    """Imita YouTubeClient.upload_video: consume cuota vía before_insert y tarda un poco"""
+
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.active = 0
+        self.max_active = 0
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def upload_video(self, file_path, title, description, tags, youtube_id=None,
+                     publish_at=None, before_insert=None, on_error=None):
+        if before_insert and not before_insert():
+            return None
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.calls.append((youtube_id, publish_at))
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        if youtube_id in self.fail_ids:
+            # Como un 400 de videos.insert después de reservar la cuota
+            if on_error:
+                on_error(f"HTTPError: 400 Bad Request ({youtube_id})")
+            return None
+        return f"yt_{youtube_id}"
+
+
+def check(condition: bool, message: str):
+    print(f"[{'OK' if condition else 'FALLO'}] {message}")
+    if not condition:
+        check.failed = True
+check.failed = False
+
+
+def statuses() -> dict:
+    db = SessionLocal()
+    try:
+        return {v.youtube_id: (v.status, v.publish_at) for v in db.query(Video).all()}
+    finally:
+        db.close()
+
+
+def error_message(youtube_id: str) -> str:
+    db = SessionLocal()
+    try:
+        return db.query(Video).filter_by(youtube_id=youtube_id).one().error_message
+    finally:
+        db.close()
+
+
+def add_ready(youtube_id: str, created_at: datetime, **fields):
+    db = SessionLocal()
+    db.add(Video(youtube_id=youtube_id, title=youtube_id, url="local", status="ready",
+                 render_path=f"/tmp/{youtube_id}_final.mp4", created_at=created_at,
+                 metadata_json={'title': youtube_id, 'description': '', 'tags': []}, **fields))
+    db.commit()
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--videos', type=int, default=8, help="Videos 'ready' en el backlog")
+    parser.add_argument('--concurrency', type=int, default=2, help="Subidas simultáneas")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    base = datetime(2026, 3, 2, 12, 0)
+    for i in range(args.videos):
+        db.add(Video(youtube_id=f"v{i}", title=f"Video {i}", url="local", status="ready",
+                     render_path=f"/tmp/v{i}_final.mp4", created_at=base + timedelta(minutes=i),
+                     metadata_json={'title': f"Título {i}", 'description': '', 'tags': []}))
+    db.commit()
+    db.close()
+
+    # 15:30 UTC = 07:30 en el Pacífico
+    clock = FakeClock(datetime(2026, 3, 2, 15, 30))
+    ledger = QuotaLedger(daily_quota=10000, clock=clock)
+    uploader = FakeUploader(fail_ids={'v1'})
+    scheduler = UploadScheduler(uploader, clock=clock, ledger=ledger, max_concurrency=args.concurrency)
+
+    # Día 1
+    results = scheduler.run()
+    by_status = {}
+    for result in results:
+        by_status.setdefault(result['status'], []).append(result['youtube_id'])
+    print(f"Día 1: {by_status}")
+    affordable = 10000 // 1600
+    check(len(uploader.calls) == min(affordable, args.videos), f"{len(uploader.calls)} llamadas a videos.insert (cuota para {affordable})")
+    check(ledger.used() == 1600 * len(uploader.calls), f"cuota usada {ledger.used()} (incluye la subida fallida)")
+    check(len(by_status.get('deferred', [])) == max(0, args.videos - affordable), "el resto del backlog se aplaza")
+    check(by_status.get('error') == ['v1'], "el fallo queda registrado")
+    check(uploader.max_active <= args.concurrency, f"máximo {uploader.max_active} subidas simultáneas")
+
+    slots = [publish_at for _, publish_at in uploader.calls]
+    check(len(set(slots)) == len(slots), "franjas publishAt distintas")
+    check(all(s >= clock() + timedelta(hours=1) and s.hour in PUBLISH_HOURS for s in slots),
+          f"franjas futuras en PUBLISH_HOURS: {sorted(s.strftime('%d %H:%M') for s in slots)}")
+
+    rows = statuses()
+    check(rows['v1'][0] == 'ready', "v1 sigue 'ready' para reintentar")
+    check(error_message('v1') == "HTTPError: 400 Bad Request (v1)", f"motivo registrado: {error_message('v1')!r}")
+
+    # Mismo día: no queda cuota
+    calls = len(uploader.calls)
+    scheduler.run()
+    check(len(uploader.calls) == calls, "sin cuota no se hace ninguna llamada nueva")
+
+    # Día 2 (pasada la medianoche del Pacífico): la cuota se reinicia
+    clock.advance(hours=18)
+    uploader.fail_ids.clear()
+    results = scheduler.run()
+    rows = statuses()
+    check(all(status == 'uploaded' for status, _ in rows.values()), f"día 2: backlog completo subido ({len(results)} intentos)")
+    all_slots = [publish_at for _, publish_at in rows.values()]
+    check(len(set(all_slots)) == len(all_slots), "ninguna franja se repite entre días")
+
+    # Reservas concurrentes contra el mismo límite
+    clock.advance(days=1)
+    with ThreadPoolExecutor(16) as pool:
+        granted = sum(pool.map(lambda _: ledger.reserve(1600), range(20)))
+    check(granted == affordable and ledger.used() <= 10000, f"{granted} de 20 reservas concurrentes concedidas")
+
+    # Un video que siempre falla (modo --poll: varias ejecuciones el mismo día)
+    clock.advance(days=1)
+    add_ready('bad', clock() - timedelta(hours=1))
+    uploader.fail_ids = {'bad'}
+    attempts = 0
+    for run in range(6):
+        if run == 1:
+            # Llega un video nuevo después del primer fallo: debe ir delante
+            add_ready('fresh', clock())
+        calls = len(uploader.calls)
+        results = scheduler.run()
+        attempts += sum(1 for youtube_id, _ in uploader.calls[calls:] if youtube_id == 'bad')
+        if run == 1:
+            order = [result['youtube_id'] for result in results]
+            check(order == ['fresh', 'bad'], f"el video fallido va al final de la cola: {order}")
+        clock.advance(minutes=10)
+    rows = statuses()
+    check(attempts == scheduler.max_attempts, f"{attempts} intentos de subida del video fallido "
+                                              f"(máximo {scheduler.max_attempts})")
+    check(ledger.used() == 1600 * (attempts + 1), f"cuota usada hoy {ledger.used()}: solo esos intentos y 'fresh'")
+    check(rows['bad'][0] == 'error' and rows['fresh'][0] == 'uploaded', "'bad' pasa a 'error' y 'fresh' se sube")
+    check(error_message('bad') == "HTTPError: 400 Bad Request (bad)", "'bad' guarda el motivo del fallo")
+    db = SessionLocal()
+    retried = db.query(Video).filter(Video.youtube_id == 'bad', resumable_filter()).count()
+    db.close()
+    check(retried == 0, "el pipeline no retoma el error de subida")
+
+    # Un video fallido conserva su franja; con cuota para uno solo, el nuevo va delante
+    clock.advance(days=1)
+    future = [publish_at for _, publish_at in statuses().values() if publish_at and publish_at >= clock()]
+    kept_slot = scheduler.next_slots(1, future)[0]
+    add_ready('kept', clock() - timedelta(hours=2), upload_attempts=1, publish_at=kept_slot)
+    add_ready('newer', clock())
+    single = UploadScheduler(uploader, clock=clock, ledger=QuotaLedger(daily_quota=1600, clock=clock),
+                             max_concurrency=args.concurrency)
+    uploader.fail_ids = set()
+    results = single.run()
+    rows = statuses()
+    check([r['status'] for r in results if r['youtube_id'] == 'kept'] == ['deferred'],
+          "'kept' queda fuera del lote por la cuota")
+    check(rows['kept'][1] == kept_slot and rows['newer'][1] != kept_slot,
+          f"'newer' no recibe la franja de 'kept' ({rows['newer'][1]} frente a {kept_slot})")
+
+    sys.exit(1 if check.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Prueba del backend de detalles por videos.list contra un servidor HTTP local
+que imita la YouTube Data API v3.
+
+Escanea canales falsos (listados planos sin campos de filtro, como los de
+yt-dlp) con el backend 'api' y con el backend 'ytdlp' y comprueba:
+- que cada petición videos.list lleva como máximo 50 IDs y la API key (en cabecera),
+- que un lote que falla (HTTP 500) se resuelve con yt-dlp, y solo ese lote,
+- que un video que la API no devuelve (privado) no se pide a yt-dlp,
+- que ambos backends producen los mismos candidatos.
+
+Uso:
+    python scripts/test_youtube_api.py [--channels 6] [--videos 25]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+# Directorio de datos temporal: la prueba no toca data/ del proyecto
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix="test_youtube_api_data_"))
+
+# Agregar root al path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.utils.database import init_db
+from src.scraper.youtube_api import YouTubeDataAPI, parse_duration, MAX_IDS_PER_REQUEST
+from src.scraper.youtube_scraper import YouTubeScraper
+
+API_KEY = 'clave_de_prueba'
+
+
+def fake_video(index: int, now: datetime) -> dict:
+    """Video determinista: duraciones, vistas y fechas variadas para ejercitar todos los filtros"""
+    return {
+        'id': f"vid{index:05d}",
+        'channel_id': f"chan{index % 7}",
+        'title': f"Video {index}",
+        'duration': [120, 600, 1500, 2400, 900][index % 5],
+        'view_count': [50, 5000, 200000][index % 3],
+        # upload_date se compara por día: los recientes se publican hoy a las 00:00
+        'published': now.replace(hour=0, minute=0, second=0, microsecond=0)
+                     - timedelta(hours=[0, 0, 30, 100][index % 4]),
+    }
+
+
+class FakeApiServer(ThreadingHTTPServer):
+    def __init__(self, videos: dict, private_ids=(), fail_ids=()):
+        super().__init__(('127.0.0.1', 0), FakeApiHandler)
+        self.videos = videos
+        self.private_ids = set(private_ids)
+        self.fail_ids = set(fail_ids)
+        self.batches = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/youtube/v3"
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path != '/youtube/v3/videos' or self.headers.get('X-Goog-Api-Key') != API_KEY:
+            return self._reply(403, {'error': {'message': 'forbidden'}})
+        assert query['part'] == ['snippet,contentDetails,statistics']
+        ids = query['id'][0].split(',')
+        with self.server.lock:
+            self.server.batches.append(ids)
+        if self.server.fail_ids & set(ids):
+            return self._reply(500, {'error': {'message': 'backendError'}})
+
+        items = []
+        for video_id in ids:
+            video = self.server.videos.get(video_id)
+            if video is None or video_id in self.server.private_ids:
+                continue
+            minutes, seconds = divmod(video['duration'], 60)
+            items.append({
+                'kind': 'youtube#video',
+                'id': video_id,
+                'snippet': {
+                    'publishedAt': video['published'].strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    'channelId': video['channel_id'],
+                    'title': video['title'],
+                    'description': f"Descripción de {video['title']}",
+                    'channelTitle': video['channel_id'],
+                    'liveBroadcastContent': 'none',
+                },
+                'contentDetails': {'duration': f"PT{minutes}M{seconds}S"},
+                'statistics': {'viewCount': str(video['view_count']), 'likeCount': '10'},
+            })
+        self._reply(200, {'kind': 'youtube#videoListResponse', 'items': items})
+
+
+class FakeScraper(YouTubeScraper):
+    """Listados planos y extracción completa de yt-dlp simulados (sin red)"""
+
+    def __init__(self, videos: dict, channels: dict, private_ids=(), **kwargs):
+        super().__init__(use_cache=False, **kwargs)
+        self.videos = videos
+        self.channels = channels
+        self.private_ids = set(private_ids)
+        self.ytdlp_calls = []
+
+    def get_channel_videos(self, channel_id: str, limit: int = 5):
+        return [{'id': video_id, 'url': f"https://www.youtube.com/watch?v={video_id}"}
+                for video_id in self.channels[channel_id]]
+
+    def get_video_details(self, video_url: str):
+        video_id = video_url.rsplit('v=', 1)[-1]
+        self.ytdlp_calls.append(video_id)
+        video = self.videos[video_id]
+        if video_id in self.private_ids:
+            return None
+        return {
+            'id': video_id,
+            'title': video['title'],
+            'description': f"Descripción de {video['title']}",
+            'channel_id': video['channel_id'],
+            'duration': video['duration'],
+            'view_count': video['view_count'],
+            'upload_date': video['published'].strftime('%Y%m%d'),
+            'webpage_url': video_url,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--channels', type=int, default=6)
+    parser.add_argument('--videos', type=int, default=25, help="Videos por canal")
+    args = parser.parse_args()
+
+    init_db()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    channels, videos = {}, {}
+    for c in range(args.channels):
+        ids = []
+        for v in range(args.videos):
+            video = fake_video(c * args.videos + v, now)
+            videos[video['id']] = video
+            ids.append(video['id'])
+        channels[f"UC{c}"] = ids
+    all_ids = list(videos)
+    private_ids = {all_ids[3]}
+    # Un video del segundo lote hace fallar la petición entera
+    fail_ids = {all_ids[MAX_IDS_PER_REQUEST + 1]} if len(all_ids) > MAX_IDS_PER_REQUEST else set()
+
+    with tempfile.TemporaryDirectory(prefix="test_youtube_api_") as tmp:
+        channels_file = Path(tmp) / "channels.json"
+        channels_file.write_text(json.dumps({'channels': [
+            {'name': channel_id, 'channel_id': channel_id, 'priority': 1 + i % 3}
+            for i, channel_id in enumerate(channels)
+        ]}))
+
+        server = FakeApiServer(videos, private_ids, fail_ids)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        api = YouTubeDataAPI(api_key=API_KEY, base_url=server.url)
+        api_scraper = FakeScraper(videos, channels, private_ids, details_backend='api', api=api)
+        api_candidates = api_scraper.find_new_videos(channels_file, max_workers=4)
+        ytdlp_scraper = FakeScraper(videos, channels, private_ids, details_backend='ytdlp')
+        ytdlp_candidates = ytdlp_scraper.find_new_videos(channels_file, max_workers=4)
+        server.shutdown()
+
+    failed_batch = next((batch for batch in server.batches if fail_ids & set(batch)), [])
+    checks = {
+        "lotes de <= 50 IDs": all(len(batch) <= MAX_IDS_PER_REQUEST for batch in server.batches),
+        "peticiones = ceil(IDs / 50)": len(server.batches) == -(-len(all_ids) // MAX_IDS_PER_REQUEST),
+        "yt-dlp solo para el lote fallido": sorted(api_scraper.ytdlp_calls) == sorted(failed_batch),
+        "video privado no pasa a yt-dlp": not private_ids & set(api_scraper.ytdlp_calls),
+        "hay candidatos": bool(api_candidates),
+        "mismos candidatos que yt-dlp": [c['video']['id'] for c in api_candidates]
+                                        == [c['video']['id'] for c in ytdlp_candidates],
+        "mismos campos de filtro": all(
+            a['video'][f] == b['video'][f]
+            for a, b in zip(api_candidates, ytdlp_candidates)
+            for f in ('upload_date', 'view_count', 'duration', 'channel_id', 'webpage_url')
+        ),
+        "duraciones ISO-8601": parse_duration('PT1H2M3S') == 3723 and parse_duration('P0D') == 0
+                               and parse_duration('bogus') is None,
+    }
+
+    print(f"Videos listados: {len(all_ids)} | candidatos: {len(api_candidates)}")
+    print(f"Backend api:   {api.requests_made} peticiones videos.list, "
+          f"{len(api_scraper.ytdlp_calls)} extracciones yt-dlp de respaldo")
+    print(f"Backend ytdlp: {len(ytdlp_scraper.ytdlp_calls)} extracciones yt-dlp")
+    for name, ok in checks.items():
+        print(f"  [{'OK' if ok else 'FALLO'}] {name}")
+    sys.exit(0 if all(checks.values()) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import json
+import logging
+import subprocess
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Resultados de ffprobe guardados en memoria (por proceso)
+PROBE_CACHE_MAX_ENTRIES = 256
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _number(value, cast=float):
+    """Convierte un valor de ffprobe ('12.5', 'N/A', None) en número o None"""
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+def _frame_rate(value) -> float:
+    """'30000/1001' -> 29.97"""
+    num, _, den = str(value or '').partition('/')
+    num, den = _number(num), _number(den or 1)
+    return num / den if num and den else None
+
+@dataclass
+class MediaInfo:
+    """Resultado de una sola llamada a ffprobe (formato + primer stream de video y de audio)"""
+    path: str
+    duration: float = 0.0
+    size: int = 0
+    bit_rate: int = None
+    format_names: tuple = ()
+    video_codec: str = None
+    width: int = None
+    height: int = None
+    fps: float = None
+    audio_codec: str = None
+    audio_channels: int = None
+    sample_rate: int = None
+    streams: list = field(default_factory=list, repr=False)
+
+    @property
+    def has_video(self) -> bool:
+        return self.video_codec is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio_codec is not None
+
+    @classmethod
+    def from_ffprobe(cls, path, data: dict) -> "MediaInfo":
+        fmt = data.get('format', {})
+        streams = data.get('streams', [])
+        # Las carátulas (mjpeg/png adjuntos) no cuentan como stream de video
+        video = next((s for s in streams if s.get('codec_type') == 'video'
+                      and not s.get('disposition', {}).get('attached_pic')), {})
+        audio = next((s for s in streams if s.get('codec_type') == 'audio'), {})
+
+        duration = _number(fmt.get('duration'))
+        if duration is None:
+            durations = [_number(s.get('duration')) for s in (video, audio) if s]
+            duration = max([d for d in durations if d is not None], default=0.0)
+
+        return cls(
+            path=str(path),
+            duration=duration,
+            size=_number(fmt.get('size'), int) or 0,
+            bit_rate=_number(fmt.get('bit_rate'), int),
+            format_names=tuple(fmt.get('format_name', '').split(',')) if fmt.get('format_name') else (),
+            video_codec=video.get('codec_name'),
+            width=_number(video.get('width'), int),
+            height=_number(video.get('height'), int),
+            fps=_frame_rate(video.get('avg_frame_rate')) or _frame_rate(video.get('r_frame_rate')),
+            audio_codec=audio.get('codec_name'),
+            audio_channels=_number(audio.get('channels'), int),
+            sample_rate=_number(audio.get('sample_rate'), int),
+            streams=streams,
+        )
+
+def probe(file_path) -> MediaInfo:
+    """
+    Analiza un archivo multimedia con UNA llamada a ffprobe (-of json).
+
+    El resultado se cachea por (ruta, mtime, tamaño): el composer y el
+    pipeline pueden pedir la misma información varias veces sin lanzar otro
+    proceso, y un archivo reescrito se vuelve a analizar.
+    Retorna None si el archivo no existe o ffprobe falla.
+    """
+    path = Path(file_path)
+    try:
+        stat = path.stat()
+    except OSError as e:
+        logger.error(f"No se puede analizar {file_path}: {e}")
+        return None
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries',
+        'format=duration,size,bit_rate,format_name:'
+        'stream=index,codec_type,codec_name,width,height,avg_frame_rate,r_frame_rate,'
+        'channels,sample_rate,duration:stream_disposition=attached_pic',
+        '-of', 'json',
+        str(path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        info = MediaInfo.from_ffprobe(path, json.loads(result.stdout))
+    except Exception as e:
+        logger.error(f"Error analizando {file_path} con ffprobe: {e}")
+        return None
+
+    with _cache_lock:
+        _cache[key] = info
+        while len(_cache) > PROBE_CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return info
+
+def clear_probe_cache():
+    with _cache_lock:
+        _cache.clear()
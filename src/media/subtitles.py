@@ -0,0 +1,52 @@
+from pathlib import Path
+
+# Límites de cada subtítulo al agrupar palabras
+MAX_CUE_CHARS = 42
+MAX_CUE_SECONDS = 4.0
+MAX_WORD_GAP = 0.6  # Una pausa mayor abre un subtítulo nuevo
+
+def build_cues(words, max_chars: int = MAX_CUE_CHARS, max_seconds: float = MAX_CUE_SECONDS):
+    """
+    Agrupa tiempos por palabra [(inicio, fin, texto), ...] en subtítulos
+    [(inicio, fin, texto), ...] legibles.
+    """
+    cues = []
+    start = end = None
+    text = ''
+    for word_start, word_end, word in words:
+        word = word.strip()
+        if not word:
+            continue
+        if text:
+            candidate = f"{text} {word}"
+            if (len(candidate) > max_chars
+                    or word_end - start > max_seconds
+                    or word_start - end > MAX_WORD_GAP):
+                cues.append((start, end, text))
+                text = ''
+        if not text:
+            start, text = word_start, word
+        else:
+            text = f"{text} {word}"
+        end = word_end
+    if text:
+        cues.append((start, end, text))
+    return cues
+
+def _timestamp(seconds: float) -> str:
+    """Tiempo SRT: HH:MM:SS,mmm"""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+def write_srt(cues, path) -> str:
+    with open(path, 'w', encoding='utf-8') as f:
+        for index, (start, end, text) in enumerate(cues, start=1):
+            f.write(f"{index}\n{_timestamp(start)} --> {_timestamp(end)}\n{text}\n\n")
+    return str(path)
+
+def subtitle_path_for(audio_path) -> Path:
+    """Ruta del subtítulo .srt sidecar de un audio TTS (mismo nombre)"""
+    return Path(audio_path).with_suffix('.srt')
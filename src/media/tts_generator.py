@@ -1,44 +1,198 @@
 import asyncio
+import hashlib
+import json
 import logging
-from pathlib import Path
+import re
+import threading
+from contextlib import asynccontextmanager
 import edge_tts
-from config.settings import TTS_VOICE, TTS_RATE, TTS_PITCH, PROCESSED_DIR
+from config.settings import (
+    TTS_VOICE,
+    TTS_RATE,
+    TTS_PITCH,
+    TTS_MAX_CONNECTIONS,
+    TTS_BACKEND,
+    TTS_CACHE_MAX_BYTES,
+    PROCESSED_DIR,
+    CACHE_DIR
+)
+from src.utils.cache import DiskCache
+from src.media.subtitles import build_cues, write_srt, subtitle_path_for
 
 logger = logging.getLogger(__name__)
 
-class TTSGenerator:
+_SENTENCE_RE = re.compile(r'(?<=[.!?…;:])\s+')
+
+# Edge TTS emite MP3 CBR a 48kbps: la duración de un segmento se deduce de su tamaño
+MP3_BYTES_PER_SECOND = 48000 / 8
+# Unidades de offset/duration de los eventos WordBoundary (100 ns)
+_TICKS_PER_SECOND = 10_000_000
+
+# Conexiones simultáneas al backend de todo el proceso: los workers de la etapa
+# api generan audio a la vez (cada uno con su asyncio.run) y se reparten este límite
+_connection_slots = threading.BoundedSemaphore(max(1, TTS_MAX_CONNECTIONS))
+# Cada cuánto vuelve a probar una frase que espera conexión
+_SLOT_POLL_SECONDS = 0.02
+
+@asynccontextmanager
+async def _connection(slots):
+    """Toma una conexión de slots sin bloquear el event loop; esperar se puede cancelar sin perderla"""
+    while not slots.acquire(blocking=False):
+        await asyncio.sleep(_SLOT_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        slots.release()
+
+def split_sentences(text: str) -> list:
+    """Divide el guion en frases (unidad de síntesis y de caché)"""
+    return [s.strip() for s in _SENTENCE_RE.split(text.strip()) if s.strip()]
+
+class EdgeTTSBackend:
+    """
+    Síntesis con Edge TTS (MP3 24kHz 48kbps mono).
+    Retorna (audio, palabras) con los tiempos de los eventos WordBoundary
+    [(inicio_s, fin_s, texto), ...] capturados en la misma pasada del stream.
+    """
+    name = "edge"
+
+    async def synthesize(self, text: str, voice: str, rate: str, pitch: str):
+        communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch)
+        audio = bytearray()
+        words = []
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                audio.extend(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                start = chunk["offset"] / _TICKS_PER_SECOND
+                words.append((start, start + chunk["duration"] / _TICKS_PER_SECOND, chunk["text"]))
+        return bytes(audio), words
+
+class OfflineTTSBackend:
+    """
+    Backend sin red para pruebas locales: genera frames MP3 de silencio
+    (mismo formato que Edge TTS) con una duración proporcional al texto.
+    """
+    name = "offline"
+    # Frame MPEG-2 Layer III, 48kbps, 24kHz, mono: 144 bytes = 24ms
+    FRAME = bytes([0xFF, 0xF3, 0x64, 0xC0]) + bytes(140)
+    SECONDS_PER_WORD = 0.4
+
     def __init__(self):
+        self.calls = 0
+
+    async def synthesize(self, text: str, voice: str, rate: str, pitch: str):
+        self.calls += 1
+        tokens = text.split()
+        frames = max(1, int(len(tokens) * self.SECONDS_PER_WORD / 0.024))
+        words = [
+            (i * self.SECONDS_PER_WORD, (i + 1) * self.SECONDS_PER_WORD, token)
+            for i, token in enumerate(tokens)
+        ]
+        return self.FRAME * frames, words
+
+# Backends por nombre (TTS_BACKEND)
+BACKENDS = {backend.name: backend for backend in (EdgeTTSBackend, OfflineTTSBackend)}
+
+class TTSGenerator:
+    """
+    Genera el audio del guion frase a frase:
+    - Las frases se sintetizan en paralelo, como mucho TTS_MAX_CONNECTIONS a
+      la vez en todo el proceso (connections, compartido entre generadores).
+    - Cada frase se guarda en caché por hash de (texto, voz, rate, pitch), así
+      que reejecuciones e intros/outros repetidos no vuelven a sintetizarse.
+    - El MP3 final es la concatenación de los frames, sin recodificar.
+    - Los tiempos por palabra del TTS generan un subtítulo .srt junto al audio
+      (mismo nombre), listo para que VideoComposer lo agregue como pista.
+    """
+
+    def __init__(self, backend=None, use_cache: bool = True, connections: threading.BoundedSemaphore = None):
         self.voice = TTS_VOICE
         self.rate = TTS_RATE
         self.pitch = TTS_PITCH
+        if backend is None:
+            if TTS_BACKEND not in BACKENDS:
+                logger.warning(f"TTS_BACKEND={TTS_BACKEND} desconocido: se usa edge")
+            backend = BACKENDS.get(TTS_BACKEND, EdgeTTSBackend)()
+        self.backend = backend
+        self.connections = connections or _connection_slots
+        self.cache = DiskCache(CACHE_DIR / 'tts.db', max_bytes=TTS_CACHE_MAX_BYTES) if use_cache else None
 
-    async def generate_audio(self, text: str, output_filename: str) -> str:
-        """
-        Genera audio a partir de texto usando Edge TTS.
-        
-        Args:
-            text (str): Texto a convertir
-            output_filename (str): Nombre del archivo de salida (sin ruta completa)
-            
-        Returns:
-            str: Ruta absoluta del archivo de audio generado
-        """
+    def _cache_key(self, sentence: str) -> str:
+        payload = json.dumps([self.backend.name, sentence, self.voice, self.rate, self.pitch], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def _synthesize_sentence(self, sentence: str):
+        """Retorna (audio, palabras) de una frase, desde caché si está disponible"""
+        key = self._cache_key(sentence)
+        if self.cache:
+            audio = self.cache.get(key)
+            words = self.cache.get_json(f"{key}:words") if audio is not None else None
+            if audio is not None and words is not None:
+                return audio, [tuple(w) for w in words]
+
+        async with _connection(self.connections):
+            audio, words = await self.backend.synthesize(sentence, self.voice, self.rate, self.pitch)
+        if not audio:
+            raise RuntimeError(f"Audio vacío para la frase: {sentence[:40]}...")
+        if self.cache:
+            self.cache.set(key, audio)
+            self.cache.set_json(f"{key}:words", words)
+        return audio, words
+
+    async def _generate(self, text: str, output_filename: str) -> str:
         output_path = PROCESSED_DIR / output_filename
-        
+
         # Asegurar que el directorio existe
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        
+
         try:
-            communicate = edge_tts.Communicate(text, self.voice, rate=self.rate, pitch=self.pitch)
-            await communicate.save(str(output_path))
-            
-            logger.info(f"Audio generado exitosamente: {output_path}")
+            sentences = split_sentences(text)
+            if not sentences:
+                raise ValueError("Texto vacío")
+
+            # Frases repetidas dentro del guion se sintetizan una sola vez
+            unique = list(dict.fromkeys(sentences))
+            results = await asyncio.gather(
+                *(self._synthesize_sentence(sentence) for sentence in unique)
+            )
+            by_sentence = dict(zip(unique, results))
+
+            # Escribir los frames MP3 en orden (mismo formato, sin recodificar) y
+            # desplazar los tiempos de cada palabra por la duración acumulada
+            words = []
+            offset = 0.0
+            with open(output_path, 'wb') as f:
+                for sentence in sentences:
+                    audio, sentence_words = by_sentence[sentence]
+                    f.write(audio)
+                    words.extend((offset + start, offset + end, word) for start, end, word in sentence_words)
+                    offset += len(audio) / MP3_BYTES_PER_SECOND
+
+            if words:
+                subtitle_path = write_srt(build_cues(words), subtitle_path_for(output_path))
+                logger.info(f"Subtítulos generados: {subtitle_path}")
+
+            logger.info(f"Audio generado exitosamente: {output_path} ({len(sentences)} frases)")
             return str(output_path)
-            
+
         except Exception as e:
             logger.error(f"Error generando TTS: {e}")
             return None
 
+    async def generate_audio(self, text: str, output_filename: str) -> str:
+        """
+        Genera audio a partir de texto.
+
+        Args:
+            text (str): Texto a convertir
+            output_filename (str): Nombre del archivo de salida (sin ruta completa)
+
+        Returns:
+            str: Ruta absoluta del archivo de audio generado
+        """
+        return await self._generate(text, output_filename)
+
     def generate_audio_sync(self, text: str, output_filename: str) -> str:
         """Wrapper síncrono para generar audio"""
         return asyncio.run(self.generate_audio(text, output_filename))
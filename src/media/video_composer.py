@@ -1,87 +1,393 @@
 import subprocess
 import logging
-import json
+import textwrap
+import threading
 from pathlib import Path
 from config.settings import (
     OUTPUT_VIDEO_CODEC,
     OUTPUT_AUDIO_CODEC,
-    OUTPUT_VIDEO_BITRATE,
     OUTPUT_AUDIO_BITRATE,
     ORIGINAL_AUDIO_VOLUME,
+    VIDEO_STREAM_COPY,
+    STREAM_COPY_CODECS,
+    STREAM_COPY_FORMATS,
+    STREAM_COPY_MAX_OVERRUN,
+    RENDER_SKIP_INTRO,
+    ENCODING_PROFILES,
+    ENCODING_PROFILE,
+    FFMPEG_THREAD_BUDGET,
+    PIPELINE_RENDER_WORKERS,
+    SHORTS_ENABLED,
+    SHORTS_WIDTH,
+    SHORTS_HEIGHT,
+    SHORTS_STYLE,
+    SHORTS_MAX_DURATION,
+    SHORTS_FONT,
     PROCESSED_DIR
 )
+from src.media.probe import probe, MediaInfo
 
 logger = logging.getLogger(__name__)
 
+def highlight_start(video_duration: float, clip_duration: float, skip_intro: float = RENDER_SKIP_INTRO) -> float:
+    """
+    Inicio del fragmento del original a usar: salta skip_intro segundos si el
+    video es lo bastante largo para que el fragmento quepa completo después.
+    """
+    if skip_intro <= 0 or video_duration <= 0:
+        return 0.0
+    return max(0.0, min(skip_intro, video_duration - clip_duration))
+
+def encoder_args(profile: str = ENCODING_PROFILE) -> list:
+    """Argumentos de FFmpeg del codificador de video para un perfil de ENCODING_PROFILES"""
+    if profile not in ENCODING_PROFILES:
+        raise ValueError(f"Perfil de codificación desconocido: {profile} (opciones: {', '.join(ENCODING_PROFILES)})")
+    settings = ENCODING_PROFILES[profile]
+    args = ['-c:v', OUTPUT_VIDEO_CODEC, '-preset', settings['preset']]
+    if settings.get('tune'):
+        args += ['-tune', settings['tune']]
+    if settings.get('crf') is not None:
+        args += ['-crf', str(settings['crf'])]
+        if settings.get('maxrate'):
+            # CRF con techo: la calidad es constante salvo en escenas muy complejas
+            args += ['-maxrate', settings['maxrate'], '-bufsize', settings['bufsize']]
+    else:
+        args += ['-b:v', settings['bitrate']]
+    # Compatibilidad con cualquier reproductor (YouTube acepta otros, pero reprocesa)
+    return args + ['-pix_fmt', 'yuv420p']
+
+def split_threads(total: int, copy_video: bool = False, shorts: bool = False) -> tuple:
+    """
+    Reparte los hilos de un render (total) entre el grafo de filtros, el
+    encoder de la salida horizontal y el del Short: (filtros, principal, Short).
+    - Sin Short: todo para el encoder; el grafo solo mezcla audio (1 hilo, casi sin CPU).
+    - Short con copia: la salida horizontal no codifica; mitad grafo, mitad Short.
+    - Short recodificando: un tercio al grafo y el resto entre los dos
+      encoders, lo que sobra para el Short (1080x1920, más píxeles).
+    Cada parte usa al menos un hilo: con total menor que las partes se pasa del total.
+    """
+    total = max(1, total)
+    if not shorts:
+        return 1, total, 0
+    if copy_video:
+        filter_threads = max(1, total // 2)
+        return filter_threads, 1, max(1, total - filter_threads)
+    filter_threads = max(1, total // 3)
+    main_threads = max(1, (total - filter_threads) // 2)
+    return filter_threads, main_threads, max(1, total - filter_threads - main_threads)
+
+def shorts_path_for(output_path) -> Path:
+    """Ruta del Short 9:16 que acompaña a un render horizontal ({nombre}_short.mp4)"""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}_short{output_path.suffix}")
+
+def _escape_filter_value(value: str) -> str:
+    """Escapa un valor (ruta, estilo) para usarlo dentro de -filter_complex"""
+    value = str(value)
+    # Nivel 1: valor de una opción del filtro
+    for char in ('\\', "'", ':'):
+        value = value.replace(char, '\\' + char)
+    # Nivel 2: descripción del filtergraph
+    for char in ('\\', "'", '[', ']', ',', ';'):
+        value = value.replace(char, '\\' + char)
+    return value
+
+def shorts_filter(source: str, output: str, subtitle_path: str = None, title_path: str = None,
+                  style: str = SHORTS_STYLE, width: int = SHORTS_WIDTH, height: int = SHORTS_HEIGHT) -> str:
+    """
+    Cadena de filter_complex que convierte el video [source] en un Short
+    vertical [output] de width x height:
+    - blur: el cuadro completo centrado sobre una copia ampliada y desenfocada
+      (el desenfoque se hace a 1/4 de resolución, es lo más caro del filtro).
+    - crop: recorte central a pantalla completa.
+    Después se queman los subtítulos del TTS y el título (si se pasan).
+    """
+    if style == 'blur':
+        chain = (
+            f"[{source}]split=2[shorts_bg][shorts_fg];"
+            f"[shorts_bg]scale={width // 4}:{height // 4}:force_original_aspect_ratio=increase,"
+            f"crop={width // 4}:{height // 4},boxblur=10:2,scale={width}:{height},setsar=1[shorts_blur];"
+            f"[shorts_fg]scale={width}:-2,setsar=1[shorts_main];"
+            f"[shorts_blur][shorts_main]overlay=(W-w)/2:(H-h)/2"
+        )
+    elif style == 'crop':
+        chain = f"[{source}]scale=-2:{height},crop={width}:{height},setsar=1"
+    else:
+        raise ValueError(f"Estilo de Short desconocido: {style} (opciones: blur, crop)")
+
+    font = 'fontfile' if Path(SHORTS_FONT).suffix else 'font'
+    if subtitle_path:
+        style_value = (f"FontName={SHORTS_FONT if font == 'font' else Path(SHORTS_FONT).stem},"
+                       "FontSize=12,Bold=1,Outline=2,Shadow=0,Alignment=2,MarginV=60")
+        chain += (f",subtitles=filename={_escape_filter_value(subtitle_path)}"
+                  f":force_style={_escape_filter_value(style_value)}")
+    if title_path:
+        chain += (f",drawtext=textfile={_escape_filter_value(title_path)}:expansion=none"
+                  f":{font}={_escape_filter_value(SHORTS_FONT)}:fontsize=64:fontcolor=white:line_spacing=12"
+                  f":box=1:boxcolor=black@0.55:boxborderw=24:x=(w-text_w)/2:y=h*0.1")
+    return f"{chain}[{output}]"
+
 class VideoComposer:
-    def __init__(self):
-        pass
+    """
+    Render de los videos finales con FFmpeg.
+
+    Los hilos de FFmpeg salen de un presupuesto fijo (thread_budget, por
+    defecto los CPUs del contenedor) repartido entre max_concurrent renders:
+    con varios renders en paralelo cada uno usa su parte en lugar de lanzar
+    un hilo por núcleo y sobresuscribir la CPU. Un render extra espera turno.
+    """
+
+    def __init__(self, stream_copy: bool = VIDEO_STREAM_COPY, profile: str = ENCODING_PROFILE,
+                 thread_budget: int = FFMPEG_THREAD_BUDGET, max_concurrent: int = PIPELINE_RENDER_WORKERS,
+                 shorts: bool = SHORTS_ENABLED, shorts_style: str = SHORTS_STYLE):
+        self.stream_copy = stream_copy
+        self.shorts = shorts
+        self.shorts_style = shorts_style
+        encoder_args(profile)  # Valida el perfil al construir
+        self.profile = profile
+        self.max_concurrent = max(1, max_concurrent)
+        self.threads = max(1, thread_budget // self.max_concurrent)
+        self._render_slots = threading.BoundedSemaphore(self.max_concurrent)
+
+    def probe(self, file_path: str) -> MediaInfo:
+        """Información del archivo (una llamada a ffprobe, cacheada por ruta/mtime/tamaño)"""
+        return probe(file_path)
 
     def get_duration(self, file_path: str) -> float:
         """Obtiene la duración de un archivo multimedia usando ffprobe"""
+        info = self.probe(file_path)
+        return info.duration if info else 0.0
+
+    def can_copy_video(self, file_path: str) -> bool:
+        """True si el video ya está en un códec y contenedor aptos para subir sin recodificar"""
+        info = self.probe(file_path)
+        if not info or not info.has_video:
+            return False
+        return info.video_codec in STREAM_COPY_CODECS and any(f in STREAM_COPY_FORMATS for f in info.format_names)
+
+    def find_keyframe_after(self, file_path: str, position: float, window: float = 30.0) -> float:
+        """
+        Retorna el tiempo del primer keyframe de video en o después de position
+        (o None si no hay ninguno en la ventana). Lee solo los paquetes de la
+        ventana [position, position + window], sin decodificar.
+        """
         cmd = [
-            'ffprobe', 
-            '-v', 'error', 
-            '-show_entries', 'format=duration', 
-            '-of', 'default=noprint_wrappers=1:nokey=1', 
+            'ffprobe',
+            '-v', 'error',
+            '-select_streams', 'v:0',
+            '-read_intervals', f"{max(0.0, position - 1):.3f}%+{window:.3f}",
+            '-show_entries', 'packet=pts_time,flags',
+            '-of', 'csv=p=0',
             str(file_path)
         ]
         try:
             result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return float(result.stdout.strip())
         except Exception as e:
-            logger.error(f"Error obteniendo duración de {file_path}: {e}")
-            return 0.0
+            logger.warning(f"No se pudieron leer los keyframes de {file_path}: {e}")
+            return None
+
+        keyframes = []
+        for line in result.stdout.splitlines():
+            pts_time, _, flags = line.partition(',')
+            if 'K' in flags and pts_time not in ('', 'N/A'):
+                keyframes.append(float(pts_time))
+        candidates = [t for t in keyframes if t >= position]
+        return min(candidates) if candidates else None
 
-    def combine_video_audio(self, video_path: str, audio_path: str, output_filename: str) -> str:
+    def build_command(self, video_path: str, audio_path: str, output_path, duration: float,
+                      start_time: float = 0.0, copy_video: bool = False, subtitle_path: str = None,
+                      original_audio: bool = True, profile: str = None, threads: int = None,
+                      shorts_path=None, title_path: str = None) -> list:
         """
-        Combina video y audio:
-        - Mantiene el video original pero ajusta su volumen.
-        - Agrega el audio TTS como track principal.
-        - Corta el video para que coincida con la duración del audio TTS (si el video es más largo).
+        Construye el comando FFmpeg del render.
+
+        El recorte se aplica como opción de ENTRADA (-ss/-t antes de -i): FFmpeg
+        no demultiplexa ni decodifica nada del original fuera de
+        [start_time, start_time + duration].
+        Con original_audio=False (el original no tiene audio) no hay mezcla:
+        la única pista de audio es la del TTS.
+        Con shorts_path, la misma pasada escribe también el Short 9:16: el video
+        decodificado y la mezcla de audio se reparten con split/asplit entre
+        las dos salidas (subtítulos y title_path quemados solo en el Short).
+        profile y threads (hilos de todo el render, repartidos con split_threads)
+        por defecto son los del composer.
         """
-        output_path = PROCESSED_DIR / output_filename
-        
-        # Obtener duraciones
-        video_duration = self.get_duration(video_path)
-        audio_duration = self.get_duration(audio_path)
-        
-        logger.info(f"Duración Video: {video_duration}s, Audio TTS: {audio_duration}s")
-        
-        # Lógica de recorte: El video final durará lo que dure el audio TTS (más un margen pequeño)
-        # Si el video es más corto que el audio, tendríamos un problema (pantalla negra),
-        # pero para este MVP asumimos que el video original es largo y el resumen es corto.
-        
-        # Comando FFmpeg complejo
-        # 1. Input 0: Video
+        # 1. Input 0: Video (solo la ventana que se usa)
         # 2. Input 1: Audio TTS
         # 3. Filter_complex:
         #    [0:a]volume=0.1[a0]; -> Bajar volumen audio original
-        #    [a0][1:a]amix=inputs=2:duration=longest[a_out] -> Mezclar audios
-        #    -t {audio_duration} -> Cortar video al final del audio
-        
+        #    [a0][1:a]amix=inputs=2:duration=first[a_out] -> Mezclar audios
+        # Con el Short el grafo escala, desenfoca y quema texto a 1080x1920: grafo y
+        # encoders se reparten los hilos del render para no pasar de su parte
+        filter_threads, main_threads, shorts_threads = split_threads(
+            threads or self.threads, copy_video, bool(shorts_path))
         cmd = [
-            'ffmpeg',
-            '-y',  # Sobreescribir
+            'ffmpeg', '-y',  # Sobreescribir
+            '-filter_complex_threads', str(filter_threads),
+        ]
+        if start_time > 0:
+            cmd += ['-ss', f"{start_time:.3f}"]
+        cmd += [
+            '-t', f"{duration:.3f}",
             '-i', str(video_path),
             '-i', str(audio_path),
-            '-filter_complex',
-            f'[0:a]volume={ORIGINAL_AUDIO_VOLUME}[original_audio];[original_audio][1:a]amix=inputs=2:duration=first:dropout_transition=2[a_out]',
-            '-map', '0:v',
-            '-map', '[a_out]',
-            '-c:v', OUTPUT_VIDEO_CODEC,
-            '-b:v', OUTPUT_VIDEO_BITRATE,
+        ]
+        if subtitle_path:
+            cmd += ['-i', str(subtitle_path)]
+
+        filters = []
+        video_map = '0:v'
+        audio_map = '1:a'
+        if original_audio:
+            filters.append(
+                f'[0:a]volume={ORIGINAL_AUDIO_VOLUME}[original_audio];[original_audio][1:a]amix=inputs=2:duration=first:dropout_transition=2[a_out]'
+            )
+            audio_map = '[a_out]'
+        if shorts_path:
+            # Un solo decode alimenta ambas salidas. Con copia, la horizontal usa
+            # los paquetes originales y el decode solo alimenta el Short.
+            shorts_source = '0:v'
+            if not copy_video:
+                filters.append('[0:v]split=2[v_out][v_shorts_src]')
+                video_map, shorts_source = '[v_out]', 'v_shorts_src'
+            filters.append(shorts_filter(shorts_source, 'v_shorts', subtitle_path, title_path, self.shorts_style))
+            filters.append(f"[{audio_map.strip('[]')}]asplit=2[a_main][a_shorts]")
+            audio_map = '[a_main]'
+        if filters:
+            cmd += ['-filter_complex', ';'.join(filters)]
+
+        # Salida horizontal
+        cmd += ['-map', video_map, '-map', audio_map]
+        if subtitle_path:
+            cmd += ['-map', '2:s', '-c:s', 'mov_text', '-metadata:s:s:0', 'language=spa']
+        if copy_video:
+            cmd += ['-c:v', 'copy']
+        else:
+            cmd += encoder_args(profile or self.profile)
+        cmd += self._output_args(duration, main_threads) + [str(output_path)]
+
+        # Salida vertical (Short)
+        if shorts_path:
+            cmd += ['-map', '[v_shorts]', '-map', '[a_shorts]']
+            cmd += encoder_args(profile or self.profile)
+            cmd += self._output_args(min(duration, SHORTS_MAX_DURATION), shorts_threads) + [str(shorts_path)]
+        return cmd
+
+    def _output_args(self, duration: float, threads: int) -> list:
+        return [
+            '-threads', str(threads),
             '-c:a', OUTPUT_AUDIO_CODEC,
             '-b:a', OUTPUT_AUDIO_BITRATE,
-            '-t', str(audio_duration + 1), # Dar 1 segundo extra
-            str(output_path)
+            '-t', f"{duration:.3f}",
+            '-movflags', '+faststart',
         ]
-        
-        logger.info(f"Comenzando renderizado: {output_filename}")
+
+    def combine_video_audio(self, video_path: str, audio_path: str, output_filename: str,
+                            subtitle_path: str = None, start_time: float = None,
+                            shorts: bool = None, title: str = None) -> str:
+        """
+        Combina video y audio:
+        - Mantiene el video original pero ajusta su volumen.
+        - Agrega el audio TTS como track principal.
+        - Corta el video para que coincida con la duración del audio TTS (si el video es más largo).
+        - Si se pasa subtitle_path (.srt del TTS), lo agrega como pista de subtítulos
+          seleccionable (mov_text), sin quemarlo en la imagen.
+        - start_time elige dónde empieza el fragmento del original (por defecto
+          highlight_start: 0 o saltando RENDER_SKIP_INTRO segundos).
+        - Con shorts (por defecto SHORTS_ENABLED) la misma pasada de FFmpeg
+          escribe también el Short 9:16 (shorts_path_for(salida)) con los
+          subtítulos y el title quemados.
+
+        Fast path: si el video ya es H.264 en MP4 se copia sin recodificar
+        (-c:v copy) y se corta en el primer keyframe en o después del final del
+        audio TTS. Solo se recodifica cuando el códec/contenedor no sirven o el
+        keyframe queda demasiado lejos (STREAM_COPY_MAX_OVERRUN).
+        """
+        output_path = PROCESSED_DIR / output_filename
+        # Se renderiza a un archivo .part y se renombra al terminar:
+        # un render interrumpido nunca deja un output_path a medias
+        partial_path = output_path.with_name(f"{output_path.stem}.part{output_path.suffix}")
+        shorts = self.shorts if shorts is None else shorts
+        shorts_path = shorts_path_for(output_path) if shorts else None
+        shorts_partial = shorts_path.with_name(f"{shorts_path.stem}.part{shorts_path.suffix}") if shorts else None
+        title_path = None
+
+        # Analizar ambos archivos (una llamada a ffprobe por archivo, cacheada)
+        video_info = self.probe(video_path)
+        audio_info = self.probe(audio_path)
+        if not video_info or not video_info.has_video:
+            logger.error(f"El archivo de video no es válido o no tiene pista de video: {video_path}")
+            return None
+        if not audio_info or not audio_info.has_audio:
+            logger.error(f"El audio TTS no es válido: {audio_path}")
+            return None
+        video_duration = video_info.duration
+        audio_duration = audio_info.duration
+
+        logger.info(f"Duración Video: {video_duration}s, Audio TTS: {audio_duration}s")
+        if not video_info.has_audio:
+            logger.info("El video original no tiene audio: se usa solo el audio TTS")
+
+        # Lógica de recorte: El video final durará lo que dure el audio TTS (más un margen pequeño)
+        # Si el video es más corto que el audio, tendríamos un problema (pantalla negra),
+        # pero para este MVP asumimos que el video original es largo y el resumen es corto.
+        output_duration = audio_duration + 1  # Dar 1 segundo extra
+        if start_time is None:
+            start_time = highlight_start(video_duration, output_duration)
+        copy_video = False
+
+        if self.stream_copy and self.can_copy_video(video_path):
+            # Con copia, el inicio también debe caer en un keyframe
+            if start_time > 0:
+                start_time = self.find_keyframe_after(video_path, start_time) or 0.0
+            end = start_time + audio_duration
+            keyframe = self.find_keyframe_after(video_path, end)
+            if keyframe is not None and keyframe - end <= STREAM_COPY_MAX_OVERRUN:
+                output_duration = keyframe - start_time
+                copy_video = True
+                logger.info(f"Fast path: copia de video sin recodificar, corte en keyframe {keyframe:.2f}s")
+            elif keyframe is None and video_duration <= end + STREAM_COPY_MAX_OVERRUN:
+                # El video termina antes de cualquier keyframe posterior: se copia hasta el final
+                output_duration = video_duration - start_time
+                copy_video = True
+                logger.info("Fast path: copia de video sin recodificar hasta el final del video")
+            else:
+                logger.info("Keyframe demasiado lejos del final del audio, se recodifica")
+
+        if start_time > 0:
+            logger.info(f"Fragmento del original: desde {start_time:.2f}s")
+
+        if shorts:
+            if output_duration > SHORTS_MAX_DURATION:
+                logger.warning(f"El Short se corta a {SHORTS_MAX_DURATION}s (audio TTS de {audio_duration:.0f}s)")
+            if title:
+                # drawtext lee el título de un archivo: evita escapar el texto dentro del filtro
+                title_path = output_path.with_name(f"{output_path.stem}.title.txt")
+                title_path.write_text(textwrap.fill(title, width=24), encoding='utf-8')
+
+        cmd = self.build_command(
+            video_path, audio_path, partial_path, output_duration,
+            start_time=start_time, copy_video=copy_video, subtitle_path=subtitle_path,
+            original_audio=video_info.has_audio, shorts_path=shorts_partial, title_path=title_path
+        )
+
+        logger.info(f"Comenzando renderizado: {output_filename}{' + Short' if shorts else ''} "
+                    f"({'copia' if copy_video else self.profile}, {self.threads} hilos)")
         try:
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            with self._render_slots:
+                subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            partial_path.replace(output_path)
+            if shorts:
+                shorts_partial.replace(shorts_path)
+                logger.info(f"Short renderizado: {shorts_path}")
             logger.info(f"Video renderizado exitosamente: {output_path}")
             return str(output_path)
         except subprocess.CalledProcessError as e:
             logger.error(f"Error en FFmpeg: {e.stderr.decode()}")
+            partial_path.unlink(missing_ok=True)
+            if shorts:
+                shorts_partial.unlink(missing_ok=True)
             return None
+        finally:
+            if title_path:
+                title_path.unlink(missing_ok=True)
@@ -0,0 +1,228 @@
+"""
+Cola de trabajo sobre la tabla videos para varios procesos (workers) que
+comparten la base de datos.
+
+- Cada video pendiente es un trabajo. Un worker lo toma con un lease
+  (lease_owner, lease_expires_at) mediante un UPDATE condicional: solo gana
+  quien lo encuentra libre o vencido, así que dos workers nunca procesan el
+  mismo video a la vez.
+- Mientras procesa, el worker renueva el lease (heartbeat) cada tercio de
+  WORKER_LEASE_SECONDS. Si el proceso muere, el lease vence y otro worker
+  retoma el video desde el último checkpoint guardado en la fila.
+- Cada checkpoint se guarda con Lease.commit: en la misma transacción, un
+  UPDATE condicional (lease_owner = este worker) renueva el lease. Si el
+  lease venció y otro worker tomó el video, no se guarda nada y se lanza
+  LeaseLost: el worker deja el video sin tocar la fila.
+- Un worker puede limitarse a algunas etapas (p. ej. solo 'render'): solo
+  toma videos cuya siguiente etapa es suya y suelta el resto al llegar a una
+  etapa ajena.
+"""
+import logging
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, not_, true, func
+from config.settings import PIPELINE_MAX_ATTEMPTS, WORKER_LEASE_SECONDS
+from src.utils.database import SessionLocal, Video
+
+logger = logging.getLogger(__name__)
+
+# Etapas del pipeline, en orden (los subtítulos del original van con 'api', son su input)
+STAGES = ('api', 'download', 'render')
+
+# Estados que indican trabajo sin terminar (se reanudan en la siguiente ejecución)
+RESUMABLE_STATUSES = ('pending', 'downloaded', 'processing')
+
+# Candidatos que se leen por intento de claim (si otro worker gana uno se prueba el siguiente)
+_CLAIM_BATCH = 20
+
+def resumable_filter(max_attempts: int = PIPELINE_MAX_ATTEMPTS):
+    """
+    Videos interrumpidos o fallidos con reintentos disponibles. Los errores de
+    subida (upload_attempts) no son del pipeline: rehacer las etapas no los arregla.
+    """
+    return or_(
+        Video.status.in_(RESUMABLE_STATUSES),
+        and_(Video.status == 'error', or_(Video.attempts.is_(None), Video.attempts < max_attempts),
+             or_(Video.upload_attempts.is_(None), Video.upload_attempts == 0))
+    )
+
+def next_stage_filter(stages=STAGES):
+    """
+    Videos cuya siguiente etapa está en stages, según los checkpoints de la
+    fila (process_video comprueba además los archivos en disco).
+    """
+    # Un None de Python en la columna JSON puede quedar como NULL o como el texto 'null'
+    needs_api = or_(Video.summary.is_(None), Video.audio_path.is_(None),
+                    Video.metadata_json.is_(None), func.json_type(Video.metadata_json) == 'null')
+    by_stage = {
+        'api': needs_api,
+        'download': and_(not_(needs_api), Video.file_path.is_(None)),
+        'render': and_(not_(needs_api), Video.file_path.isnot(None)),
+    }
+    if set(STAGES) <= set(stages):
+        return true()
+    return or_(*(by_stage[stage] for stage in stages))
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class LeaseLost(Exception):
+    """El lease del video venció y lo tomó otro worker: este debe dejar de procesarlo"""
+
+class Lease:
+    """
+    Lease activo de un video. lost se activa cuando el heartbeat o un
+    checkpoint descubren que el video ya es de otro worker.
+    """
+
+    def __init__(self, queue: 'JobQueue', youtube_id: str):
+        self.queue = queue
+        self.youtube_id = youtube_id
+        self.lost = threading.Event()
+
+    def _lose(self):
+        self.lost.set()
+        raise LeaseLost(f"{self.youtube_id}: lease perdido, otro worker tomó el video")
+
+    def check(self):
+        """Lanza LeaseLost si el heartbeat ya vio que el lease es de otro worker"""
+        if self.lost.is_set():
+            self._lose()
+
+    def commit(self, db):
+        """
+        Commit de un checkpoint solo si el lease sigue siendo de este worker
+        (lo renueva en la misma transacción). Si no, rollback y LeaseLost.
+        """
+        renewed = db.query(Video).filter(
+            Video.youtube_id == self.youtube_id, Video.lease_owner == self.queue.worker_id
+        ).update({
+            Video.lease_expires_at: datetime.utcnow() + timedelta(seconds=self.queue.lease_seconds)
+        }, synchronize_session=False)
+        if renewed != 1:
+            db.rollback()
+            self._lose()
+        db.commit()
+
+class JobQueue:
+    """
+    Leases de videos para un worker (worker_id). Todas las operaciones son
+    una sentencia UPDATE condicional y su commit: atómicas entre procesos.
+    """
+
+    def __init__(self, worker_id: str = None, lease_seconds: float = WORKER_LEASE_SECONDS,
+                 max_attempts: int = PIPELINE_MAX_ATTEMPTS):
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def _lease_free(self, now: datetime):
+        return or_(Video.lease_owner.is_(None), Video.lease_expires_at.is_(None), Video.lease_expires_at < now)
+
+    def _take(self, db, youtube_id: str, now: datetime) -> bool:
+        """Compare-and-set: toma el lease solo si el video sigue pendiente y libre o vencido"""
+        claimed = db.query(Video).filter(
+            Video.youtube_id == youtube_id, resumable_filter(self.max_attempts), self._lease_free(now)
+        ).update({
+            Video.lease_owner: self.worker_id,
+            Video.lease_expires_at: now + timedelta(seconds=self.lease_seconds),
+        }, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+
+    def claim(self, stages=STAGES) -> str:
+        """
+        Toma el video pendiente más antiguo cuya siguiente etapa está en stages
+        y retorna su youtube_id (None si no hay ninguno libre).
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            rows = db.query(Video.youtube_id, Video.lease_owner).filter(
+                resumable_filter(self.max_attempts), next_stage_filter(stages), self._lease_free(now)
+            ).order_by(Video.created_at).limit(_CLAIM_BATCH).all()
+            for youtube_id, previous_owner in rows:
+                if self._take(db, youtube_id, now):
+                    if previous_owner and previous_owner != self.worker_id:
+                        logger.warning(f"{youtube_id}: lease de {previous_owner} vencido, se retoma")
+                    return youtube_id
+            return None
+        except Exception as e:
+            logger.error(f"Error tomando trabajo de la cola: {e}")
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def claim_id(self, youtube_id: str) -> bool:
+        """Toma el lease de un video concreto; False si otro worker lo tiene o ya no está pendiente"""
+        db = SessionLocal()
+        try:
+            return self._take(db, youtube_id, datetime.utcnow())
+        finally:
+            db.close()
+
+    def heartbeat(self, youtube_id: str) -> bool:
+        """Renueva el lease; False si ya no es de este worker (venció y otro lo tomó)"""
+        db = SessionLocal()
+        try:
+            renewed = db.query(Video).filter(
+                Video.youtube_id == youtube_id, Video.lease_owner == self.worker_id
+            ).update({
+                Video.lease_expires_at: datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+            }, synchronize_session=False)
+            db.commit()
+            return renewed == 1
+        finally:
+            db.close()
+
+    def release(self, youtube_id: str):
+        """Suelta el lease (si sigue siendo de este worker)"""
+        db = SessionLocal()
+        try:
+            db.query(Video).filter(
+                Video.youtube_id == youtube_id, Video.lease_owner == self.worker_id
+            ).update({Video.lease_owner: None, Video.lease_expires_at: None}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    @contextmanager
+    def lease(self, youtube_id: str):
+        """
+        Mantiene el lease de un video ya tomado mientras dura el bloque
+        (heartbeat en un hilo aparte), retorna su Lease y lo suelta al salir.
+        """
+        stop = threading.Event()
+        lease = Lease(self, youtube_id)
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    if not self.heartbeat(youtube_id):
+                        logger.error(f"{youtube_id}: lease perdido, otro worker puede estar procesándolo")
+                        lease.lost.set()
+                        return
+                except Exception as e:
+                    # Un fallo puntual (base de datos bloqueada) se reintenta en el siguiente latido
+                    logger.warning(f"{youtube_id}: error renovando el lease: {e}")
+
+        heartbeat = threading.Thread(target=beat, name=f"lease-{youtube_id}", daemon=True)
+        heartbeat.start()
+        try:
+            yield lease
+        finally:
+            stop.set()
+            heartbeat.join()
+            self.release(youtube_id)
+
+    def outstanding(self) -> int:
+        """Videos con trabajo pendiente (libres o en proceso en algún worker)"""
+        db = SessionLocal()
+        try:
+            return db.query(Video).filter(resumable_filter(self.max_attempts)).count()
+        finally:
+            db.close()
@@ -0,0 +1,442 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from config.settings import (
+    DOWNLOAD_DIR,
+    PROCESSED_DIR,
+    PIPELINE_DOWNLOAD_WORKERS,
+    PIPELINE_API_WORKERS,
+    PIPELINE_RENDER_WORKERS,
+    PIPELINE_MAX_ATTEMPTS,
+    DOWNLOAD_RANGES_ENABLED,
+    DOWNLOAD_RANGE_MARGIN,
+    WORKER_POLL_INTERVAL
+)
+from src.utils.database import SessionLocal, Video, video_from_info
+from src.pipeline.job_queue import JobQueue, LeaseLost, STAGES, resumable_filter
+from src.processor.vtt_parser import find_subtitle_file, vtt_to_transcript
+from src.media.subtitles import subtitle_path_for
+from src.media.video_composer import shorts_path_for, highlight_start
+
+logger = logging.getLogger(__name__)
+
+# Restos de una descarga de yt-dlp interrumpida (formatos sin fusionar, .part, .ytdl)
+_PARTIAL_DOWNLOAD_PATTERNS = ('{id}.*part*', '{id}.part', '{id}.*.ytdl', '{id}.f[0-9]*.*', '{id}.temp.*')
+
+def _file_ok(path) -> bool:
+    """True si path apunta a un archivo existente y no vacío"""
+    return bool(path) and Path(path).is_file() and Path(path).stat().st_size > 0
+
+class _StageHandoff(Exception):
+    """La siguiente etapa del video no es de este worker"""
+
+class VideoPipeline:
+    """
+    Procesa varios videos en paralelo con un pool acotado por etapa:
+
+    - download: I/O (yt-dlp), PIPELINE_DOWNLOAD_WORKERS
+    - api: Gemini + TTS, PIPELINE_API_WORKERS
+    - render: FFmpeg (CPU), PIPELINE_RENDER_WORKERS (<= núcleos)
+
+    Orden por video: subtítulos (download) -> guion y TTS (api) -> tramo del
+    video que cubre el audio TTS (download) -> render.
+
+    Cada video avanza por las etapas de forma independiente, así que el video B
+    puede estar descargándose mientras el A se renderiza. Un fallo solo marca
+    como 'error' la fila de ese video.
+
+    La salida de cada etapa se guarda en la fila Video (file_path, summary,
+    metadata_json, audio_path, render_path). Una nueva ejecución retoma cada
+    video desde la última etapa completada en lugar de empezar de cero.
+
+    Cada video se procesa con su lease de la cola (JobQueue): varios procesos
+    (run_daily.py y workers de scripts/run_worker.py) comparten la base de
+    datos sin procesar nunca el mismo video a la vez. Si el lease se pierde
+    (venció y otro worker tomó el video), el video se deja a medias sin
+    guardar nada más: cada checkpoint se guarda solo si el lease sigue siendo
+    de este worker.
+    """
+
+    def __init__(self, scraper, gemini, tts, composer,
+                 download_workers: int = PIPELINE_DOWNLOAD_WORKERS,
+                 api_workers: int = PIPELINE_API_WORKERS,
+                 render_workers: int = PIPELINE_RENDER_WORKERS,
+                 max_attempts: int = PIPELINE_MAX_ATTEMPTS,
+                 download_ranges: bool = DOWNLOAD_RANGES_ENABLED,
+                 queue: JobQueue = None):
+        self.scraper = scraper
+        self.gemini = gemini
+        self.tts = tts
+        self.composer = composer
+        self.download_workers = max(1, download_workers)
+        self.api_workers = max(1, api_workers)
+        self.render_workers = max(1, render_workers)
+        self.max_attempts = max_attempts
+        self.download_ranges = download_ranges
+        self.queue = queue or JobQueue(max_attempts=max_attempts)
+
+    def run(self, candidates, resume: bool = True) -> list:
+        """
+        Registra los candidatos (formato de YouTubeScraper.find_new_videos) y los
+        procesa junto con los videos pendientes de ejecuciones anteriores. Los
+        videos que tiene otro worker se omiten.
+
+        Hay a lo sumo tantos videos en curso como hilos suman las etapas, y
+        cada uno se toma de la cola (lease) al empezar, no al registrarse: los
+        que esperan turno siguen libres para los workers de scripts/run_worker.py.
+        Retorna un resultado por video:
+        {'youtube_id', 'status', 'final_video_path', 'shorts_video_path', 'metadata', 'error', 'next_stage'}
+        """
+        youtube_ids = self.register(candidates)
+        if resume:
+            youtube_ids += [vid for vid in self.resumable_ids() if vid not in youtube_ids]
+        if not youtube_ids:
+            return []
+
+        # Suficientes videos en curso para tener todas las etapas ocupadas a la vez
+        in_flight = min(len(youtube_ids), self.download_workers + self.api_workers + self.render_workers)
+        with self.stage_pools(), ThreadPoolExecutor(in_flight, thread_name_prefix='video') as video_pool:
+            results = [r for r in video_pool.map(self._process_leased, youtube_ids) if r]
+
+        ready = sum(1 for r in results if r['status'] == 'ready')
+        logger.info(f"Pipeline: {ready}/{len(results)} videos listos")
+        self._log_cache_stats()
+        return results
+
+    @contextmanager
+    def stage_pools(self):
+        """Pools acotados de las etapas (download, api, render) mientras dura el bloque"""
+        with ThreadPoolExecutor(self.download_workers, thread_name_prefix='download') as download_pool, \
+                ThreadPoolExecutor(self.api_workers, thread_name_prefix='api') as api_pool, \
+                ThreadPoolExecutor(self.render_workers, thread_name_prefix='render') as render_pool:
+            self._pools = {'download': download_pool, 'api': api_pool, 'render': render_pool}
+            yield
+
+    def _process_leased(self, youtube_id: str, stages=STAGES) -> dict:
+        """process_video con el lease del video tomado (None si lo tiene otro worker o ya no está pendiente)"""
+        if not self.queue.claim_id(youtube_id):
+            logger.info(f"{youtube_id}: en proceso en otro worker o ya procesado, se omite")
+            return None
+        with self.queue.lease(youtube_id) as lease:
+            return self.process_video(youtube_id, stages, lease)
+
+    def work(self, stages=STAGES, concurrency: int = 1, idle_sleep: float = WORKER_POLL_INTERVAL,
+             stop: threading.Event = None, until_empty: bool = False) -> list:
+        """
+        Bucle de worker: toma de la cola los videos que esperan una etapa de
+        stages y los procesa con el lease renovado, `concurrency` videos a la
+        vez. Con la cola vacía espera idle_sleep segundos. Termina con stop o,
+        si until_empty, cuando no queda trabajo pendiente en ningún worker.
+        Retorna los resultados de process_video.
+        """
+        stop = stop or threading.Event()
+        results = []
+
+        def loop():
+            while not stop.is_set():
+                youtube_id = self.queue.claim(stages)
+                if youtube_id is None:
+                    if until_empty and not self.queue.outstanding():
+                        return
+                    stop.wait(idle_sleep)
+                    continue
+                with self.queue.lease(youtube_id) as lease:
+                    result = self.process_video(youtube_id, stages, lease)
+                if result:
+                    results.append(result)
+
+        logger.info(f"Worker {self.queue.worker_id}: etapas {', '.join(stages)}, {concurrency} videos a la vez")
+        with self.stage_pools(), ThreadPoolExecutor(concurrency, thread_name_prefix='worker') as pool:
+            for future in [pool.submit(loop) for _ in range(max(1, concurrency))]:
+                future.result()
+        return results
+
+    def _log_cache_stats(self):
+        """Registra la tasa de aciertos de la caché de respuestas de Gemini"""
+        stats = self.gemini.cache_stats() if hasattr(self.gemini, 'cache_stats') else {}
+        if stats:
+            logger.info(
+                f"Caché de Gemini: {stats['hits']} aciertos, {stats['misses']} fallos "
+                f"(hit rate {stats['hit_rate']:.0%}, {stats['entries']} entradas, {stats['bytes'] / 1024:.0f} KB)"
+            )
+
+    def register(self, candidates) -> list:
+        """Crea las filas 'pending' de los candidatos nuevos y retorna sus youtube_id"""
+        youtube_ids = []
+        db = SessionLocal()
+        try:
+            for candidate in candidates or []:
+                video_details = candidate['video']
+                if db.query(Video).filter_by(youtube_id=video_details['id']).first():
+                    continue
+                logger.info(f"Registrando candidato: {video_details['title']} (Score: {candidate['score']:.2f})")
+                db.add(video_from_info(video_details))
+                db.commit()
+                youtube_ids.append(video_details['id'])
+        finally:
+            db.close()
+        return youtube_ids
+
+    def resumable_ids(self) -> list:
+        """Videos interrumpidos o fallidos con reintentos disponibles"""
+        db = SessionLocal()
+        try:
+            rows = db.query(Video.youtube_id).filter(
+                resumable_filter(self.max_attempts)
+            ).order_by(Video.created_at).all()
+            return [row[0] for row in rows]
+        finally:
+            db.close()
+
+    def _in_stage(self, stage: str, func, *args, **kwargs):
+        """Ejecuta func en el pool de la etapa y espera su resultado"""
+        return self._pools[stage].submit(func, *args, **kwargs).result()
+
+    @staticmethod
+    def _commit(db, lease=None):
+        """Guarda un checkpoint; con lease, solo si el video sigue siendo de este worker"""
+        if lease:
+            lease.commit(db)
+        else:
+            db.commit()
+
+    def _save_outcome(self, db, lease) -> bool:
+        """Guarda el estado final de un intento; False si el lease se perdió (la fila es de otro worker)"""
+        try:
+            self._commit(db, lease)
+            return True
+        except LeaseLost as lost:
+            logger.warning(f"{lost}, no se guarda el resultado")
+            return False
+
+    def process_video(self, youtube_id: str, stages=STAGES, lease=None) -> dict:
+        """
+        Lleva un video por api -> download -> render saltando las etapas ya
+        completadas. Con stages limitado se detiene en la primera etapa ajena
+        y deja el video en su estado para un worker de esa etapa.
+
+        Con lease (JobQueue.lease) no empieza ninguna etapa con el lease
+        perdido y cada checkpoint se guarda solo si sigue siendo de este
+        worker. Retorna None si se pierde: el video es del otro worker.
+        """
+        result = {
+            'youtube_id': youtube_id,
+            'status': 'error',
+            'final_video_path': None,
+            'shorts_video_path': None,
+            'metadata': None,
+            'error': None,
+            'next_stage': None,
+        }
+
+        db = SessionLocal()
+        video_record = None
+        try:
+            video_record = db.query(Video).filter_by(youtube_id=youtube_id).one()
+            video_record.attempts = (video_record.attempts or 0) + 1
+            video_record.error_message = None
+            self._commit(db, lease)
+            logger.info(f"Procesando {youtube_id}: {video_record.title} (intento {video_record.attempts})")
+
+            self._cleanup_interrupted(video_record)
+
+            # 1-2. Subtítulos del original (input de Gemini), luego guion, metadata y
+            #      audio TTS (cada salida se guarda al completarse). El video se descarga
+            #      después del TTS, cuando ya se sabe qué tramo va a usar el render
+            if not (video_record.summary and video_record.metadata_json and _file_ok(video_record.audio_path)):
+                if 'api' not in stages:
+                    raise _StageHandoff('api')
+                if lease:
+                    lease.check()
+                if not video_record.transcript and not find_subtitle_file(youtube_id):
+                    self._in_stage('download', self.scraper.download_subtitles, video_record.url)
+                video_record.status = "processing"
+                self._commit(db, lease)
+                self._in_stage('api', self._generate, db, video_record, lease)
+
+            # 3. Descargar Video (solo el tramo que cubre el audio TTS)
+            section = self._download_section(video_record)
+            if _file_ok(video_record.file_path) and self._download_covers(video_record, section):
+                logger.info(f"{youtube_id}: descarga ya completada, se reutiliza {video_record.file_path}")
+            else:
+                if 'download' not in stages:
+                    # Un archivo que no cubre el tramo no sirve: sin él la fila espera a un worker de download
+                    video_record.file_path = None
+                    raise _StageHandoff('download')
+                if lease:
+                    lease.check()
+                if section:
+                    logger.info(f"{youtube_id}: descargando el tramo {section[0]:.1f}-{section[1]:.1f}s")
+                video_path = self._in_stage('download', self.scraper.download_video, video_record.url, section)
+                if not video_path:
+                    raise Exception("Fallo en descarga")
+                video_record.file_path = video_path
+                video_record.download_start, video_record.download_end = section or (None, None)
+                video_record.status = "downloaded"
+                self._commit(db, lease)
+
+            # 4. Componer Video (+ Short 9:16 en la misma pasada si está activado)
+            shorts_pending = self.composer.shorts and not _file_ok(video_record.shorts_path)
+            if _file_ok(video_record.render_path) and not shorts_pending:
+                logger.info(f"{youtube_id}: render ya completado")
+            else:
+                if 'render' not in stages:
+                    raise _StageHandoff('render')
+                if lease:
+                    lease.check()
+                output_filename = f"{youtube_id}_final.mp4"
+                # Subtítulos del TTS (tiempos por palabra) como pista seleccionable
+                subtitle_path = subtitle_path_for(video_record.audio_path)
+                final_video_path = self._in_stage(
+                    'render', self.composer.combine_video_audio,
+                    video_record.file_path, video_record.audio_path, output_filename,
+                    str(subtitle_path) if _file_ok(subtitle_path) else None,
+                    # Un tramo descargado ya empieza donde debe empezar el fragmento
+                    start_time=0.0 if video_record.download_start is not None else None,
+                    title=(video_record.metadata_json or {}).get('title') or video_record.title
+                )
+                if not final_video_path:
+                    raise Exception("Fallo componiendo video")
+                video_record.render_path = final_video_path
+                if self.composer.shorts and _file_ok(shorts_path_for(final_video_path)):
+                    video_record.shorts_path = str(shorts_path_for(final_video_path))
+
+            video_record.status = "ready"
+            self._commit(db, lease)
+            result.update(
+                status=video_record.status,
+                final_video_path=video_record.render_path,
+                shorts_video_path=video_record.shorts_path,
+                metadata=video_record.metadata_json
+            )
+
+        except _StageHandoff as handoff:
+            # No cuenta como intento: el video sigue en la cola para un worker de esa etapa
+            video_record.attempts -= 1
+            if not self._save_outcome(db, lease):
+                return None
+            logger.info(f"{youtube_id}: siguiente etapa '{handoff}', queda para otro worker")
+            result.update(status=video_record.status, next_stage=str(handoff))
+
+        except LeaseLost as lost:
+            # La fila ya es del otro worker: no se toca (el rollback descartó los cambios)
+            logger.warning(f"{lost}, se deja de procesar")
+            return None
+
+        except Exception as e:
+            logger.error(f"Fallo procesando {youtube_id}: {e}")
+            result['error'] = str(e)
+            db.rollback()
+            if video_record is not None:
+                video_record.status = "error"
+                video_record.error_message = str(e)
+                if not self._save_outcome(db, lease):
+                    return None
+        finally:
+            db.close()
+
+        return result
+
+    def _download_section(self, video_record: Video):
+        """
+        Tramo (inicio, fin) del original que usará el render: la duración del
+        audio TTS más los márgenes, desde highlight_start. None para descargar
+        el video completo (rangos desactivados o el tramo sería todo el video).
+        """
+        if not self.download_ranges:
+            return None
+        audio_info = self.composer.probe(video_record.audio_path)
+        if not audio_info:
+            return None
+        # +1 s: el render dura lo que el audio más un segundo
+        clip_duration = audio_info.duration + 1 + DOWNLOAD_RANGE_MARGIN
+        video_duration = video_record.duration or 0
+        if video_duration and clip_duration >= video_duration:
+            return None
+        start = highlight_start(video_duration, clip_duration)
+        return (start, start + clip_duration)
+
+    def _download_covers(self, video_record: Video, section) -> bool:
+        """True si el archivo descargado sirve para section (un video completo siempre sirve)"""
+        if video_record.download_start is None:
+            return True
+        if section is None or video_record.download_end is None:
+            return False
+        return video_record.download_end - video_record.download_start >= section[1] - section[0]
+
+    def _generate(self, db, video_record: Video, lease=None):
+        """Etapa api: transcripción (.vtt), guion y metadata con Gemini, luego audio TTS"""
+        if not video_record.transcript:
+            vtt_path = find_subtitle_file(video_record.youtube_id)
+            if vtt_path:
+                video_record.transcript = vtt_to_transcript(vtt_path)
+                self._commit(db, lease)
+                logger.info(f"{video_record.youtube_id}: transcripción extraída de {vtt_path.name} "
+                            f"({len(video_record.transcript)} caracteres)")
+
+        # Sin subtítulos, el título y la descripción son el único input disponible
+        transcript_input = video_record.transcript or f"{video_record.title}\n{video_record.description or ''}"
+
+        if not video_record.summary and not video_record.metadata_json:
+            # Guion + metadata en una sola llamada (con fallback interno a dos llamadas)
+            content = self.gemini.generate_script_and_metadata(transcript_input)
+            if not content:
+                raise Exception("Fallo generando resumen")
+            video_record.summary = content.pop('script')
+            video_record.metadata_json = content
+            self._commit(db, lease)
+
+        if not video_record.summary:
+            summary_script = self.gemini.generate_summary(transcript_input)
+            if not summary_script:
+                raise Exception("Fallo generando resumen")
+            video_record.summary = summary_script
+            self._commit(db, lease)
+
+        if not video_record.metadata_json:
+            video_record.metadata_json = self.gemini.generate_metadata(video_record.summary)
+            self._commit(db, lease)
+
+        if not _file_ok(video_record.audio_path):
+            audio_filename = f"{video_record.youtube_id}_tts.mp3"
+            audio_path = self.tts.generate_audio_sync(video_record.summary, audio_filename)
+            if not audio_path:
+                raise Exception("Fallo generando audio")
+            video_record.audio_path = audio_path
+            self._commit(db, lease)
+
+    def _cleanup_interrupted(self, video_record: Video):
+        """
+        Elimina restos de una ejecución interrumpida: fragmentos de descarga de
+        yt-dlp (si la descarga no llegó a registrarse) y renders .part de FFmpeg.
+        Las rutas registradas que ya no existen en disco (o que ffprobe no
+        puede leer) se olvidan.
+        """
+        youtube_id = video_record.youtube_id
+        leftovers = []
+        if not _file_ok(video_record.file_path):
+            for pattern in _PARTIAL_DOWNLOAD_PATTERNS:
+                leftovers += DOWNLOAD_DIR.glob(pattern.format(id=youtube_id))
+        leftovers += PROCESSED_DIR.glob(f"{youtube_id}_final*.part.*")
+
+        for path in leftovers:
+            logger.info(f"{youtube_id}: eliminando resto de ejecución interrumpida {path.name}")
+            path.unlink(missing_ok=True)
+
+        for field in ('file_path', 'audio_path', 'render_path', 'shorts_path'):
+            if getattr(video_record, field) and not _file_ok(getattr(video_record, field)):
+                logger.warning(f"{youtube_id}: {field} registrado pero no existe, se rehace la etapa")
+                setattr(video_record, field, None)
+
+        # Un video que existe pero ffprobe no puede leer (descarga o render
+        # truncados) también se rehace. El análisis queda en la caché de probe
+        # y el render lo reutiliza sin lanzar otro ffprobe.
+        for field in ('file_path', 'render_path', 'shorts_path'):
+            path = getattr(video_record, field)
+            if path:
+                info = self.composer.probe(path)
+                if not info or not info.has_video:
+                    logger.warning(f"{youtube_id}: {field} no es un video válido, se rehace la etapa")
+                    setattr(video_record, field, None)
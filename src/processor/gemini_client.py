@@ -1,23 +1,280 @@
 import google.generativeai as genai
+import hashlib
+import json
 import logging
-from config.settings import GEMINI_API_KEY
+import re
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    GEMINI_CHUNK_TOKENS,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_REQUESTS_PER_MINUTE,
+    GEMINI_CACHE_ENABLED,
+    GEMINI_CACHE_MAX_ENTRIES,
+    GEMINI_CACHE_MAX_BYTES,
+    GEMINI_CACHE_TTL,
+    CACHE_DIR
+)
+from src.utils.cache import DiskCache
+from src.utils.rate_limit import RateLimiter
 
 logger = logging.getLogger(__name__)
 
+# Estimación de tokens sin llamar a la API (~4 caracteres por token)
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?…])\s+')
+
+# Limitador compartido por todos los clientes del proceso
+_rate_limiter = RateLimiter(GEMINI_REQUESTS_PER_MINUTE)
+
+# Versión de cada plantilla de prompt: subirla al cambiar el texto invalida su caché
+PROMPT_VERSIONS = {
+    'script': 1,
+    'chunk_notes': 1,
+    'translate': 1,
+    'metadata': 1,
+    'script_metadata': 1,
+}
+
+# Metadata por defecto si Gemini no devuelve un JSON válido
+FALLBACK_TITLE = "Novedades de IA - Resumen Diario"
+FALLBACK_TAGS = ["IA", "Inteligencia Artificial", "Tecnología"]
+
+def extract_json_object(text: str):
+    """
+    Extrae el primer objeto JSON válido de una respuesta del modelo, aunque venga
+    rodeado de texto o de un bloque ```json```. Recorre el texto una sola vez
+    siguiendo llaves y comillas (incluidos escapes) y prueba cada objeto de
+    nivel superior completo. Retorna el dict o None.
+    """
+    depth = 0
+    start = None
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"' and depth > 0:
+            in_string = True
+        elif char == '{':
+            if depth == 0:
+                start = index
+            depth += 1
+        elif char == '}' and depth > 0:
+            depth -= 1
+            if depth == 0:
+                try:
+                    value = json.loads(text[start:index + 1])
+                except ValueError:
+                    continue
+                if isinstance(value, dict):
+                    return value
+    return None
+
+def validate_metadata(data, require_script: bool = False) -> dict:
+    """
+    Valida y normaliza el JSON de metadata (title, description, tags y opcionalmente script).
+    Lanza ValueError si falta un campo o tiene un tipo inválido.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("La respuesta no es un objeto JSON")
+    fields = ('script', 'title', 'description') if require_script else ('title', 'description')
+    for field in fields:
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            raise ValueError(f"Campo '{field}' ausente o vacío")
+    tags = data.get('tags')
+    if isinstance(tags, str):
+        tags = [t for t in (tag.strip() for tag in tags.split(',')) if t]
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError("Campo 'tags' debe ser una lista de textos")
+
+    result = {
+        'title': data['title'].strip(),
+        'description': data['description'].strip(),
+        'tags': [tag.strip() for tag in tags if tag.strip()],
+    }
+    if require_script:
+        result['script'] = data['script'].strip()
+    return result
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def split_transcript(text: str, max_tokens: int) -> list:
+    """
+    Divide la transcripción en bloques de como máximo max_tokens (estimados).
+    Corta por líneas (párrafos con marca de tiempo), luego por frases y, solo
+    si una frase no cabe, por palabras.
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+
+    units = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) <= max_chars:
+            units.append(line)
+            continue
+        for sentence in _SENTENCE_RE.split(line):
+            if len(sentence) <= max_chars:
+                units.append(sentence)
+                continue
+            words, current = sentence.split(), ''
+            for word in words:
+                if current and len(current) + 1 + len(word) > max_chars:
+                    units.append(current)
+                    current = word
+                else:
+                    current = f"{current} {word}" if current else word
+            if current:
+                units.append(current)
+
+    chunks, current = [], ''
+    for unit in units:
+        if current and len(current) + 1 + len(unit) > max_chars:
+            chunks.append(current)
+            current = unit
+        else:
+            current = f"{current}\n{unit}" if current else unit
+    if current:
+        chunks.append(current)
+    return chunks
+
 class GeminiClient:
-    def __init__(self):
+    def __init__(self, use_cache: bool = GEMINI_CACHE_ENABLED):
         if not GEMINI_API_KEY:
             logger.error("GEMINI_API_KEY no encontrada en variables de entorno")
             raise ValueError("GEMINI_API_KEY is missing")
             
         genai.configure(api_key=GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model_name = GEMINI_MODEL
+        self.model = genai.GenerativeModel(self.model_name)
+        self.cache = DiskCache(
+            CACHE_DIR / 'gemini.db',
+            max_entries=GEMINI_CACHE_MAX_ENTRIES,
+            max_bytes=GEMINI_CACHE_MAX_BYTES
+        ) if use_cache else None
 
-    def generate_summary(self, transcript_text: str) -> str:
+    def _cache_key(self, template: str, prompt: str) -> str:
+        """Hash de (modelo, plantilla, versión de plantilla, prompt con el texto de entrada)"""
+        payload = json.dumps([self.model_name, template, PROMPT_VERSIONS[template], prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _generate(self, prompt: str, template: str, bypass_cache: bool = False) -> str:
+        """
+        Llamada a Gemini respetando el límite de peticiones por minuto.
+        Las respuestas se guardan en caché; bypass_cache fuerza una llamada nueva
+        (y actualiza la entrada).
+        """
+        key = self._cache_key(template, prompt) if self.cache else None
+        if key and not bypass_cache:
+            cached = self.cache.get(key, max_age=GEMINI_CACHE_TTL)
+            if cached is not None:
+                logger.debug(f"Respuesta de Gemini desde caché ({template})")
+                return cached.decode('utf-8')
+
+        _rate_limiter.acquire()
+        response = self.model.generate_content(prompt)
+        text = response.text.strip()
+        if key and text:
+            self.cache.set(key, text.encode('utf-8'))
+        return text
+
+    def _forget(self, prompt: str, template: str):
+        """Elimina de la caché una respuesta que resultó inválida"""
+        if self.cache:
+            self.cache.delete(self._cache_key(template, prompt))
+
+    def cache_stats(self) -> dict:
+        """Estadísticas de la caché de respuestas (vacío si está desactivada)"""
+        return self.cache.stats() if self.cache else {}
+
+    def generate_summary(self, transcript_text: str, token_budget: int = None, bypass_cache: bool = False) -> str:
         """
         Genera un resumen en español del texto proporcionado.
+
+        Si la transcripción supera token_budget (por defecto GEMINI_CHUNK_TOKENS)
+        se resume en modo map-reduce: bloques resumidos en paralelo y un guion
+        final a partir de las notas, sin descartar el final del video.
+        """
+        token_budget = token_budget or GEMINI_CHUNK_TOKENS
+        try:
+            if estimate_tokens(transcript_text) > token_budget:
+                notes = self._map_reduce_notes(transcript_text, token_budget, bypass_cache)
+                if not notes:
+                    return None
+                return self._generate(self._script_prompt(notes, from_notes=True), 'script', bypass_cache)
+            return self._generate(self._script_prompt(transcript_text), 'script', bypass_cache)
+        except Exception as e:
+            logger.error(f"Error generando resumen con Gemini: {e}")
+            return None
+
+    def _map_reduce_notes(self, transcript_text: str, token_budget: int, bypass_cache: bool = False) -> str:
         """
+        Map: resume cada bloque en notas (en paralelo, bajo el rate limit).
+        Reduce: si las notas siguen sin caber en el presupuesto, se condensan
+        de nuevo por bloques hasta que quepan en una sola llamada.
+        """
+        text = transcript_text
+        level = 0
+        while estimate_tokens(text) > token_budget:
+            chunks = split_transcript(text, token_budget)
+            level += 1
+            logger.info(f"Resumen map-reduce (nivel {level}): {len(chunks)} bloques")
+
+            with ThreadPoolExecutor(max_workers=max(1, min(GEMINI_MAX_CONCURRENCY, len(chunks)))) as pool:
+                notes = list(pool.map(
+                    lambda item: self._chunk_notes(item[1], item[0], len(chunks), bypass_cache),
+                    enumerate(chunks, start=1)
+                ))
+
+            failed = notes.count(None)
+            if failed == len(notes):
+                logger.error("Ningún bloque pudo resumirse")
+                return None
+            if failed:
+                logger.warning(f"{failed}/{len(notes)} bloques sin resumir, se continúa con el resto")
+            condensed = '\n'.join(n for n in notes if n)
+            if estimate_tokens(condensed) >= estimate_tokens(text):
+                # Las notas no reducen el texto: evitar un bucle infinito
+                break
+            text = condensed
+        return text
+
+    def _chunk_notes(self, chunk: str, index: int, total: int, bypass_cache: bool = False) -> str:
+        """Resume un bloque de la transcripción en notas breves"""
         prompt = f"""
+        Estás resumiendo la parte {index} de {total} de la transcripción de un video de YouTube.
+        Extrae en ESPAÑOL las ideas, datos y afirmaciones clave de esta parte como notas breves
+        (máximo 120 palabras). Conserva las marcas de tiempo [HH:MM:SS] relevantes.
+        No agregues introducciones ni conclusiones.
+
+        Parte {index}/{total}:
+        {chunk}
+
+        Notas:
+        """
+        try:
+            return self._generate(prompt, 'chunk_notes', bypass_cache)
+        except Exception as e:
+            logger.error(f"Error resumiendo bloque {index}/{total}: {e}")
+            return None
+
+    def _script_prompt(self, text: str, from_notes: bool = False) -> str:
+        source = (
+            "Notas (en español) extraídas de todas las partes de la transcripción"
+            if from_notes else "Transcripción original (en inglés)"
+        )
+        return f"""
         Actúa como un editor de video experto. Tu tarea es resumir la siguiente transcripción de un video de YouTube 
         para crear un guion de video corto y atractivo en ESPAÑOL.
         
@@ -28,20 +285,13 @@ class GeminiClient:
         4. Tener una longitud aproximada de 150-200 palabras (apto para un video de 1-2 minutos).
         5. NO usar frases como "En este video..." o "El orador dice...", ve directo al contenido.
         
-        Transcripción original (en inglés):
-        {transcript_text[:10000]}  # Limitamos a 10k caracteres para no exceder quota del tier gratuito si es muy largo
+        {source}:
+        {text}
         
         Guion en Español:
         """
-        
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
-        except Exception as e:
-            logger.error(f"Error generando resumen con Gemini: {e}")
-            return None
 
-    def translate_text(self, text: str) -> str:
+    def translate_text(self, text: str, bypass_cache: bool = False) -> str:
         """
         Traduce texto al español manteniendo el contexto.
         """
@@ -54,13 +304,12 @@ class GeminiClient:
         Traducción:
         """
         try:
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._generate(prompt, 'translate', bypass_cache)
         except Exception as e:
             logger.error(f"Error traduciendo con Gemini: {e}")
             return None
 
-    def generate_metadata(self, summary: str):
+    def generate_metadata(self, summary: str, bypass_cache: bool = False):
         """
         Genera Título, Descripción y Tags OPTIMIZADOS para SEO en YouTube.
         """
@@ -78,21 +327,63 @@ class GeminiClient:
         }}
         """
         try:
-            response = self.model.generate_content(prompt)
-            # Limpiar posible markdown ```json ... ```
-            text = response.text.strip()
-            if text.startswith("```json"):
-                text = text[7:-3]
-            if text.startswith("```"): # Caso generico
-                 text = text[3:-3]
-                 
-            import json
-            return json.loads(text)
+            text = self._generate(prompt, 'metadata', bypass_cache)
+            try:
+                return validate_metadata(extract_json_object(text))
+            except ValueError:
+                self._forget(prompt, 'metadata')
+                raise
         except Exception as e:
             logger.error(f"Error generando metadata: {e}")
             # Fallback simple
             return {
-                "title": "Novedades de IA - Resumen Diario",
+                "title": FALLBACK_TITLE,
                 "description": summary,
-                "tags": ["IA", "Inteligencia Artificial", "Tecnología"]
+                "tags": list(FALLBACK_TAGS)
             }
+
+    def generate_script_and_metadata(self, transcript_text: str, token_budget: int = None,
+                                     bypass_cache: bool = False) -> dict:
+        """
+        Genera guion, título, descripción y tags en UNA sola llamada con respuesta JSON.
+        Retorna {'script', 'title', 'description', 'tags'} o None si no se pudo generar
+        el guion. Si la respuesta no es un JSON válido se recurre al camino de dos
+        llamadas (generate_summary + generate_metadata).
+        """
+        token_budget = token_budget or GEMINI_CHUNK_TOKENS
+        prompt = None
+        try:
+            text = transcript_text
+            from_notes = False
+            if estimate_tokens(transcript_text) > token_budget:
+                text = self._map_reduce_notes(transcript_text, token_budget, bypass_cache)
+                if not text:
+                    return None
+                from_notes = True
+
+            prompt = self._script_metadata_prompt(text, from_notes)
+            response = self._generate(prompt, 'script_metadata', bypass_cache)
+            return validate_metadata(extract_json_object(response), require_script=True)
+        except Exception as e:
+            logger.warning(f"Respuesta combinada inválida, se usa el camino de dos llamadas: {e}")
+            if prompt:
+                self._forget(prompt, 'script_metadata')
+
+        script = self.generate_summary(transcript_text, token_budget, bypass_cache)
+        if not script:
+            return None
+        metadata = self.generate_metadata(script, bypass_cache)
+        return {'script': script, **metadata}
+
+    def _script_metadata_prompt(self, text: str, from_notes: bool = False) -> str:
+        script_instructions = self._script_prompt(text, from_notes).rsplit("Guion en Español:", 1)[0]
+        return f"""{script_instructions}
+        Además del guion, genera los metadatos para YouTube.
+        Responde SOLO con un objeto JSON válido (sin markdown ni texto adicional) con este formato:
+        {{
+            "script": "Guion completo en español",
+            "title": "Título clickbait pero honesto (max 60 car)",
+            "description": "Descripción optimizada con palabras clave (primeras 2 lineas son clave)",
+            "tags": ["tag1", "tag2", "tag3", "tag4", "tag5"]
+        }}
+        """
@@ -0,0 +1,162 @@
+"""
+Parser en streaming de subtítulos WebVTT (auto-captions de YouTube).
+
+Convierte el .vtt que deja yt-dlp en data/downloads en una transcripción limpia:
+- Elimina las líneas repetidas de los subtítulos automáticos "rodantes"
+  (cada cue repite la línea anterior y agrega la nueva).
+- Quita etiquetas (<c>, <00:00:01.000>), entidades HTML y cues de música/sonido
+  ([Music], [Aplausos], ♪).
+- Conserva marcas de tiempo [HH:MM:SS] al inicio de cada párrafo.
+
+Todo funciona con generadores línea a línea: un archivo de varias horas se
+procesa con memoria constante (write_transcript escribe directo a disco).
+"""
+import html
+import re
+from collections import deque
+from pathlib import Path
+from config.settings import DOWNLOAD_DIR
+
+_TIMING_RE = re.compile(
+    r'^\s*((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})\s+-->\s+((?:\d+:)?\d{1,2}:\d{2}[.,]\d{3})'
+)
+_TAG_RE = re.compile(r'<[^>]*>')
+_SOUND_CUE_RE = re.compile(r'\[[^\]]*\]|\([^)]*(?:music|música|applause|aplausos|laughter|risas)[^)]*\)', re.IGNORECASE)
+_MUSIC_RE = re.compile(r'[♪♫♬]+')
+_SPACES_RE = re.compile(r'\s+')
+
+# Segundos de transcripción agrupados bajo una misma marca de tiempo
+PARAGRAPH_SECONDS = 30
+# Líneas recientes contra las que se comparan las nuevas (auto-captions rodantes)
+_DEDUP_WINDOW = 3
+
+
+def parse_timestamp(value: str) -> float:
+    """'01:02:03.450' o '02:03.450' -> segundos"""
+    parts = value.replace(',', '.').split(':')
+    seconds = float(parts[-1])
+    if len(parts) > 1:
+        seconds += int(parts[-2]) * 60
+    if len(parts) > 2:
+        seconds += int(parts[-3]) * 3600
+    return seconds
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def clean_caption_line(line: str) -> str:
+    """Quita etiquetas, entidades y cues de música/sonido de una línea de texto"""
+    line = _TAG_RE.sub('', line)
+    line = html.unescape(line)
+    line = _SOUND_CUE_RE.sub(' ', line)
+    line = _MUSIC_RE.sub(' ', line)
+    return _SPACES_RE.sub(' ', line).strip()
+
+
+def iter_cues(lines):
+    """
+    Recorre las líneas de un WebVTT y produce (inicio, fin, [líneas de texto]) por cue.
+    Ignora la cabecera y los bloques NOTE/STYLE/REGION.
+    """
+    start = end = None
+    text_lines = []
+    skipping_block = False
+
+    for raw in lines:
+        line = raw.rstrip('\r\n')
+
+        # Solo una línea vacía cierra el cue: YouTube usa líneas con un espacio como texto
+        if not line:
+            if start is not None and text_lines:
+                yield start, end, text_lines
+            start = end = None
+            text_lines = []
+            skipping_block = False
+            continue
+
+        if skipping_block:
+            continue
+
+        match = _TIMING_RE.match(line)
+        if match:
+            if start is not None and text_lines:
+                yield start, end, text_lines
+            start, end = parse_timestamp(match.group(1)), parse_timestamp(match.group(2))
+            text_lines = []
+        elif start is not None:
+            text_lines.append(line)
+        elif line.startswith(('NOTE', 'STYLE', 'REGION')):
+            skipping_block = True
+        # Cualquier otra línea fuera de un cue (WEBVTT, Kind:, identificadores) se ignora
+
+    if start is not None and text_lines:
+        yield start, end, text_lines
+
+
+def iter_transcript_lines(lines):
+    """
+    Produce (inicio, texto) por cada línea nueva de la transcripción,
+    descartando las repeticiones de los subtítulos automáticos rodantes.
+    """
+    recent = deque(maxlen=_DEDUP_WINDOW)
+    for start, _end, text_lines in iter_cues(lines):
+        for raw in text_lines:
+            text = clean_caption_line(raw)
+            if not text or text in recent:
+                continue
+            recent.append(text)
+            yield start, text
+
+
+def iter_paragraphs(lines, paragraph_seconds: int = PARAGRAPH_SECONDS):
+    """Agrupa la transcripción en párrafos '[HH:MM:SS] texto' de ~paragraph_seconds"""
+    paragraph_start = None
+    words = []
+    for start, text in iter_transcript_lines(lines):
+        if paragraph_start is not None and start - paragraph_start >= paragraph_seconds:
+            yield f"[{format_timestamp(paragraph_start)}] {' '.join(words)}"
+            paragraph_start, words = None, []
+        if paragraph_start is None:
+            paragraph_start = start
+        words.append(text)
+    if words:
+        yield f"[{format_timestamp(paragraph_start)}] {' '.join(words)}"
+
+
+def vtt_to_transcript(vtt_path, paragraph_seconds: int = PARAGRAPH_SECONDS) -> str:
+    """Lee un .vtt y retorna la transcripción limpia (un párrafo por línea)"""
+    with open(vtt_path, 'r', encoding='utf-8', errors='replace') as f:
+        return '\n'.join(iter_paragraphs(f, paragraph_seconds))
+
+
+def write_transcript(vtt_path, output_path, paragraph_seconds: int = PARAGRAPH_SECONDS) -> int:
+    """
+    Convierte vtt_path en una transcripción en output_path sin cargar ninguno
+    de los dos en memoria. Retorna el número de párrafos escritos.
+    """
+    count = 0
+    with open(vtt_path, 'r', encoding='utf-8', errors='replace') as src, \
+            open(output_path, 'w', encoding='utf-8') as dst:
+        for paragraph in iter_paragraphs(src, paragraph_seconds):
+            dst.write(paragraph + '\n')
+            count += 1
+    return count
+
+
+def find_subtitle_file(video_id: str, langs=('en', 'es'), directory: Path = DOWNLOAD_DIR):
+    """
+    Busca el .vtt descargado por yt-dlp para video_id ({id}.{lang}.vtt),
+    respetando el orden de preferencia de langs. Retorna Path o None.
+    """
+    for lang in langs:
+        exact = directory / f"{video_id}.{lang}.vtt"
+        if exact.is_file():
+            return exact
+        # Variantes regionales u originales: en-US, en-orig...
+        matches = sorted(directory.glob(f"{video_id}.{lang}-*.vtt"))
+        if matches:
+            return matches[0]
+    return None
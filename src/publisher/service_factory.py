@@ -0,0 +1,149 @@
+"""
+Fábrica de clientes de la API de YouTube compartida por todo el proceso.
+
+- Credenciales: token.pickle se lee una sola vez y se refresca de forma
+  proactiva CREDENTIALS_REFRESH_MARGIN segundos antes de expirar (no a mitad
+  de una subida).
+- Discovery: el documento youtube v3 se lee del disco (el que incluye
+  google-api-python-client, o YOUTUBE_DISCOVERY_FILE) y se parsea una vez;
+  build_from_document no hace ninguna petición de red.
+- Transporte: una AuthorizedSession (requests) con pool de conexiones,
+  compartida por las subidas. El servicio de googleapiclient usa httplib2,
+  que no es thread-safe: se construye uno por hilo desde el documento cacheado.
+"""
+import json
+import logging
+import os
+import pickle
+import threading
+from datetime import datetime, timedelta
+import httplib2
+import requests
+from google.auth.transport.requests import Request, AuthorizedSession
+from google_auth_httplib2 import AuthorizedHttp
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from config.settings import (
+    BASE_DIR,
+    YOUTUBE_DISCOVERY_FILE,
+    CREDENTIALS_REFRESH_MARGIN,
+    YOUTUBE_HTTP_POOL_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+SCOPES = ['https://www.googleapis.com/auth/youtube.upload', 'https://www.googleapis.com/auth/youtube.readonly']
+TOKEN_FILE = BASE_DIR / 'config' / 'token.pickle'
+SECRETS_FILE = BASE_DIR / 'config' / 'client_secrets.json'
+
+_lock = threading.RLock()
+_credentials = None
+_token_file = None
+_discovery_doc = None
+_session = None
+_local = threading.local()
+
+def load_discovery_document() -> dict:
+    """Documento de discovery de YouTube v3, leído del disco y parseado una sola vez"""
+    global _discovery_doc
+    with _lock:
+        if _discovery_doc is None:
+            if YOUTUBE_DISCOVERY_FILE:
+                with open(YOUTUBE_DISCOVERY_FILE, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            else:
+                content = discovery_cache.get_static_doc('youtube', 'v3')
+            if not content:
+                raise RuntimeError("No se encontró el documento de discovery de YouTube v3")
+            _discovery_doc = json.loads(content)
+        return _discovery_doc
+
+def _needs_refresh(credentials) -> bool:
+    if not credentials.valid:
+        return True
+    if credentials.expiry is None:
+        return False
+    # google-auth guarda expiry como UTC sin zona horaria
+    return credentials.expiry - datetime.utcnow() < timedelta(seconds=CREDENTIALS_REFRESH_MARGIN)
+
+def _save_token(credentials, token_file):
+    with open(token_file, 'wb') as token:
+        pickle.dump(credentials, token)
+
+def get_credentials(token_file=TOKEN_FILE, secrets_file=SECRETS_FILE, interactive: bool = True):
+    """
+    Credenciales OAuth del proceso. Se cargan de token_file la primera vez y
+    se refrescan antes de expirar. Sin token válido, lanza el flujo
+    interactivo (si interactive). Retorna None si no es posible autenticar.
+    """
+    global _credentials, _token_file
+    with _lock:
+        # Credenciales inyectadas con set_credentials (_token_file None) se respetan
+        if _credentials is None or (_token_file is not None and _token_file != token_file):
+            _credentials, _token_file = None, token_file
+            if os.path.exists(token_file):
+                with open(token_file, 'rb') as token:
+                    _credentials = pickle.load(token)
+
+        if _credentials is not None and not _needs_refresh(_credentials):
+            return _credentials
+
+        if _credentials is not None and _credentials.refresh_token:
+            logger.info("Refrescando token de acceso...")
+            _credentials.refresh(Request(session=_pooled_session()))
+        else:
+            if not interactive or not os.path.exists(secrets_file):
+                logger.error(f"No se encontró {secrets_file}. No se puede autenticar.")
+                return None
+            logger.info("Iniciando flujo de autenticación (requiere interacción)...")
+            flow = InstalledAppFlow.from_client_secrets_file(secrets_file, SCOPES)
+            _credentials = flow.run_local_server(port=0)
+
+        if _token_file is not None:
+            _save_token(_credentials, _token_file)
+        return _credentials
+
+def set_credentials(credentials):
+    """Usa credentials para todo el proceso (pruebas, cuentas de servicio)"""
+    global _credentials, _token_file
+    with _lock:
+        _credentials, _token_file = credentials, None
+
+def _mount_pool(session: requests.Session) -> requests.Session:
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=YOUTUBE_HTTP_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def _pooled_session() -> requests.Session:
+    return _mount_pool(requests.Session())
+
+def get_session(credentials=None) -> AuthorizedSession:
+    """AuthorizedSession compartida (pool de conexiones) para subidas y peticiones directas"""
+    global _session
+    with _lock:
+        credentials = credentials or _credentials
+        if _session is None or _session.credentials is not credentials:
+            _session = _mount_pool(AuthorizedSession(credentials, auth_request=Request(session=_pooled_session())))
+        return _session
+
+def get_service(credentials=None):
+    """
+    Servicio youtube v3 del hilo actual, construido desde el documento de
+    discovery cacheado (sin red). Se reconstruye solo si cambian las credenciales.
+    """
+    credentials = credentials or _credentials
+    service = getattr(_local, 'service', None)
+    if service is None or getattr(_local, 'credentials', None) is not credentials:
+        http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=60))
+        service = build_from_document(load_discovery_document(), http=http)
+        _local.service, _local.credentials = service, credentials
+    return service
+
+def reset():
+    """Olvida todo el estado cacheado (credenciales, discovery y transportes)"""
+    global _credentials, _token_file, _discovery_doc, _session
+    with _lock:
+        _credentials = _token_file = _discovery_doc = _session = None
+        _local.__dict__.clear()
@@ -0,0 +1,231 @@
+"""
+Cola de publicación sobre la tabla videos.
+
+- Los videos 'ready' se publican por orden de llegada (backlog FIFO). Una
+  subida fallida va al final de la cola (upload_attempts) y, tras
+  UPLOAD_MAX_ATTEMPTS fallos, el video pasa a 'error' con el motivo: un video
+  que siempre falla no gasta la cuota del día ni bloquea al resto. Para
+  reintentarlo, volver a poner status 'ready' y upload_attempts 0.
+- Cada subida reserva QUOTA_COST_VIDEO_INSERT unidades en api_quota justo
+  antes de llamar a videos.insert. Sin cuota suficiente la subida se aplaza
+  (el video sigue 'ready' para la siguiente ejecución), no falla.
+- Cada video recibe una franja publishAt libre de PUBLISH_HOURS (un video por
+  franja, a partir de ahora + PUBLISH_MIN_LEAD) y se sube como privado
+  programado.
+- Hasta max_concurrency subidas simultáneas.
+
+El reloj (clock) y el cliente de subida (uploader) se inyectan: la lógica de
+la cola se prueba con un reloj y una API falsos.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import update, func
+from sqlalchemy.dialects.sqlite import insert
+from config.settings import (
+    UPLOAD_MAX_CONCURRENCY,
+    UPLOAD_MAX_ATTEMPTS,
+    YOUTUBE_DAILY_QUOTA,
+    YOUTUBE_QUOTA_TIMEZONE,
+    QUOTA_COST_VIDEO_INSERT,
+    PUBLISH_HOURS,
+    PUBLISH_MIN_LEAD
+)
+from src.utils.database import SessionLocal, Video, ApiQuota
+
+logger = logging.getLogger(__name__)
+
+def utc_now() -> datetime:
+    """Reloj por defecto: UTC sin zona horaria (como el resto de columnas DateTime)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+class QuotaLedger:
+    """Contabilidad de la cuota diaria de la API (se reinicia a medianoche del Pacífico)"""
+
+    def __init__(self, daily_quota: int = YOUTUBE_DAILY_QUOTA, clock=utc_now):
+        self.daily_quota = daily_quota
+        self.clock = clock
+
+    def today(self) -> str:
+        now = self.clock().replace(tzinfo=timezone.utc)
+        return now.astimezone(ZoneInfo(YOUTUBE_QUOTA_TIMEZONE)).date().isoformat()
+
+    def used(self) -> int:
+        db = SessionLocal()
+        try:
+            row = db.get(ApiQuota, self.today())
+            return row.units if row else 0
+        finally:
+            db.close()
+
+    def remaining(self) -> int:
+        return max(0, self.daily_quota - self.used())
+
+    def reserve(self, units: int) -> bool:
+        """
+        Suma units al día actual solo si no supera daily_quota.
+        La comprobación y la suma son una sola sentencia UPDATE: dos subidas
+        concurrentes no pueden gastar la misma cuota.
+        """
+        day = self.today()
+        db = SessionLocal()
+        try:
+            db.execute(insert(ApiQuota).values(day=day, units=0).on_conflict_do_nothing())
+            result = db.execute(
+                update(ApiQuota)
+                .where(ApiQuota.day == day, ApiQuota.units + units <= self.daily_quota)
+                .values(units=ApiQuota.units + units)
+            )
+            db.commit()
+            return result.rowcount == 1
+        finally:
+            db.close()
+
+class UploadScheduler:
+    def __init__(self, uploader, clock=utc_now, ledger: QuotaLedger = None,
+                 max_concurrency: int = UPLOAD_MAX_CONCURRENCY, publish_hours=PUBLISH_HOURS,
+                 min_lead: int = PUBLISH_MIN_LEAD, insert_cost: int = QUOTA_COST_VIDEO_INSERT,
+                 max_attempts: int = UPLOAD_MAX_ATTEMPTS):
+        self.uploader = uploader
+        self.clock = clock
+        self.ledger = ledger or QuotaLedger(clock=clock)
+        self.max_concurrency = max(1, max_concurrency)
+        self.publish_hours = sorted(set(publish_hours))
+        self.min_lead = timedelta(seconds=min_lead)
+        self.insert_cost = insert_cost
+        self.max_attempts = max(1, max_attempts)
+
+    def next_slots(self, count: int, taken=()) -> list:
+        """Las count próximas franjas de publicación libres (UTC, sin zona horaria)"""
+        if not self.publish_hours:
+            return [None] * count
+        earliest = self.clock() + self.min_lead
+        taken = set(taken)
+        slots = []
+        day = earliest.replace(hour=0, minute=0, second=0, microsecond=0)
+        while len(slots) < count:
+            for hour in self.publish_hours:
+                slot = day.replace(hour=hour)
+                if slot >= earliest and slot not in taken and len(slots) < count:
+                    slots.append(slot)
+            day += timedelta(days=1)
+        return slots
+
+    def run(self) -> list:
+        """
+        Publica el backlog 'ready' que cabe en la cuota de hoy.
+        Retorna un resultado por video intentado:
+        {'youtube_id', 'status' (uploaded/deferred/error), 'uploaded_video_id', 'publish_at', 'error'}
+        """
+        db = SessionLocal()
+        try:
+            backlog = (
+                db.query(Video)
+                .filter(Video.status == 'ready', Video.render_path.isnot(None))
+                # Los que ya fallaron, detrás de los nuevos
+                .order_by(func.coalesce(Video.upload_attempts, 0), Video.created_at, Video.id)
+                .all()
+            )
+            if not backlog:
+                logger.info("No hay videos listos para publicar")
+                return []
+
+            # Las subidas a medias ya pagaron su videos.insert: van primero y no consumen cuota nueva
+            backlog.sort(key=lambda video: video.upload_uri is None)
+            affordable = self.ledger.remaining() // self.insert_cost if self.insert_cost else len(backlog)
+            resuming = sum(1 for video in backlog if video.upload_uri)
+            batch = backlog[:resuming + affordable]
+            deferred = [video.youtube_id for video in backlog[len(batch):]]
+            if deferred:
+                logger.info(f"Cuota insuficiente: {len(deferred)} video(s) aplazados para otro día "
+                            f"(restante {self.ledger.remaining()} unidades)")
+
+            # Una subida reanudada (o fallida) conserva su franja si aún está en el futuro;
+            # las demás del lote se reasignan
+            now = self.clock()
+            reassign = {video.id for video in batch
+                        if not (video.publish_at and video.publish_at >= now + self.min_lead)}
+            # Franjas ocupadas: toda fila con publishAt futuro (subidos y 'ready' que
+            # la conservan aunque la cuota los deje fuera de este lote)
+            taken = [
+                publish_at for video_id, publish_at in
+                db.query(Video.id, Video.publish_at).filter(Video.publish_at >= now).all()
+                if video_id not in reassign
+            ]
+            jobs = []
+            for video in batch:
+                if video.id in reassign:
+                    video.publish_at = self.next_slots(1, taken)[0]
+                    taken.append(video.publish_at)
+                metadata = video.metadata_json or {}
+                jobs.append({
+                    'youtube_id': video.youtube_id,
+                    'file_path': video.render_path,
+                    'title': metadata.get('title') or video.title,
+                    'description': metadata.get('description', ''),
+                    'tags': metadata.get('tags', []),
+                    'publish_at': video.publish_at,
+                })
+            db.commit()
+        finally:
+            db.close()
+
+        with ThreadPoolExecutor(self.max_concurrency, thread_name_prefix='upload') as pool:
+            results = list(pool.map(self._upload, jobs))
+
+        results += [{'youtube_id': youtube_id, 'status': 'deferred', 'uploaded_video_id': None,
+                     'publish_at': None, 'error': None} for youtube_id in deferred]
+        uploaded = sum(1 for result in results if result['status'] == 'uploaded')
+        logger.info(f"Publicación: {uploaded} subidos, {len(results) - uploaded} pendientes. "
+                    f"Cuota usada hoy: {self.ledger.used()}/{self.ledger.daily_quota}")
+        return results
+
+    def _upload(self, job: dict) -> dict:
+        result = {'youtube_id': job['youtube_id'], 'status': 'error',
+                  'uploaded_video_id': None, 'publish_at': job['publish_at'], 'error': None}
+        quota = {'denied': False, 'error': None}
+
+        def reserve_quota() -> bool:
+            quota['denied'] = not self.ledger.reserve(self.insert_cost)
+            return not quota['denied']
+
+        def record_error(message: str):
+            quota['error'] = message
+
+        video_id = self.uploader.upload_video(
+            job['file_path'], job['title'], job['description'], job['tags'],
+            youtube_id=job['youtube_id'], publish_at=job['publish_at'],
+            before_insert=reserve_quota, on_error=record_error
+        )
+
+        db = SessionLocal()
+        try:
+            video = db.query(Video).filter_by(youtube_id=job['youtube_id']).one()
+            if video_id:
+                video.status = 'uploaded'
+                video.uploaded_video_id = video_id
+                video.error_message = None
+                result.update(status='uploaded', uploaded_video_id=video_id)
+                logger.info(f"{job['youtube_id']}: publicado como {video_id}, programado para {job['publish_at']}")
+            elif quota['denied']:
+                # Otra subida concurrente gastó la cuota: queda 'ready' para mañana
+                video.publish_at = None
+                result.update(status='deferred', publish_at=None)
+                logger.info(f"{job['youtube_id']}: sin cuota, se aplaza")
+            else:
+                video.upload_attempts = (video.upload_attempts or 0) + 1
+                video.error_message = quota['error'] or "Fallo en la subida"
+                result['error'] = video.error_message
+                if video.upload_attempts >= self.max_attempts:
+                    video.status = 'error'
+                    video.publish_at = None
+                    logger.error(f"{job['youtube_id']}: {video.upload_attempts} subidas fallidas, "
+                                 f"pasa a 'error': {video.error_message}")
+                else:
+                    logger.warning(f"{job['youtube_id']}: fallo en la subida ({video.error_message}), intento "
+                                   f"{video.upload_attempts}/{self.max_attempts}; se reintenta al final de la cola")
+            db.commit()
+        finally:
+            db.close()
+        return result
@@ -1,59 +1,97 @@
 import os
+import json
 import logging
-import pickle
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from config.settings import YOUTUBE_CHANNEL_ID, BASE_DIR
+import random
+import time
+from datetime import datetime
+import requests
+from config.settings import (
+    YOUTUBE_CHANNEL_ID,
+    YOUTUBE_UPLOAD_URL,
+    UPLOAD_CHUNK_SIZE,
+    UPLOAD_MAX_RETRIES,
+    UPLOAD_BACKOFF_BASE,
+    UPLOAD_BACKOFF_MAX
+)
+from src.utils.database import SessionLocal, Video
+from src.publisher import service_factory
 
 logger = logging.getLogger(__name__)
 
-SCOPES = ['https://www.googleapis.com/auth/youtube.upload', 'https://www.googleapis.com/auth/youtube.readonly']
+# El protocolo resumable exige trozos múltiplos de 256 KiB (salvo el último)
+UPLOAD_CHUNK_GRANULARITY = 256 * 1024
+# Respuestas que se reintentan con backoff (además de errores de conexión)
+RETRIABLE_STATUS_CODES = (500, 502, 503, 504)
+
+class UploadSessionExpired(Exception):
+    """La sesión resumable ya no existe en el servidor (404/410): hay que empezar de nuevo"""
+
+def backoff_delay(attempt: int, base: float = UPLOAD_BACKOFF_BASE, cap: float = UPLOAD_BACKOFF_MAX) -> float:
+    """Backoff exponencial con jitter completo: aleatorio en [0, min(cap, base * 2^attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
 
 class YouTubeClient:
-    def __init__(self):
+    """
+    Cliente de la API de YouTube.
+
+    Las subidas usan el protocolo resumable por trozos de chunk_size. La URI de
+    la sesión y los bytes confirmados se guardan en la fila Video (upload_uri,
+    upload_offset): si el proceso muere, la siguiente llamada a upload_video
+    con el mismo youtube_id pregunta al servidor cuánto recibió y continúa
+    desde ahí. upload_url y session permiten probarlo contra un servidor local.
+
+    Credenciales, servicio y transporte HTTP salen de service_factory y se
+    comparten entre todas las instancias del proceso.
+    """
+
+    def __init__(self, upload_url: str = YOUTUBE_UPLOAD_URL, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                 max_retries: int = UPLOAD_MAX_RETRIES, backoff_base: float = UPLOAD_BACKOFF_BASE, session=None):
         self.credentials = None
         self.service = None
-        self.token_file = BASE_DIR / 'config' / 'token.pickle'
-        self.secrets_file = BASE_DIR / 'config' / 'client_secrets.json'
-        
+        self.token_file = service_factory.TOKEN_FILE
+        self.secrets_file = service_factory.SECRETS_FILE
+        self.upload_url = upload_url
+        self.chunk_size = max(1, chunk_size // UPLOAD_CHUNK_GRANULARITY) * UPLOAD_CHUNK_GRANULARITY
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        # requests.Session autenticada; si no se inyecta, la compartida del proceso
+        self._own_session = session is not None
+        self.session = session
+
     def authenticate(self):
-        """Autenticación OAuth 2.0"""
-        if os.path.exists(self.token_file):
-            with open(self.token_file, 'rb') as token:
-                self.credentials = pickle.load(token)
-                
-        if not self.credentials or not self.credentials.valid:
-            if self.credentials and self.credentials.expired and self.credentials.refresh_token:
-                logger.info("Refrescando token de acceso...")
-                self.credentials.refresh(Request())
-            else:
-                if not os.path.exists(self.secrets_file):
-                    logger.error(f"No se encontró {self.secrets_file}. No se puede autenticar.")
-                    return False
-                    
-                logger.info("Iniciando flujo de autenticación (requiere interacción)...")
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.secrets_file, SCOPES)
-                self.credentials = flow.run_local_server(port=0)
-                
-            with open(self.token_file, 'wb') as token:
-                pickle.dump(self.credentials, token)
-                
-        self.service = build('youtube', 'v3', credentials=self.credentials)
+        """
+        Autenticación OAuth 2.0. Barata si el proceso ya está autenticado:
+        solo refresca el token si está por expirar.
+        """
+        self.credentials = service_factory.get_credentials(self.token_file, self.secrets_file)
+        if not self.credentials:
+            return False
+        self.service = service_factory.get_service(self.credentials)
+        if not self._own_session:
+            self.session = service_factory.get_session(self.credentials)
         return True
 
-    def upload_video(self, file_path: str, title: str, description: str, tags: list, category_id: str = "28"):
+    def upload_video(self, file_path: str, title: str, description: str, tags: list,
+                     category_id: str = "28", youtube_id: str = None, publish_at: datetime = None,
+                     before_insert=None, on_error=None):
         """
         Sube un video a YouTube.
         Category 28 = Science & Technology
+
+        Con youtube_id (el del video original en la tabla videos) la sesión de
+        subida se persiste en esa fila y una subida interrumpida se reanuda.
+        Con publish_at (UTC) el video queda privado y YouTube lo publica a esa hora.
+        before_insert() se llama justo antes de abrir una sesión nueva (la
+        llamada videos.insert que consume cuota); si retorna False no se sube.
+        on_error(mensaje) recibe el motivo si la subida falla.
         """
-        if not self.service:
-            if not self.authenticate():
-                logger.error("Fallo autenticación, no se puede subir video.")
-                return None
-        
+        # Refresco proactivo del token antes de empezar (no a mitad de la subida)
+        if not self._own_session and not self.authenticate():
+            logger.error("Fallo autenticación, no se puede subir video.")
+            if on_error:
+                on_error("Fallo autenticación")
+            return None
+
         try:
             body = {
                 'snippet': {
@@ -67,25 +105,162 @@ class YouTubeClient:
                     'selfDeclaredMadeForKids': False
                 }
             }
-            
-            media = MediaFileUpload(file_path, chunksize=-1, resumable=True)
-            
-            logger.info(f"Iniciando subida: {title}")
-            request = self.service.videos().insert(
-                part=','.join(body.keys()),
-                body=body,
-                media_body=media
-            )
-            
-            response = None
-            while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    logger.info(f"Subido {int(status.progress() * 100)}%")
-            
+            if publish_at:
+                body['status']['publishAt'] = publish_at.strftime('%Y-%m-%dT%H:%M:%S.000Z')
+            total = os.path.getsize(file_path)
+
+            upload_uri, offset = self._load_upload_session(youtube_id)
+            if upload_uri:
+                try:
+                    offset, response = self._query_offset(upload_uri, total)
+                    logger.info(f"Reanudando subida de {title} desde {offset}/{total} bytes")
+                except UploadSessionExpired:
+                    logger.warning("La sesión de subida anterior expiró, se empieza de nuevo")
+                    upload_uri, response = None, None
+            if not upload_uri:
+                if before_insert and not before_insert():
+                    logger.info(f"Subida de {title} aplazada")
+                    return None
+                logger.info(f"Iniciando subida: {title}")
+                upload_uri = self._start_session(body, total)
+                offset, response = 0, None
+                self._save_upload_session(youtube_id, upload_uri, 0)
+
+            if response is None:
+                response = self._upload_chunks(file_path, upload_uri, offset, total, youtube_id)
+
+            self._save_upload_session(youtube_id, None, None)
             logger.info(f"Subida completada! Video ID: {response.get('id')}")
             return response.get('id')
             
         except Exception as e:
             logger.error(f"Error subiendo video: {e}")
+            if on_error:
+                on_error(f"{type(e).__name__}: {e}")
             return None
+
+    def _request(self, method: str, url: str, **kwargs):
+        """
+        Petición HTTP con reintentos: errores de conexión y 5xx se reintentan
+        con backoff exponencial y jitter. 404/410 sobre la sesión lanzan
+        UploadSessionExpired.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code in (404, 410):
+                    raise UploadSessionExpired(f"{response.status_code} en {url}")
+                if response.status_code not in RETRIABLE_STATUS_CODES:
+                    return response
+                error = f"HTTP {response.status_code}"
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+            if attempt == self.max_retries:
+                raise RuntimeError(f"Subida abortada tras {self.max_retries} reintentos: {error}")
+            delay = backoff_delay(attempt, self.backoff_base)
+            logger.warning(f"Error de subida ({error}), reintento {attempt + 1}/{self.max_retries} en {delay:.1f}s")
+            time.sleep(delay)
+
+    def _start_session(self, body: dict, total: int) -> str:
+        """Abre una sesión resumable y retorna su URI"""
+        response = self._request(
+            'POST', self.upload_url,
+            params={'uploadType': 'resumable', 'part': ','.join(body.keys())},
+            data=json.dumps(body),
+            headers={
+                'Content-Type': 'application/json; charset=UTF-8',
+                'X-Upload-Content-Length': str(total),
+                'X-Upload-Content-Type': 'video/*',
+            }
+        )
+        response.raise_for_status()
+        return response.headers['Location']
+
+    @staticmethod
+    def _parse_offset(response) -> int:
+        """Bytes confirmados según la cabecera Range de una respuesta 308 ('bytes=0-N')"""
+        received = response.headers.get('Range')
+        return int(received.rsplit('-', 1)[1]) + 1 if received else 0
+
+    def _query_offset(self, upload_uri: str, total: int):
+        """
+        Pregunta al servidor cuántos bytes tiene de la sesión.
+        Retorna (offset, None), o (total, respuesta) si la subida ya terminó.
+        """
+        response = self._request('PUT', upload_uri, headers={'Content-Range': f"bytes */{total}"})
+        if response.status_code in (200, 201):
+            return total, response.json()
+        if response.status_code != 308:
+            response.raise_for_status()
+        return self._parse_offset(response), None
+
+    def _upload_chunks(self, file_path: str, upload_uri: str, offset: int, total: int, youtube_id: str = None) -> dict:
+        """Envía el archivo desde offset en trozos de chunk_size y retorna el recurso creado"""
+        failures = 0  # Trozos seguidos sin confirmar
+        with open(file_path, 'rb') as f:
+            while True:
+                f.seek(offset)
+                chunk = f.read(self.chunk_size)
+                end = offset + len(chunk) - 1
+                try:
+                    response = self.session.put(
+                        upload_uri, data=chunk,
+                        headers={'Content-Range': f"bytes {offset}-{end}/{total}" if chunk else f"bytes */{total}"}
+                    )
+                    status_code = response.status_code
+                except requests.exceptions.RequestException as e:
+                    response, status_code = None, str(e)
+
+                if status_code in (200, 201):
+                    return response.json()
+                if status_code == 308 and self._parse_offset(response) > offset:
+                    offset = self._parse_offset(response)
+                    failures = 0
+                elif status_code in (404, 410):
+                    raise UploadSessionExpired(f"{status_code} en {upload_uri}")
+                elif response is not None and status_code not in RETRIABLE_STATUS_CODES + (308,):
+                    response.raise_for_status()
+                    raise RuntimeError(f"Respuesta inesperada de la subida: {status_code}")
+                else:
+                    # Trozo perdido (o un 308 que no avanza): esperar y preguntar cuánto llegó realmente
+                    if status_code == 308:
+                        status_code = "308 sin avance"
+                    if failures == self.max_retries:
+                        raise RuntimeError(f"Subida abortada tras {self.max_retries} reintentos: {status_code}")
+                    delay = backoff_delay(failures, self.backoff_base)
+                    failures += 1
+                    logger.warning(f"Trozo {offset}-{end} no confirmado ({status_code}), "
+                                   f"reintento {failures}/{self.max_retries} en {delay:.1f}s")
+                    time.sleep(delay)
+                    offset, done = self._query_offset(upload_uri, total)
+                    if done is not None:
+                        return done
+
+                self._save_upload_session(youtube_id, upload_uri, offset)
+                logger.info(f"Subido {int(offset * 100 / total) if total else 100}%")
+
+    def _load_upload_session(self, youtube_id: str):
+        """(upload_uri, upload_offset) guardados en la fila Video, o (None, 0)"""
+        if not youtube_id:
+            return None, 0
+        db = SessionLocal()
+        try:
+            video = db.query(Video).filter_by(youtube_id=youtube_id).first()
+            if video and video.upload_uri:
+                return video.upload_uri, video.upload_offset or 0
+            return None, 0
+        finally:
+            db.close()
+
+    def _save_upload_session(self, youtube_id: str, upload_uri: str, offset: int):
+        if not youtube_id:
+            return
+        db = SessionLocal()
+        try:
+            video = db.query(Video).filter_by(youtube_id=youtube_id).first()
+            if video:
+                video.upload_uri = upload_uri
+                video.upload_offset = offset
+                db.commit()
+        finally:
+            db.close()
@@ -0,0 +1,214 @@
+"""
+Presupuesto de ancho de banda y conexiones compartido por todas las descargas
+del proceso.
+
+- Cada descarga entra con BandwidthBudget.slot() y recibe su parte:
+  fragmentos simultáneos (concurrent_fragment_downloads de yt-dlp) dentro del
+  tope de conexiones DOWNLOAD_MAX_CONNECTIONS, y una cuota del límite global
+  DOWNLOAD_BANDWIDTH_LIMIT. Si no quedan conexiones libres, la descarga espera.
+- La cuota se recalcula en cada bloque con las descargas activas en ese
+  momento: cuando una termina, las demás suben de velocidad.
+- El límite se aplica desde el progress hook (se duerme el hilo que acaba de
+  leer el bloque). El ratelimit de yt-dlp no sirve: limita cada conexión por
+  separado y los descargadores de fragmentos trabajan con una copia de las
+  opciones, así que no se puede repartir en caliente.
+- El mismo hook registra en el log los MB descargados y los MB/s de cada
+  descarga cada DOWNLOAD_PROGRESS_INTERVAL segundos.
+- Las descargas por tramos las hace FFmpeg: no usa fragmentos, solo llama
+  al hook al terminar y su ritmo no se puede cambiar en marcha. Entran con
+  fixed_rate: reservan al empezar la parte del límite que corresponde a sus
+  conexiones (FFmpeg lee a ese ritmo con -readrate) y el resto de descargas
+  se reparte lo que queda. Su progreso se mide por el tamaño del archivo de
+  salida (watch/polling).
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from config.settings import (
+    DOWNLOAD_BANDWIDTH_LIMIT,
+    DOWNLOAD_MAX_CONNECTIONS,
+    DOWNLOAD_CONCURRENT_FRAGMENTS,
+    DOWNLOAD_PROGRESS_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+# Ráfaga máxima (en segundos de cuota) que puede acumular una descarga que estuvo parada
+_BURST_SECONDS = 0.5
+# Cada cuánto se mide el archivo de salida de una descarga sin progreso por bloque
+_POLL_SECONDS = 1.0
+
+class DownloadShare:
+    """
+    Parte del presupuesto de una descarga activa. progress_hook se pasa a
+    yt-dlp en progress_hooks; puede llamarse desde varios hilos a la vez
+    (uno por fragmento). reserved_rate es la cuota fija de una descarga por
+    FFmpeg (None = se recalcula en cada bloque).
+    """
+
+    def __init__(self, budget: 'BandwidthBudget', name: str, fragments: int, reserved_rate: float = None):
+        self.budget = budget
+        self.name = name
+        self.fragments = fragments
+        self.reserved_rate = reserved_rate
+        self.started = time.monotonic()
+        self.downloaded = 0
+        self._seen = {}  # archivo -> bytes ya contados (video y audio se descargan por separado)
+        self._watched = []
+        self._next_send = self.started
+        self._last_log = self.started
+        self._last_log_bytes = 0
+        self._lock = threading.Lock()
+
+    def rate(self) -> float:
+        """Bytes/s que le tocan ahora a esta descarga (0 = sin límite)"""
+        return self.reserved_rate if self.reserved_rate is not None else self.budget.rate_share()
+
+    def progress_hook(self, status: dict):
+        if status.get('status') not in ('downloading', 'finished'):
+            return
+        # Al terminar no hay nada más que frenar
+        wait = self._count(status.get('filename'), status.get('downloaded_bytes') or 0,
+                           throttle=status['status'] == 'downloading')
+        if wait > 0:
+            time.sleep(wait)
+
+    def _count(self, filename: str, current: int, throttle: bool) -> float:
+        """Suma el avance de filename y retorna cuánto debe esperar el hilo que lo leyó"""
+        now = time.monotonic()
+        with self._lock:
+            delta = max(0, current - self._seen.get(filename, 0))
+            self._seen[filename] = max(current, self._seen.get(filename, 0))
+            self.downloaded += delta
+            wait = 0.0
+            rate = self.rate()
+            if rate and delta and throttle:
+                self._next_send = max(self._next_send, now - _BURST_SECONDS) + delta / rate
+                wait = self._next_send - now
+            if now - self._last_log >= self.budget.progress_interval:
+                speed = (self.downloaded - self._last_log_bytes) / (now - self._last_log)
+                logger.info(
+                    f"Descarga {self.name}: {self.downloaded / 1e6:.1f} MB a {speed / 1e6:.2f} MB/s "
+                    f"({self.fragments} fragmentos, cuota {_format_rate(rate)})"
+                )
+                self._last_log, self._last_log_bytes = now, self.downloaded
+        return wait
+
+    def watch(self, path):
+        """Mide el progreso de path por su tamaño (descargadores que no reportan bloques, como FFmpeg)"""
+        with self._lock:
+            self._watched.append(str(path))
+
+    def poll(self):
+        for path in list(self._watched):
+            size = _file_size(f"{path}.part") or _file_size(path)
+            if size:
+                self._count(path, size, throttle=False)
+
+    @contextmanager
+    def polling(self, interval: float = _POLL_SECONDS):
+        """Mide los archivos de watch() cada interval segundos mientras dura el bloque"""
+        stop = threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                self.poll()
+
+        poller = threading.Thread(target=loop, name=f"poll-{self.name}", daemon=True)
+        poller.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            poller.join()
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+class BandwidthBudget:
+    """
+    Reparte rate_limit (bytes/s, 0 = sin límite) y max_connections entre las
+    descargas activas. Cada descarga usa como mucho `fragments` conexiones.
+    """
+
+    def __init__(self, rate_limit: float = DOWNLOAD_BANDWIDTH_LIMIT,
+                 max_connections: int = DOWNLOAD_MAX_CONNECTIONS,
+                 fragments: int = DOWNLOAD_CONCURRENT_FRAGMENTS,
+                 progress_interval: float = DOWNLOAD_PROGRESS_INTERVAL):
+        self.rate_limit = max(0.0, rate_limit or 0.0)
+        self.max_connections = max(1, max_connections)
+        self.fragments = max(1, min(fragments, self.max_connections))
+        self.progress_interval = progress_interval
+        self._active = []
+        self._changed = threading.Condition()
+
+    def rate_share(self) -> float:
+        """Bytes/s que le tocan ahora a cada descarga activa sin cuota fija (0 = sin límite)"""
+        if not self.rate_limit:
+            return 0.0
+        adaptive = sum(1 for share in self._active if share.reserved_rate is None)
+        return max(0.0, self.rate_limit - self.reserved) / max(1, adaptive)
+
+    @property
+    def reserved(self) -> float:
+        """Bytes/s reservados por las descargas con cuota fija"""
+        return sum(share.reserved_rate or 0.0 for share in self._active)
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    @property
+    def connections(self) -> int:
+        return sum(share.fragments for share in self._active)
+
+    @contextmanager
+    def slot(self, name: str, fixed_rate: bool = False, max_fragments: int = None):
+        """
+        Reserva conexiones para una descarga y retorna su DownloadShare.
+        Los fragmentos son min(fragments, max_connections / descargas activas),
+        sin pasar de las conexiones libres ni de max_fragments; con todas
+        ocupadas se espera.
+        Con fixed_rate (FFmpeg, que abre siempre max_fragments conexiones) se
+        espera a tenerlas todas libres y se reserva la parte del límite de sus
+        conexiones, rate_limit * fragmentos / max_connections, sin pasar de lo
+        que no está reservado: varias descargas fijas caben a la vez, pero una
+        sola no aprovecha todo el límite. Si las descargas con cuota fija tienen
+        reservado todo el límite, se espera a que termine una.
+        """
+        needed = min(max_fragments or 1, self.max_connections) if fixed_rate else 1
+        with self._changed:
+            self._changed.wait_for(lambda: self.max_connections - self.connections >= needed
+                                   and (not self.rate_limit or self.reserved < self.rate_limit))
+            fair = self.max_connections // (len(self._active) + 1)
+            free = self.max_connections - self.connections
+            fragments = max(needed, min(max_fragments or self.fragments, fair, free))
+            reserved_rate = None
+            if fixed_rate and self.rate_limit:
+                reserved_rate = min(self.rate_limit * fragments / self.max_connections,
+                                    self.rate_limit - self.reserved)
+            share = DownloadShare(self, name, fragments, reserved_rate)
+            self._active.append(share)
+        try:
+            yield share
+        finally:
+            with self._changed:
+                self._active.remove(share)
+                self._changed.notify_all()
+            elapsed = share.elapsed
+            logger.info(
+                f"Descarga {name}: {share.downloaded / 1e6:.1f} MB en {elapsed:.1f}s "
+                f"({share.downloaded / max(elapsed, 1e-6) / 1e6:.2f} MB/s de media)"
+            )
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _format_rate(rate: float) -> str:
+    return f"{rate / 1e6:.2f} MB/s" if rate else "sin límite"
@@ -0,0 +1,237 @@
+"""
+Descubrimiento incremental por el feed RSS de subidas de cada canal.
+
+- Cada canal se pide con If-None-Match / If-Modified-Since: un canal sin
+  cambios cuesta un 304 sin cuerpo.
+- channel_feeds guarda por canal los validadores HTTP y una marca de agua
+  (published de la entrada más reciente ya decidida). Solo las entradas por
+  encima de la marca y que no están en la tabla videos son nuevas.
+- Los detalles de las entradas nuevas se piden en lote al scraper
+  (videos.list o yt-dlp) y pasan los filtros de fecha y duración. El umbral de
+  vistas no aplica: un video de hace minutos todavía no tiene vistas. Las
+  entradas sin upload_date (estrenos y directos programados) se rechazan:
+  todavía no hay video que descargar.
+- Los candidatos se insertan como 'pending' en la misma transacción que
+  avanza la marca: el pipeline los recoge como trabajo pendiente.
+- Si los detalles de una entrada fallan, la marca se queda por debajo de ella
+  y no se guardan los validadores: el siguiente sondeo la vuelve a evaluar.
+"""
+import json
+import logging
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import requests
+from config.settings import (
+    YOUTUBE_FEED_URL,
+    HOURS_LOOKBACK,
+    MAX_VIDEOS_PER_DAY,
+    SCRAPER_MAX_WORKERS
+)
+from src.utils.database import SessionLocal, Video, ChannelFeed, get_existing_youtube_ids, video_from_info
+
+logger = logging.getLogger(__name__)
+
+# Filtros que se aplican a las entradas del feed (ver docstring del módulo)
+FEED_FILTER_FIELDS = ('upload_date', 'duration')
+
+_NS = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'yt': 'http://www.youtube.com/xml/schemas/2015',
+    'media': 'http://search.yahoo.com/mrss/',
+}
+
+def _utc(value: str) -> datetime:
+    """'2024-05-01T10:00:00+00:00' -> datetime UTC sin zona horaria"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_feed(content: bytes) -> list:
+    """
+    Entradas del feed Atom de un canal, de la más reciente a la más antigua:
+    [{'id', 'url', 'channel_id', 'title', 'published', 'view_count'}, ...]
+    """
+    root = ET.fromstring(content)
+    entries = []
+    for entry in root.findall('atom:entry', _NS):
+        video_id = entry.findtext('yt:videoId', namespaces=_NS)
+        published = entry.findtext('atom:published', namespaces=_NS)
+        if not video_id or not published:
+            continue
+        link = entry.find('atom:link', _NS)
+        statistics = entry.find('media:group/media:community/media:statistics', _NS)
+        entries.append({
+            'id': video_id,
+            'url': link.get('href') if link is not None else f"https://www.youtube.com/watch?v={video_id}",
+            'channel_id': entry.findtext('yt:channelId', namespaces=_NS),
+            'title': entry.findtext('atom:title', namespaces=_NS),
+            'published': _utc(published),
+            'view_count': int(statistics.get('views')) if statistics is not None and statistics.get('views') else None,
+        })
+    entries.sort(key=lambda e: e['published'], reverse=True)
+    return entries
+
+class FeedPoller:
+    """
+    Sondea los feeds de los canales y encola los candidatos nuevos en la
+    tabla videos como 'pending'. El scraper resuelve los detalles; feed_url
+    y session se inyectan para probar contra un servidor HTTP local.
+    """
+
+    def __init__(self, scraper, feed_url: str = YOUTUBE_FEED_URL, session: requests.Session = None,
+                 max_workers: int = SCRAPER_MAX_WORKERS, max_per_day: int = MAX_VIDEOS_PER_DAY,
+                 timeout: float = 30):
+        self.scraper = scraper
+        self.feed_url = feed_url
+        self.session = session or requests.Session()
+        self.max_workers = max(1, max_workers)
+        self.max_per_day = max_per_day
+        self.timeout = timeout
+        self.last_poll_stats = {}
+
+    def fetch_feed(self, channel_id: str, etag: str = None, last_modified: str = None):
+        """
+        GET condicional del feed de un canal.
+        Retorna (status, etag, last_modified, entradas); entradas es None si no
+        hay cuerpo que leer (304 o error).
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        try:
+            response = self.session.get(self.feed_url, params={'channel_id': channel_id},
+                                        headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                return 304, etag, last_modified, None
+            response.raise_for_status()
+            return (response.status_code, response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'), parse_feed(response.content))
+        except Exception as e:
+            logger.error(f"Error sondeando el feed de {channel_id}: {e}")
+            status = getattr(getattr(e, 'response', None), 'status_code', None)
+            return status, etag, last_modified, None
+
+    def _enqueued_today(self, db) -> int:
+        midnight = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        return db.query(Video).filter(Video.created_at >= midnight).count()
+
+    def poll(self, channels_file: Path) -> list:
+        """
+        Un sondeo de todos los canales. Encola y retorna los candidatos nuevos
+        [{'video', 'score', 'channel_name'}] (formato de find_new_videos)
+        ordenados por score, como máximo los que quedan del tope diario
+        MAX_VIDEOS_PER_DAY.
+        """
+        with open(channels_file, 'r', encoding='utf-8') as f:
+            channels = json.load(f)['channels']
+
+        stats = {'channels': len(channels), 'not_modified': 0, 'errors': 0, 'entries': 0,
+                 'new': 0, 'rejected': 0, 'undecided': 0, 'accepted': 0, 'capped': 0}
+        db = SessionLocal()
+        try:
+            states = {
+                feed.channel_id: feed for feed in
+                db.query(ChannelFeed).filter(ChannelFeed.channel_id.in_([c['channel_id'] for c in channels]))
+            }
+            for channel in channels:
+                if channel['channel_id'] not in states:
+                    states[channel['channel_id']] = ChannelFeed(channel_id=channel['channel_id'])
+                    db.add(states[channel['channel_id']])
+
+            # 1. GET condicional de todos los feeds en paralelo
+            def fetch(channel):
+                state = states[channel['channel_id']]
+                return self.fetch_feed(channel['channel_id'], state.etag, state.last_modified)
+
+            with ThreadPoolExecutor(min(self.max_workers, max(1, len(channels)))) as pool:
+                responses = list(pool.map(fetch, channels))
+
+            # 2. Entradas por encima de la marca de agua y que no están en la tabla videos
+            polled_at = datetime.utcnow()
+            feeds = []
+            for channel, (status, etag, last_modified, entries) in zip(channels, responses):
+                state = states[channel['channel_id']]
+                state.last_polled_at, state.last_status = polled_at, status
+                if status == 304:
+                    stats['not_modified'] += 1
+                elif entries is None:
+                    stats['errors'] += 1
+                else:
+                    stats['entries'] += len(entries)
+                    above_mark = [e for e in entries
+                                  if state.last_published is None or e['published'] > state.last_published]
+                    feeds.append((channel, etag, last_modified, entries, above_mark))
+
+            known_ids = get_existing_youtube_ids(
+                db, (e['id'] for *_, above_mark in feeds for e in above_mark)
+            )
+            new_entries = [e for *_, above_mark in feeds for e in above_mark if e['id'] not in known_ids]
+            stats['new'] = len(new_entries)
+
+            # 3. Detalles en lote y filtros duraderos (fecha, duración)
+            details_list, _ = self.scraper.get_videos_details(new_entries, self.max_workers)
+            details_by_id = {e['id']: d for e, d in zip(new_entries, details_list)}
+            cutoff_date = datetime.utcnow() - timedelta(hours=HOURS_LOOKBACK)
+
+            candidates = []
+            for channel, etag, last_modified, entries, above_mark in feeds:
+                undecided = []
+                for entry in above_mark:
+                    if entry['id'] in known_ids:
+                        continue
+                    details = details_by_id.get(entry['id'])
+                    if not details:
+                        undecided.append(entry)
+                        continue
+                    reason = (self.scraper._rejection_reason(details, cutoff_date, FEED_FILTER_FIELDS)
+                              if details.get('upload_date') else "Sin fecha de subida (estreno o programado)")
+                    if reason:
+                        stats['rejected'] += 1
+                        logger.info(f"Skip {entry['id']} (feed): {reason}")
+                        continue
+                    priority = channel.get('priority', 3)
+                    candidates.append({
+                        'video': details,
+                        'score': ((details.get('view_count') or 0) / 1000) / priority,
+                        'channel_name': channel['name']
+                    })
+
+                # 4. Avanzar la marca hasta la entrada decidida más reciente anterior a la primera sin decidir
+                state = states[channel['channel_id']]
+                stats['undecided'] += len(undecided)
+                oldest_undecided = min((e['published'] for e in undecided), default=None)
+                decided = [e['published'] for e in entries
+                           if oldest_undecided is None or e['published'] < oldest_undecided]
+                if decided and (state.last_published is None or max(decided) > state.last_published):
+                    state.last_published = max(decided)
+                # Con entradas sin decidir el siguiente sondeo debe traer el feed completo
+                state.etag, state.last_modified = (None, None) if undecided else (etag, last_modified)
+
+            # 5. Tope diario: lo que no cabe hoy se descarta (la marca ya lo dejó atrás)
+            candidates.sort(key=lambda x: x['score'], reverse=True)
+            remaining = max(0, self.max_per_day - self._enqueued_today(db))
+            stats['capped'] = max(0, len(candidates) - remaining)
+            for candidate in candidates[remaining:]:
+                logger.info(f"Skip {candidate['video']['id']} (feed): tope diario de {self.max_per_day} alcanzado")
+            candidates = candidates[:remaining]
+            for candidate in candidates:
+                db.add(video_from_info(candidate['video']))
+            stats['accepted'] = len(candidates)
+
+            db.commit()
+        finally:
+            db.close()
+
+        self.last_poll_stats = stats
+        logger.info(
+            f"Sondeo RSS: {stats['channels']} canales, {stats['not_modified']} sin cambios (304), "
+            f"{stats['errors']} con error, {stats['new']} entradas nuevas, {stats['rejected']} rechazadas, "
+            f"{stats['undecided']} sin detalles, {stats['capped']} fuera del tope diario, "
+            f"{stats['accepted']} candidatos"
+        )
+        return candidates
@@ -0,0 +1,75 @@
+import json
+import logging
+import time
+import yt_dlp
+from config.settings import (
+    CACHE_DIR,
+    METADATA_CACHE_MAX_ENTRIES,
+    CHANNEL_LISTING_TTL,
+    METADATA_DEFAULT_TTL,
+    METADATA_FIELD_TTLS
+)
+from src.utils.cache import DiskCache
+
+logger = logging.getLogger(__name__)
+
+# Claves voluminosas del info dict que el pipeline no usa (formatos, miniaturas, subtítulos)
+_DROP_KEYS = (
+    'formats', 'requested_formats', 'thumbnails', 'automatic_captions', 'subtitles',
+    'requested_subtitles', 'heatmap', 'http_headers', 'fragments', 'chapters',
+)
+
+class MetadataCache:
+    """
+    Caché en disco de resultados de yt-dlp extract_info.
+
+    - Info dicts completos por ID de video, con TTL por campo
+      (METADATA_FIELD_TTLS: view_count caduca pronto, duration nunca).
+    - Listados planos de canal con TTL fijo (CHANNEL_LISTING_TTL).
+    """
+
+    def __init__(self, path=None, max_entries: int = METADATA_CACHE_MAX_ENTRIES):
+        self.cache = DiskCache(path or CACHE_DIR / 'metadata.db', max_entries=max_entries)
+
+    @staticmethod
+    def field_ttl(field: str):
+        return METADATA_FIELD_TTLS.get(field, METADATA_DEFAULT_TTL)
+
+    def lookup_video(self, video_id: str, fields):
+        """
+        Retorna (info, campos_frescos) para el video, o (None, set()) si no está en caché.
+        campos_frescos es el subconjunto de fields cuyo TTL aún no ha vencido.
+        No cuenta acierto/fallo: lo decide quien consume la entrada (record()).
+        """
+        entry = self.cache.get_entry(f"video:{video_id}")
+        if entry is None:
+            return None, set()
+        value, stored_at = entry
+        age = time.time() - stored_at
+        fresh = set()
+        for field in fields:
+            ttl = self.field_ttl(field)
+            if ttl is None or age <= ttl:
+                fresh.add(field)
+        return json.loads(value), fresh
+
+    def put_video(self, info: dict):
+        """Guarda un info dict (sin las claves voluminosas) bajo su ID"""
+        if not info or not info.get('id'):
+            return
+        clean = yt_dlp.YoutubeDL.sanitize_info(info)
+        clean = {k: v for k, v in clean.items() if k not in _DROP_KEYS}
+        self.cache.set_json(f"video:{info['id']}", clean)
+
+    def get_listing(self, channel_id: str, limit: int):
+        return self.cache.get_json(f"listing:{channel_id}:{limit}", max_age=CHANNEL_LISTING_TTL)
+
+    def put_listing(self, channel_id: str, limit: int, entries):
+        clean = [yt_dlp.YoutubeDL.sanitize_info(e) for e in entries]
+        self.cache.set_json(f"listing:{channel_id}:{limit}", clean)
+
+    def record(self, hit: bool):
+        self.cache.record(hit)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
@@ -0,0 +1,117 @@
+import logging
+from datetime import datetime
+import isodate
+import requests
+from config.settings import YOUTUBE_API_KEY, YOUTUBE_API_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Máximo de IDs que acepta videos.list por petición
+MAX_IDS_PER_REQUEST = 50
+
+# snippet.liveBroadcastContent -> live_status de yt-dlp
+_LIVE_STATUS = {'live': 'is_live', 'upcoming': 'is_upcoming', 'none': 'not_live'}
+
+def parse_duration(value: str):
+    """'PT1H2M3S' -> 3723 (segundos). None si no se puede interpretar"""
+    try:
+        duration = isodate.parse_duration(value)
+        # Duraciones con años/meses (isodate.Duration) se convierten desde una fecha fija
+        if isinstance(duration, isodate.Duration):
+            duration = duration.totimedelta(start=datetime(2000, 1, 1))
+        return int(duration.total_seconds())
+    except (TypeError, ValueError, isodate.ISO8601Error):
+        return None
+
+def _count(statistics: dict, key: str):
+    value = statistics.get(key)
+    return int(value) if value is not None else None
+
+def to_info_dict(item: dict) -> dict:
+    """
+    Convierte un recurso video de la API en un info dict con los mismos
+    nombres de campo que yt-dlp (los que usan los filtros y el pipeline).
+    """
+    snippet = item.get('snippet', {})
+    details = item.get('contentDetails', {})
+    statistics = item.get('statistics', {})
+
+    upload_date = timestamp = None
+    if snippet.get('publishedAt'):
+        published = isodate.parse_datetime(snippet['publishedAt'])
+        timestamp = int(published.timestamp())
+        upload_date = datetime.utcfromtimestamp(timestamp).strftime('%Y%m%d')
+
+    return {
+        'id': item['id'],
+        'title': snippet.get('title'),
+        'description': snippet.get('description'),
+        'channel_id': snippet.get('channelId'),
+        'channel': snippet.get('channelTitle'),
+        'uploader': snippet.get('channelTitle'),
+        'tags': snippet.get('tags', []),
+        'upload_date': upload_date,
+        'timestamp': timestamp,
+        'duration': parse_duration(details.get('duration')),
+        'view_count': _count(statistics, 'viewCount'),
+        'like_count': _count(statistics, 'likeCount'),
+        'comment_count': _count(statistics, 'commentCount'),
+        'live_status': _LIVE_STATUS.get(snippet.get('liveBroadcastContent')),
+        'webpage_url': f"https://www.youtube.com/watch?v={item['id']}",
+    }
+
+class YouTubeDataAPI:
+    """
+    Detalles de videos con la YouTube Data API v3 (videos.list + API key).
+
+    Cada petición resuelve hasta 50 IDs (1 unidad de cuota) con
+    part=snippet,contentDetails,statistics. base_url y session se inyectan
+    para probar contra un servidor HTTP local.
+    """
+
+    def __init__(self, api_key: str = YOUTUBE_API_KEY, base_url: str = YOUTUBE_API_BASE_URL,
+                 session: requests.Session = None, timeout: float = 30):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.requests_made = 0
+
+    def list_videos(self, video_ids: list) -> list:
+        """Una petición videos.list (máximo MAX_IDS_PER_REQUEST IDs). Retorna los items"""
+        if len(video_ids) > MAX_IDS_PER_REQUEST:
+            raise ValueError(f"videos.list acepta como máximo {MAX_IDS_PER_REQUEST} IDs")
+        self.requests_made += 1
+        response = self.session.get(
+            f"{self.base_url}/videos",
+            params={
+                'part': 'snippet,contentDetails,statistics',
+                'id': ','.join(video_ids),
+            },
+            # La key va en cabecera: los mensajes de error de requests incluyen la URL
+            headers={'X-Goog-Api-Key': self.api_key},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json().get('items', [])
+
+    def get_videos(self, video_ids) -> dict:
+        """
+        Resuelve video_ids en lotes de 50. Retorna {id: info_dict}.
+
+        Un ID que la API no devuelve (privado, borrado) queda con valor None.
+        Los IDs de un lote que falla no aparecen en el resultado: quien llama
+        decide el respaldo (yt-dlp).
+        """
+        video_ids = list(dict.fromkeys(video_ids))
+        results = {}
+        for start in range(0, len(video_ids), MAX_IDS_PER_REQUEST):
+            batch = video_ids[start:start + MAX_IDS_PER_REQUEST]
+            try:
+                found = {item['id']: to_info_dict(item) for item in self.list_videos(batch) if item.get('id')}
+            except Exception as e:
+                logger.error(f"Error en videos.list ({len(batch)} IDs): {e}")
+                continue
+            for video_id in batch:
+                results[video_id] = found.get(video_id)
+        return results
@@ -1,23 +1,124 @@
 import json
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, timedelta
+from urllib.parse import urlparse
 import yt_dlp
+from yt_dlp.postprocessor import PostProcessor
 from config.settings import (
     DOWNLOAD_DIR, 
     MIN_VIEWS_THRESHOLD, 
     HOURS_LOOKBACK,
     MAX_VIDEO_DURATION,
-    SHORT_VIDEO_THRESHOLD
+    SHORT_VIDEO_THRESHOLD,
+    SCRAPER_MAX_WORKERS,
+    SCRAPER_MAX_PER_HOST,
+    SCRAPER_DETAILS_BACKEND,
+    YOUTUBE_API_KEY,
+    DOWNLOAD_MAX_HEIGHT
 )
-from src.utils.database import Video, SessionLocal
+from src.utils.database import SessionLocal, get_existing_youtube_ids
+from src.scraper.metadata_cache import MetadataCache
+from src.scraper.youtube_api import YouTubeDataAPI
+from src.scraper.bandwidth import BandwidthBudget
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Campos del info dict que usan los filtros de find_new_videos
+FILTER_FIELDS = ('upload_date', 'view_count', 'duration')
+
+# Semáforos por host compartidos por todas las instancias del scraper
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+# Ancho de banda y conexiones de descarga compartidos por todas las instancias del scraper
+_download_budget = BandwidthBudget()
+# FFmpeg abre una conexión por formato de entrada (video y audio por separado)
+# y, al saltar al inicio del tramo, abre la nueva antes de cerrar la anterior
+_FFMPEG_CONNECTIONS = 3
+
+def format_selector(max_height: int = DOWNLOAD_MAX_HEIGHT) -> str:
+    """
+    Formato de yt-dlp con la altura limitada a max_height. Prefiere H.264 en MP4
+    (el composer lo copia sin recodificar) y cae a cualquier MP4 o lo mejor disponible.
+    """
+    h = f"[height<=?{max_height}]"
+    return (f"bestvideo{h}[vcodec^=avc1]+bestaudio[ext=m4a]/bestvideo{h}[ext=mp4]+bestaudio[ext=m4a]/"
+            f"best{h}[ext=mp4]/best{h}/best")
+
+@contextmanager
+def _host_slot(url: str):
+    """Limita las peticiones simultáneas a un mismo host (SCRAPER_MAX_PER_HOST)."""
+    host = urlparse(url).netloc or url
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(max(1, SCRAPER_MAX_PER_HOST))
+            _host_semaphores[host] = semaphore
+    with semaphore:
+        yield
+
+def _media_rate(fmt: dict, info: dict) -> float:
+    """Bytes/s que ocupa un formato al reproducirlo (0 = desconocido)"""
+    if fmt.get('tbr'):
+        return fmt['tbr'] * 1000 / 8
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    return size / info['duration'] if size and info.get('duration') else 0.0
+
+def _with_ffmpeg_args(fmt: dict, args: list) -> dict:
+    """Copia de fmt con args delante de su -i en FFmpegFD"""
+    options = dict(fmt.get('downloader_options') or {})
+    options['ffmpeg_args'] = [*(options.get('ffmpeg_args') or []), *args]
+    return {**fmt, 'downloader_options': options}
+
+class RangedDownloadBudgetPP(PostProcessor):
+    """
+    Se ejecuta antes de descargar cada tramo (before_dl). FFmpeg no reporta
+    progreso por bloque ni se puede frenar desde el hook, así que:
+    - registra el archivo de salida en el share para medir su tamaño,
+    - limita la lectura de FFmpeg (-readrate, en velocidades de reproducción)
+      a la cuota reservada: reserved_rate / bytes por segundo de los formatos.
+    """
+
+    def __init__(self, share, downloader=None):
+        super().__init__(downloader)
+        self.share = share
+
+    def run(self, info):
+        self.share.watch(info['_filename'])
+        if not self.share.reserved_rate:
+            return [], info
+        formats = info.get('requested_formats') or [info]
+        rates = [_media_rate(fmt, info) for fmt in formats]
+        if not all(rates):
+            logger.warning(f"Tramo de {info.get('id')}: bitrate desconocido, se descarga sin límite")
+            return [], info
+        args = ['-readrate', f"{self.share.reserved_rate / sum(rates):.3f}"]
+        # Copias: los tramos de un mismo video comparten los dicts de formato
+        if info.get('requested_formats'):
+            info['requested_formats'] = [_with_ffmpeg_args(fmt, args) for fmt in formats]
+        else:
+            info = _with_ffmpeg_args(info, args)
+        return [], info
+
 class YouTubeScraper:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True, details_backend: str = SCRAPER_DETAILS_BACKEND,
+                 api: YouTubeDataAPI = None, bandwidth: BandwidthBudget = None):
+        self.metadata_cache = MetadataCache() if use_cache else None
+        # Backend 'api': detalles por lotes con videos.list (yt-dlp queda de respaldo)
+        self.api = None
+        if details_backend == 'api':
+            if api is not None or YOUTUBE_API_KEY:
+                self.api = api or YouTubeDataAPI()
+            else:
+                logger.warning("SCRAPER_DETAILS_BACKEND=api sin YOUTUBE_API_KEY: se usa yt-dlp")
+        self.bandwidth = bandwidth or _download_budget
+        self.last_scan_stats = {}
         self.ydl_opts = {
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+            'format': format_selector(),
             'outtmpl': str(DOWNLOAD_DIR / '%(id)s.%(ext)s'),
             'quiet': True,
             'no_warnings': True,
@@ -34,6 +135,11 @@ class YouTubeScraper:
         channel_url = f"https://www.youtube.com/channel/{channel_id}/videos"
         
         logger.info(f"Buscando videos en {channel_url}")
+
+        if self.metadata_cache:
+            cached = self.metadata_cache.get_listing(channel_id, limit)
+            if cached is not None:
+                return cached
         
         # Opciones para extracción rápida (flat extraction)
         flat_opts = self.ydl_opts.copy()
@@ -43,10 +149,13 @@ class YouTubeScraper:
         })
 
         try:
-            with yt_dlp.YoutubeDL(flat_opts) as ydl:
+            with _host_slot(channel_url), yt_dlp.YoutubeDL(flat_opts) as ydl:
                 info = ydl.extract_info(channel_url, download=False)
                 if 'entries' in info:
-                    return info['entries']
+                    entries = list(info['entries'])
+                    if self.metadata_cache:
+                        self.metadata_cache.put_listing(channel_id, limit, entries)
+                    return entries
         except Exception as e:
             logger.error(f"Error scraping channel {channel_id}: {e}")
             return []
@@ -57,91 +166,302 @@ class YouTubeScraper:
         Obtiene detalles completos de un video específico.
         """
         try:
-            with yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
-                return ydl.extract_info(video_url, download=False)
+            with _host_slot(video_url), yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
+                info = ydl.extract_info(video_url, download=False)
+            if self.metadata_cache:
+                self.metadata_cache.put_video(info)
+            return info
         except Exception as e:
             logger.error(f"Error getting details for {video_url}: {e}")
             return None
 
-    def download_video(self, video_url: str) -> str:
+    def download_subtitles(self, video_url: str) -> bool:
         """
-        Descarga el video y retorna la ruta del archivo.
+        Descarga solo los subtítulos automáticos (.vtt) del video, sin el video.
+        Retorna False si la extracción falla.
+        """
+        try:
+            with _host_slot(video_url), yt_dlp.YoutubeDL(self.ydl_opts) as ydl:
+                ydl.extract_info(video_url, download=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error descargando subtítulos de {video_url}: {e}")
+            return False
+
+    def download_sections(self, video_url: str, sections=None) -> list:
+        """
+        Descarga el video (formato limitado a DOWNLOAD_MAX_HEIGHT) y retorna las
+        rutas de los archivos.
+
+        Con sections [(inicio, fin), ...] en segundos solo se descargan esos
+        tramos: yt-dlp (download_ranges) los pide a FFmpeg, que lee por HTTP
+        solo los bytes del tramo y corta sin recodificar (en el keyframe
+        anterior al inicio). Un archivo por tramo, en el orden pedido.
+
+        La descarga toma su parte del presupuesto del proceso (self.bandwidth):
+        fragmentos DASH/HLS simultáneos y cuota de ancho de banda. Los tramos
+        pasan por FFmpeg, que no usa fragmentos ni reporta progreso por bloque:
+        reservan una cuota fija y _FFMPEG_CONNECTIONS conexiones, FFmpeg lee a
+        ese ritmo (RangedDownloadBudgetPP) y el progreso se mide por el tamaño
+        del archivo de salida. Con todo el límite reservado por otros tramos,
+        la descarga espera su turno.
         """
         download_opts = self.ydl_opts.copy()
-        download_opts['skip_download'] = False
-        
+        # Sin barra de progreso: el progreso va al log desde el hook del presupuesto
+        download_opts.update({'skip_download': False, 'writeautomaticsub': False, 'noprogress': True})
+        if sections:
+            download_opts['download_ranges'] = yt_dlp.utils.download_range_func(None, sections)
+            # Un nombre por tramo: yt-dlp nunca confunde un tramo con el video completo u otro tramo
+            download_opts['outtmpl'] = str(DOWNLOAD_DIR / '%(id)s.%(section_start)d-%(section_end)d.%(ext)s')
+        if self.bandwidth.rate_limit:
+            # Bloques pequeños y fijos: el hook frena con más precisión
+            download_opts.update({'buffersize': 64 * 1024, 'noresizebuffer': True})
+
         try:
-            with yt_dlp.YoutubeDL(download_opts) as ydl:
-                info = ydl.extract_info(video_url, download=True)
-                filename = ydl.prepare_filename(info)
-                logger.info(f"Video descargado en: {filename}")
-                return filename
+            ranged = {'fixed_rate': True, 'max_fragments': _FFMPEG_CONNECTIONS} if sections else {}
+            with self.bandwidth.slot(video_url, **ranged) as share:
+                download_opts.update({
+                    'concurrent_fragment_downloads': share.fragments,
+                    'progress_hooks': [share.progress_hook],
+                })
+                with yt_dlp.YoutubeDL(download_opts) as ydl:
+                    if sections:
+                        ydl.add_post_processor(RangedDownloadBudgetPP(share), when='before_dl')
+                    with share.polling() if sections else nullcontext():
+                        info = ydl.extract_info(video_url, download=True)
+            paths = [d['filepath'] for d in info.get('requested_downloads', []) if d.get('filepath')]
+            if not paths:
+                raise RuntimeError("yt-dlp no generó ningún archivo")
+            for path in paths:
+                logger.info(f"Video descargado en: {path} ({Path(path).stat().st_size / 1e6:.1f} MB)")
+            return paths
         except Exception as e:
             logger.error(f"Error descargando {video_url}: {e}")
             return None
 
-    def find_new_videos(self, channels_file: Path):
+    def download_video(self, video_url: str, section=None) -> str:
+        """
+        Descarga el video y retorna la ruta del archivo.
+        Con section (inicio, fin) en segundos solo se descarga ese tramo.
+        """
+        paths = self.download_sections(video_url, [section] if section else None)
+        return paths[0] if paths else None
+
+    def get_videos_details(self, entries, max_workers: int = None):
+        """
+        Detalles completos de varias entradas planas, en el mismo orden.
+
+        Con el backend 'api' se resuelven de 50 en 50 con videos.list; los IDs
+        de lotes que fallan se extraen con yt-dlp uno a uno. Un video que la API
+        no devuelve (privado, borrado) queda en None sin pasar a yt-dlp.
+        Retorna (detalles, cuántos resolvió la API).
+        """
+        if max_workers is None:
+            max_workers = SCRAPER_MAX_WORKERS
+        entries = list(entries)
+        resolved = {}
+        if self.api and entries:
+            resolved = self.api.get_videos(entry['id'] for entry in entries)
+            if self.metadata_cache:
+                for info in resolved.values():
+                    self.metadata_cache.put_video(info)
+        from_api = sum(1 for entry in entries if entry['id'] in resolved)
+
+        missing = [entry for entry in entries if entry['id'] not in resolved]
+        fetched = self._map(lambda entry: self.get_video_details(entry['url']), missing, max_workers)
+        for entry, details in zip(missing, fetched):
+            resolved[entry['id']] = details
+        return [resolved[entry['id']] for entry in entries], from_api
+
+    def _map(self, func, items, max_workers: int):
+        """
+        Aplica func a cada elemento conservando el orden de entrada.
+        Con max_workers <= 1 se ejecuta en serie en el hilo actual.
+        """
+        items = list(items)
+        if max_workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return list(pool.map(func, items))
+
+    def _rejection_reason(self, info: dict, cutoff_date: datetime, fields=FILTER_FIELDS):
+        """
+        Aplica los filtros de candidatos sobre info y retorna el motivo de rechazo
+        (o None si pasa). Solo evalúa los filtros de los campos incluidos en fields.
+        """
+        # 1. Filtro de fecha (aproximado por upload_date)
+        if 'upload_date' in fields and info.get('upload_date'):
+            upload_date = datetime.strptime(info['upload_date'], '%Y%m%d')
+            if upload_date < cutoff_date:
+                return f"Fuera de la ventana de {HOURS_LOOKBACK}h ({info['upload_date']})"
+
+        # 2. Filtro de Vistas
+        if 'view_count' in fields and (info.get('view_count') or 0) < MIN_VIEWS_THRESHOLD:
+            return f"Pocas vistas ({info.get('view_count')})"
+
+        # 3. Filtro de Duración
+        if 'duration' in fields:
+            duration = info.get('duration') or 0
+            if duration > MAX_VIDEO_DURATION:
+                return f"Muy largo ({duration}s)"
+            if duration < SHORT_VIDEO_THRESHOLD:
+                return f"Muy corto ({duration}s)"
+
+        return None
+
+    def _flat_filter_info(self, vid: dict):
+        """
+        Extrae de una entrada plana los campos de filtro disponibles.
+        Retorna (info, campos) con el mismo formato que el info dict completo.
+        """
+        info = {}
+        if vid.get('upload_date'):
+            info['upload_date'] = vid['upload_date']
+        else:
+            timestamp = vid.get('timestamp') or vid.get('release_timestamp')
+            if timestamp:
+                # Truncado al día, igual que upload_date: el prefiltro nunca es más estricto
+                info['upload_date'] = datetime.utcfromtimestamp(timestamp).strftime('%Y%m%d')
+        if vid.get('view_count') is not None:
+            info['view_count'] = vid['view_count']
+        if vid.get('duration') is not None:
+            info['duration'] = vid['duration']
+        return info, tuple(info)
+
+    def _cached_details(self, video_id: str, cutoff_date: datetime):
+        """
+        Retorna el info dict en caché si sirve para decidir el filtro:
+        todos los campos de FILTER_FIELDS frescos, o los frescos ya lo rechazan
+        (p.ej. la duración nunca caduca, un video demasiado largo no se vuelve a pedir).
+        """
+        if not self.metadata_cache:
+            return None
+        info, fresh = self.metadata_cache.lookup_video(video_id, FILTER_FIELDS)
+        usable = info is not None and (
+            len(fresh) == len(FILTER_FIELDS) or self._rejection_reason(info, cutoff_date, fresh)
+        )
+        self.metadata_cache.record(hit=bool(usable))
+        return info if usable else None
+
+    def find_new_videos(self, channels_file: Path, max_workers: int = None):
         """
         Busca videos nuevos candidatos para procesar.
+
+        Los filtros se aplican en dos etapas: primero con los campos que ya trae
+        la extracción plana (duration, view_count, timestamp) y solo los
+        supervivientes pasan a la extracción completa. Los contadores de cada
+        etapa quedan en self.last_scan_stats. Los detalles completos se piden por
+        lotes a videos.list (backend 'api') o uno a uno con yt-dlp.
+
+        Los canales y los detalles de cada video se consultan en paralelo
+        (max_workers hilos, por defecto SCRAPER_MAX_WORKERS) respetando el
+        límite por host. Los filtros se aplican después en el orden original,
+        así que el resultado es idéntico al del escaneo serial (max_workers=1).
         """
+        if max_workers is None:
+            max_workers = SCRAPER_MAX_WORKERS
+
         with open(channels_file, 'r', encoding='utf-8') as f:
             channels_data = json.load(f)
 
+        channels = channels_data['channels']
         candidates = []
         db = SessionLocal()
         
         try:
             # Calcular fecha límite (hace X horas)
             cutoff_date = datetime.utcnow() - timedelta(hours=HOURS_LOOKBACK)
-            
-            for channel in channels_data['channels']:
+
+            # 1. Listar videos recientes de todos los canales
+            def scan_channel(channel):
                 logger.info(f"Escaneando canal: {channel['name']}")
-                videos = self.get_channel_videos(channel['channel_id'])
-                
+                return self.get_channel_videos(channel['channel_id'])
+
+            listings = self._map(scan_channel, channels, max_workers)
+
+            # 2. Descartar los que ya existen en DB (una sola consulta por lotes)
+            known_ids = get_existing_youtube_ids(
+                db, (vid['id'] for videos in listings for vid in videos)
+            )
+            # 3. Prefiltro barato con los campos de la extracción plana
+            stats = {'listed': 0, 'known': 0, 'rejected_flat': 0, 'cached': 0,
+                     'fetched': 0, 'from_api': 0, 'rejected_details': 0, 'accepted': 0}
+            pending = []
+            for channel, videos in zip(channels, listings):
                 for vid in videos:
-                    # Verificar si ya existe en DB
-                    if db.query(Video).filter_by(youtube_id=vid['id']).first():
-                        continue
-                        
-                    # Obtener detalles completos para filtrar
-                    details = self.get_video_details(vid['url'])
-                    if not details:
-                        continue
-                        
-                    # 1. Filtro de fecha (aproximado por upload_date)
-                    upload_date = datetime.strptime(details['upload_date'], '%Y%m%d')
-                    if upload_date < cutoff_date:
-                        continue
-                        
-                    # 2. Filtro de Vistas
-                    if details.get('view_count', 0) < MIN_VIEWS_THRESHOLD:
-                        logger.info(f"Skip {vid['id']}: Pocas vistas ({details.get('view_count')})")
-                        continue
-                        
-                    # 3. Filtro de Duración
-                    duration = details.get('duration', 0)
-                    if duration > MAX_VIDEO_DURATION:
-                        logger.info(f"Skip {vid['id']}: Muy largo ({duration}s)")
+                    stats['listed'] += 1
+                    if vid['id'] in known_ids:
+                        stats['known'] += 1
                         continue
-                        
-                    if duration < SHORT_VIDEO_THRESHOLD:
-                        logger.info(f"Skip {vid['id']}: Muy corto ({duration}s)")
+                    flat_info, flat_fields = self._flat_filter_info(vid)
+                    reason = self._rejection_reason(flat_info, cutoff_date, flat_fields)
+                    if reason:
+                        stats['rejected_flat'] += 1
+                        logger.info(f"Skip {vid['id']} (prefiltro): {reason}")
                         continue
+                    pending.append((channel, vid))
 
-                    # Si pasa filtros, agregar a candidatos
-                    priority = channel.get('priority', 3)
-                    # Puntuación simple: prioridad (menor es mejor) + vistas
-                    score = (details.get('view_count', 0) / 1000) / priority
-                    
-                    candidates.append({
-                        'video': details,
-                        'score': score,
-                        'channel_name': channel['name']
-                    })
+            # 4. Obtener detalles completos (desde caché si los campos de los filtros están frescos)
+            details_list = [None] * len(pending)
+            to_fetch = []
+            for index, (channel, vid) in enumerate(pending):
+                cached = self._cached_details(vid['id'], cutoff_date)
+                if cached is not None:
+                    details_list[index] = cached
+                else:
+                    to_fetch.append(index)
+
+            fetched, stats['from_api'] = self.get_videos_details(
+                (pending[index][1] for index in to_fetch), max_workers
+            )
+            for index, details in zip(to_fetch, fetched):
+                details_list[index] = details
+            stats['cached'] = len(pending) - len(to_fetch)
+            stats['fetched'] = len(to_fetch)
+
+            if self.metadata_cache:
+                cache_stats = self.metadata_cache.stats()
+                logger.info(
+                    f"Caché de metadata: {cache_stats['hits']} aciertos, {cache_stats['misses']} fallos "
+                    f"({cache_stats['entries']} entradas)"
+                )
+
+            # 5. Filtros completos
+            for (channel, vid), details in zip(pending, details_list):
+                if not details:
+                    stats['rejected_details'] += 1
+                    continue
+
+                reason = self._rejection_reason(details, cutoff_date)
+                if reason:
+                    stats['rejected_details'] += 1
+                    logger.info(f"Skip {vid['id']}: {reason}")
+                    continue
+
+                # Si pasa filtros, agregar a candidatos
+                priority = channel.get('priority', 3)
+                # Puntuación simple: prioridad (menor es mejor) + vistas
+                score = (details.get('view_count', 0) / 1000) / priority
+                
+                candidates.append({
+                    'video': details,
+                    'score': score,
+                    'channel_name': channel['name']
+                })
+                stats['accepted'] += 1
+
+            self.last_scan_stats = stats
+            logger.info(
+                f"Escaneo: {stats['listed']} listados, {stats['known']} ya en DB, "
+                f"{stats['rejected_flat']} rechazados por prefiltro (extracciones completas evitadas), "
+                f"{stats['cached']} desde caché, {stats['fetched']} detalles pedidos "
+                f"({stats['from_api']} vía videos.list), "
+                f"{stats['rejected_details']} rechazados por detalles, {stats['accepted']} candidatos"
+            )
                     
         finally:
             db.close()
             
-        # Ordenar por score descendente
+        # Ordenar por score descendente (sort estable: empates en orden de escaneo)
         candidates.sort(key=lambda x: x['score'], reverse=True)
         return candidates
@@ -0,0 +1,133 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+class DiskCache:
+    """
+    Caché clave/valor persistente en un archivo SQLite.
+
+    - Los valores se guardan como bytes (get_json/set_json para dicts).
+    - Expulsión LRU cuando se superan max_entries o max_bytes.
+    - Contadores de aciertos/fallos por instancia (stats()).
+    """
+
+    def __init__(self, path, max_entries: int = 10000, max_bytes: int = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+
+    def get_entry(self, key: str):
+        """
+        Retorna (valor, stored_at) o None, sin contar acierto/fallo.
+        Marca la entrada como usada recientemente.
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return bytes(row[0]), row[1]
+
+    def get(self, key: str, max_age: float = None):
+        """
+        Retorna el valor si existe y tiene menos de max_age segundos (None = sin caducidad).
+        """
+        entry = self.get_entry(key)
+        if entry is not None and (max_age is None or time.time() - entry[1] <= max_age):
+            self.record(hit=True)
+            return entry[0]
+        self.record(hit=False)
+        return None
+
+    def record(self, hit: bool):
+        """Registra un acierto o fallo (para cachés que deciden la frescura fuera de get)"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def set(self, key: str, value: bytes):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), now, now)
+            )
+            self._evict()
+
+    def get_json(self, key: str, max_age: float = None):
+        value = self.get(key, max_age)
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, key: str, obj):
+        self.set(key, json.dumps(obj, ensure_ascii=False).encode('utf-8'))
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM entries")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': entries,
+                'bytes': size,
+            }
+
+    def _evict(self):
+        """Elimina las entradas menos usadas hasta respetar los límites (requiere el lock)"""
+        entries, size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        over_entries = self.max_entries is not None and entries > self.max_entries
+        over_bytes = self.max_bytes is not None and size > self.max_bytes
+        if not over_entries and not over_bytes:
+            return
+
+        # Bajar al 90% del límite para no expulsar en cada inserción
+        target_entries = int(self.max_entries * 0.9) if self.max_entries is not None else entries
+        target_bytes = int(self.max_bytes * 0.9) if self.max_bytes is not None else size
+        removed = []
+        for key, entry_size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            if entries <= target_entries and size <= target_bytes:
+                break
+            removed.append((key,))
+            entries -= 1
+            size -= entry_size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", removed)
+        logger.debug(f"Caché {self.path.name}: {len(removed)} entradas expulsadas (LRU)")
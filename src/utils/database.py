@@ -1,7 +1,7 @@
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, JSON, Text
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, Float, String, DateTime, Boolean, JSON, Text
 from sqlalchemy.orm import declarative_base, sessionmaker
-from config.settings import DB_PATH
+from config.settings import DB_PATH, SQLITE_BUSY_TIMEOUT
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -17,14 +17,26 @@ abs_db_path = DB_PATH.resolve().as_posix()
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{abs_db_path}"
 print(f"DEBUG: SQLALCHEMY_DATABASE_URL = {SQLALCHEMY_DATABASE_URL}")
 
+# timeout: varios procesos (workers) comparten la base de datos; una escritura
+# espera hasta SQLITE_BUSY_TIMEOUT segundos al bloqueo en lugar de fallar
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False},
+    connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
     echo=False
 )
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL: las lecturas no bloquean a la escritura de otro proceso ni al revés"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# SQLite limita los parámetros por sentencia (999 en versiones antiguas)
+SQLITE_MAX_VARIABLES = 900
+
 class Video(Base):
     """Modelo para rastrear videos procesados"""
     __tablename__ = "videos"
@@ -38,14 +50,32 @@ class Video(Base):
     views = Column(Integer)
     published_at = Column(DateTime)
     
+    description = Column(Text, nullable=True)
+    
     # Estados del procesamiento
     status = Column(String, default="pending")  # pending, downloaded, processing, ready, uploaded, error
     error_message = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)  # Ejecuciones del pipeline sobre este video
     
-    # Metadata del proceso
-    file_path = Column(String, nullable=True)
-    summary = Column(Text, nullable=True)
+    # Metadata del proceso (checkpoint de cada etapa, permite reanudar)
+    file_path = Column(String, nullable=True)  # download
+    download_start = Column(Float, nullable=True)  # Tramo descargado del original (None = video completo)
+    download_end = Column(Float, nullable=True)
+    summary = Column(Text, nullable=True)  # Guion de Gemini
     transcript = Column(Text, nullable=True)
+    metadata_json = Column(JSON, nullable=True)  # Título, descripción y tags de Gemini
+    audio_path = Column(String, nullable=True)  # TTS
+    render_path = Column(String, nullable=True)  # Video final
+    shorts_path = Column(String, nullable=True)  # Short 9:16 (mismo render, si está activado)
+    upload_uri = Column(String, nullable=True)  # Sesión de subida resumable en curso
+    upload_offset = Column(Integer, nullable=True)  # Bytes confirmados por YouTube en esa sesión
+    uploaded_video_id = Column(String, nullable=True)  # ID del video publicado en nuestro canal
+    publish_at = Column(DateTime, nullable=True)  # Franja de publicación (UTC)
+    upload_attempts = Column(Integer, default=0)  # Subidas fallidas (la cola de publicación las pone al final)
+
+    # Lease de la cola de trabajo (src/pipeline/job_queue.py): qué worker procesa el video y hasta cuándo
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)  # UTC; vencido = el worker murió y otro lo retoma
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -54,15 +84,82 @@ class Video(Base):
     def __repr__(self):
         return f"<Video {self.youtube_id}: {self.title} ({self.status})>"
 
+class ApiQuota(Base):
+    """Unidades de cuota de la YouTube Data API consumidas por día (día del Pacífico)"""
+    __tablename__ = "api_quota"
+
+    day = Column(String, primary_key=True)  # YYYY-MM-DD
+    units = Column(Integer, nullable=False, default=0)
+
+class ChannelFeed(Base):
+    """Estado del sondeo RSS de cada canal: validadores HTTP y marca de agua"""
+    __tablename__ = "channel_feeds"
+
+    channel_id = Column(String, primary_key=True)
+    etag = Column(String, nullable=True)  # ETag de la última respuesta 200
+    last_modified = Column(String, nullable=True)  # Last-Modified de la última respuesta 200
+    last_published = Column(DateTime, nullable=True)  # Marca de agua: entrada más reciente ya decidida (UTC)
+    last_polled_at = Column(DateTime, nullable=True)
+    last_status = Column(Integer, nullable=True)  # Código HTTP del último sondeo
+
+def _add_missing_columns():
+    """
+    create_all no altera tablas existentes: agrega con ALTER TABLE las columnas
+    nuevas del modelo que falten en una base de datos creada con una versión anterior.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            logger.info(f"Columna agregada: {table.name}.{column.name}")
+
 def init_db():
     """Inicializa la base de datos creando las tablas"""
     try:
         Base.metadata.create_all(bind=engine)
+        _add_missing_columns()
         logger.info(f"Base de datos inicializada en: {DB_PATH}")
     except Exception as e:
         logger.error(f"Error inicializando base de datos: {e}")
         raise
 
+def get_existing_youtube_ids(db, youtube_ids, chunk_size: int = SQLITE_MAX_VARIABLES) -> set:
+    """
+    Devuelve el subconjunto de youtube_ids que ya están registrados en la tabla videos.
+
+    Resuelve todos los IDs con una consulta IN (...) por bloque de chunk_size
+    en lugar de una consulta por video.
+    """
+    ids = list(dict.fromkeys(i for i in youtube_ids if i))
+    existing = set()
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        rows = db.query(Video.youtube_id).filter(Video.youtube_id.in_(chunk)).all()
+        existing.update(row[0] for row in rows)
+    return existing
+
+def video_from_info(info: dict, status: str = "pending") -> Video:
+    """Fila Video de un candidato a partir de su info dict (yt-dlp o videos.list)"""
+    return Video(
+        youtube_id=info['id'],
+        channel_id=info['channel_id'],
+        title=info['title'],
+        description=info.get('description'),
+        url=info['webpage_url'],
+        duration=info['duration'],
+        views=info['view_count'],
+        # Estrenos y directos programados aún no tienen upload_date
+        published_at=datetime.strptime(info['upload_date'], '%Y%m%d') if info.get('upload_date') else None,
+        status=status
+    )
+
 def get_db():
     """Generador de sesiones de base de datos"""
     db = SessionLocal()
@@ -0,0 +1,24 @@
+import threading
+import time
+
+class RateLimiter:
+    """
+    Limitador de tasa compartido entre hilos: como máximo `rate` llamadas
+    por `period` segundos, espaciadas de forma uniforme.
+    """
+
+    def __init__(self, rate: int, period: float = 60.0):
+        self.interval = period / rate if rate and rate > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloquea hasta que haya un hueco disponible"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)